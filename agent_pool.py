@@ -0,0 +1,132 @@
+"""
+Pool of pre-built agents.
+
+Building the CrewAI agents (with their long backstories, tools and LLM
+wrappers) costs far more than handing out ones that already exist, so instead
+of rebuilding them for every run and every concurrent subtopic, ``AgentPool``
+keeps built objects around and checks each one out to a single user at a time.
+Objects are built on demand when every pooled one is in use, can be built ahead
+of time with ``warm``, and are dropped instead of reused when the run holding
+them fails. ``ConstructionStats`` records how many objects were built or reused
+and how long building took, so the setup cost still paid can be reported.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+
+class ConstructionStats:
+    """Thread-safe counts and timings of built and reused objects, keyed by kind."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.entries = {}
+
+    def _entry(self, kind):
+        return self.entries.setdefault(kind, {'built': 0, 'reused': 0, 'seconds': 0.0})
+
+    def record(self, kind, seconds):
+        with self._lock:
+            entry = self._entry(kind)
+            entry['built'] += 1
+            entry['seconds'] += seconds
+
+    def record_reuse(self, kind):
+        with self._lock:
+            self._entry(kind)['reused'] += 1
+
+    @contextmanager
+    def measure(self, kind):
+        """Records the time spent in the with block as building one object of this kind."""
+        start = time.perf_counter()
+        yield
+        self.record(kind, time.perf_counter() - start)
+
+    def report(self):
+        """Returns {kind: {built, reused, seconds, avg_ms}}."""
+        with self._lock:
+            return {
+                kind: {**entry, 'avg_ms': round(entry['seconds'] * 1000 / entry['built'], 1) if entry['built'] else 0.0}
+                for kind, entry in self.entries.items()
+            }
+
+
+class AgentPool:
+    """Checks objects built by factory() out to one user at a time, keeping up to max_idle of them for reuse."""
+
+    def __init__(self, factory, kind='agents', max_idle=4, stats=None):
+        self.factory = factory
+        self.kind = kind
+        self.max_idle = max_idle
+        self.stats = stats or ConstructionStats()
+        self._idle = []
+        self._in_use = 0
+        self._lock = threading.Lock()
+
+    @property
+    def idle(self):
+        return len(self._idle)
+
+    @property
+    def in_use(self):
+        return self._in_use
+
+    def _build(self):
+        with self.stats.measure(self.kind):
+            return self.factory()
+
+    def acquire(self):
+        """Returns an idle object, or a newly built one if none is idle."""
+        with self._lock:
+            self._in_use += 1
+            item = self._idle.pop() if self._idle else None
+        if item is not None:
+            self.stats.record_reuse(self.kind)
+            return item
+        try:
+            return self._build()
+        except BaseException:
+            with self._lock:
+                self._in_use -= 1
+            raise
+
+    def release(self, item):
+        """Returns a checked-out object to the pool."""
+        with self._lock:
+            self._in_use -= 1
+            if len(self._idle) < self.max_idle:
+                self._idle.append(item)
+
+    def discard(self, item):
+        """Drops a checked-out object instead of returning it, e.g. when it may have been left mid-task."""
+        with self._lock:
+            self._in_use -= 1
+
+    @contextmanager
+    def checkout(self):
+        """Yields an object for the with block; it goes back to the pool unless the block raised."""
+        item = self.acquire()
+        try:
+            yield item
+        except BaseException:
+            self.discard(item)
+            raise
+        self.release(item)
+
+    def warm(self, count=1):
+        """Builds objects until at least count are idle (capped at max_idle)."""
+        while True:
+            with self._lock:
+                if len(self._idle) >= min(count, self.max_idle):
+                    return
+            item = self._build()
+            with self._lock:
+                if len(self._idle) >= self.max_idle:
+                    return
+                self._idle.append(item)
+
+    def report(self):
+        """Returns this pool's construction stats plus how many objects are idle and checked out."""
+        entry = self.stats.report().get(self.kind, {'built': 0, 'reused': 0, 'seconds': 0.0, 'avg_ms': 0.0})
+        return {**entry, 'idle': self.idle, 'in_use': self.in_use}
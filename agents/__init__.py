@@ -6,3 +6,4 @@ from .editor_agent import EditorAgent
 from .seo_agent import SEOAgent
 from .fact_checker_agent import FactCheckerAgent
 from .planner_agent import PlannerAgent
+from .translator_agent import TranslatorAgent
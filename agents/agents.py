@@ -11,6 +11,7 @@ from .editor_agent import EditorAgent
 from .seo_agent import SEOAgent
 from .fact_checker_agent import FactCheckerAgent
 from .planner_agent import PlannerAgent
+from .translator_agent import TranslatorAgent
 
 from langchain_google_genai import ChatGoogleGenerativeAI
 from crewai import Agent as CrewAgent
@@ -2,10 +2,18 @@
 Base agent class for Agent Studio prototype.
 """
 
-from crewai import Agent as CrewAgent
+import os
+
+from structured_logging import agent_step_logger
+
+# CrewAI's verbose mode prints every agent step to the console; by default the steps are logged instead (as sampled
+# trace records, see structured_logging.py). Set AGENT_VERBOSE=1 to get the console output back.
+AGENT_VERBOSE = os.getenv('AGENT_VERBOSE', '0') == '1'
 
 class BaseAgent:
     def __init__(self, name, role, description, llm, tools=None):
+        # Imported here so that importing the agents does not import CrewAI
+        from crewai import Agent as CrewAgent
         self.name = name
         self.role = role
         self.description = description
@@ -18,10 +26,11 @@ class BaseAgent:
             backstory=description,
             llm=llm,
             tools=self.tools,
-            verbose=True,
+            verbose=AGENT_VERBOSE,
+            step_callback=agent_step_logger(name),
             max_iter=5,
             allow_delegation=True
         )
 
     def run(self, task):
-        return self.crew_agent.run(task) 
\ No newline at end of file
+        return self.crew_agent.run(task)
@@ -0,0 +1,9 @@
+"""
+Translator agent for Agent Studio prototype.
+"""
+
+from .base_agent import BaseAgent
+
+class TranslatorAgent(BaseAgent):
+    def __init__(self, llm, tools=None, name="Translator", description="Responsible for translating finished content while preserving its formatting."):
+        super().__init__(name, role="Translator", description=description, llm=llm, tools=tools)
@@ -4,7 +4,7 @@ Streamlit UI for Agent Studio prototype.
 
 import streamlit as st
 from agents import ResearcherAgent, WriterAgent, ReviewerAgent, EditorAgent, SEOAgent, FactCheckerAgent, PlannerAgent
-from workflow import Workflow
+from workflow import Workflow, WorkflowTask
 
 st.title("🧑‍💻 Agent Studio Prototype")
 
@@ -58,12 +58,19 @@ st.subheader("Add Tasks")
 if 'tasks' not in st.session_state:
     st.session_state['tasks'] = []
 task_input = st.text_area("Task Description")
+task_name = st.text_input("Task Name", value=f"Task {len(st.session_state['tasks']) + 1}")
+task_agent = st.selectbox("Assign to Agent", ["Auto (round-robin)"] + agent_names)
+task_inputs = st.multiselect("Uses results from", [t.name for t in st.session_state['tasks']],
+                             help="The task waits for these tasks and receives their results. Tasks without inputs run in parallel.")
 if st.button("Add Task"):
-    if task_input:
-        st.session_state['tasks'].append(task_input)
-        st.success("Task added.")
-    else:
+    if not task_input:
         st.error("Please enter a task description.")
+    elif task_name in [t.name for t in st.session_state['tasks']]:
+        st.error("A task with this name already exists.")
+    else:
+        agent = None if task_agent == "Auto (round-robin)" else task_agent
+        st.session_state['tasks'].append(WorkflowTask(task_input, name=task_name, agent=agent, inputs=task_inputs))
+        st.success("Task added.")
 
 # Assign tasks to workflow
 st.session_state['workflow'].tasks = st.session_state['tasks']
@@ -75,10 +82,13 @@ if st.button("Run Workflow"):
     elif not st.session_state['workflow'].tasks:
         st.error("Add at least one task to the workflow.")
     else:
-        results = st.session_state['workflow'].run()
         st.header("Results")
-        for agent_name, task, result in results:
-            st.markdown(f"**Agent:** {agent_name}")
-            st.markdown(f"**Task:** {task}")
-            st.markdown(f"**Result:** {result}")
-            st.markdown("---") 
\ No newline at end of file
+        # Show each result as soon as its task finishes
+        try:
+            for agent_name, task, result in st.session_state['workflow'].stream():
+                st.markdown(f"**Agent:** {agent_name}")
+                st.markdown(f"**Task:** {task}")
+                st.markdown(f"**Result:** {result}")
+                st.markdown("---")
+        except ValueError as e:
+            st.error(str(e))
\ No newline at end of file
@@ -0,0 +1,438 @@
+"""
+Offline benchmark for the content pipeline.
+
+Runs ``run_pipeline`` end to end, through CrewAI and every local layer (agent
+pool, rate limiters, context budgets, checkpoints, events), against the
+stand-in LLM and search API from fakes.py, so pipeline changes can be measured
+without network access or API quota. Reports the cold start, end-to-end and
+per-stage latency, throughput at each concurrency level, trending topic
+parsing time and peak memory as JSON; a report can be compared with one saved
+from another commit to catch regressions.
+
+With ``--cassette`` the calls are replayed from a recorded cassette instead
+(see cassettes.py), at the recorded timings scaled by ``--time-scale``, and the
+outline and trending topic parsers are also timed on the recorded responses.
+The topic and modes must match the recorded run.
+
+    python benchmark.py --runs 6 --concurrency 1 4 --output bench_output.json
+    python benchmark.py --compare baseline.json --output bench_output.json
+    python benchmark.py --cassette .cache/cassette.jsonl.gz --time-scale 0.1 --topic "..."
+
+Caches, checkpoints and jobs go to a temporary directory and the rate limits
+are lifted, so runs do not touch (or reuse) the real ones.
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from events import STAGE_COMPLETED, TOKEN, as_event, forward_token
+from fakes import FakeLLMBackend, FakeSearchBackend, LatencyModel
+from tracing import percentile
+from utils import lazy
+
+DEFAULT_CONFIG = {
+    'topic': "The future of grid-scale battery storage",
+    'content_type': "Blog Post",
+    'writing_mode': None,  # None uses WRITING_MODE / EDIT_MODE from the environment
+    'edit_mode': None,
+    'runs': 4,  # Runs per concurrency level (at least as many as the level)
+    'concurrency': [1, 4],
+    'seed': 0,
+    'llm': {'base': 0.05, 'per_token': 0.0002, 'jitter': 0.3, 'distribution': "lognormal", 'error_rate': 0.0},
+    'search': {'base': 0.02, 'per_token': 0.0, 'jitter': 0.3, 'distribution': "lognormal", 'error_rate': 0.0},
+    'subtopics': 5,
+    'article_words': 2000,
+    'trending_runs': 20,
+    'stream': True,  # Stream LLM output token by token to the run's callback, as the web UI does
+    'trace_memory': True,
+    'cassette': None,  # Replay this cassette instead of using the fakes
+    'time_scale': 1.0,
+}
+
+# Metrics where a higher value is better; every other compared metric is a latency or size
+HIGHER_IS_BETTER = ('throughput_per_minute',)
+
+
+def summarize(values):
+    """Returns {count, mean, p50, p95, max} of a list of seconds."""
+    values = list(values)
+    return {
+        'count': len(values),
+        'mean': round(sum(values) / len(values), 4) if values else 0.0,
+        'p50': round(percentile(values, 0.5), 4),
+        'p95': round(percentile(values, 0.95), 4),
+        'max': round(max(values), 4) if values else 0.0,
+    }
+
+
+def configure_environment(workdir, stream=True, cassette=None, time_scale=1.0):
+    """Points caches, checkpoints, jobs and the log at workdir and lifts rate limits. Must run before main is imported.
+
+    With a cassette path, main replays the calls recorded in it.
+    """
+    if 'main' in sys.modules:
+        raise RuntimeError("configure_environment() must be called before main is imported")
+    os.environ.update({
+        'CONTENT_STUDIO_CACHE_DIR': os.path.join(workdir, 'cache'),
+        'CONTENT_STUDIO_RUNS_DIR': os.path.join(workdir, 'runs'),
+        'CONTENT_STUDIO_JOBS_DIR': os.path.join(workdir, 'jobs'),
+        'LLM_REQUESTS_PER_MINUTE': '1000000', 'LLM_BURST': '1000000',
+        'SEARCH_REQUESTS_PER_MINUTE': '1000000', 'SEARCH_BURST': '1000000',
+        'LLM_CACHE_ENABLED': '0', 'SEARCH_CACHE_ENABLED': '0', 'COALESCE_REQUESTS': '0',
+        'STREAM_TOKENS': '1' if stream else '0',
+        'GEMINI_API_KEY': 'offline', 'SERPER_API_KEY': 'offline',
+        'LOG_FILE': os.path.join(workdir, 'app.log'),
+    })
+    if cassette:
+        os.environ.update({'CASSETTE_MODE': 'replay', 'CASSETTE_PATH': os.path.abspath(cassette), 'CASSETTE_TIME_SCALE': str(time_scale)})
+
+
+@lazy
+def fake_classes():
+    # CrewAI adapters for the fake backends; defined on first use so that importing this module stays light
+    from typing import Any
+    from pydantic import BaseModel, Field
+    from crewai.llms.base_llm import BaseLLM
+    from crewai.tools import BaseTool
+
+    class FakeLLM(BaseLLM):
+        def __init__(self, backend, model="fake/gemini-2.0-flash", stream=False):
+            super().__init__(model=model, temperature=0.2)
+            self.backend = backend
+            self.stream = stream
+
+        def call(self, messages, tools=None, callbacks=None, available_functions=None):
+            if isinstance(messages, str):
+                messages = [{'role': 'user', 'content': messages}]
+            text = self.backend.respond(messages)
+            if self.stream:
+                for chunk in re.findall(r'\S+\s*', text):
+                    forward_token(chunk)
+            return text
+
+        def supports_function_calling(self):
+            return False
+
+        def supports_stop_words(self):
+            return False
+
+        def get_context_window_size(self):
+            return 1_000_000
+
+    class SearchInput(BaseModel):
+        search_query: str = Field(..., description="Mandatory search query you want to use to search the internet")
+
+    class FakeSearchTool(BaseTool):
+        name: str = "Search the internet with Serper"
+        description: str = "A tool that can be used to search the internet with a search_query."
+        args_schema: type = SearchInput
+        backend: Any = None
+
+        def _run(self, search_query, **kwargs):
+            return self.backend.search(search_query)
+
+    return FakeLLM, FakeSearchTool
+
+
+def install_fakes(main, llm_backend, search_backend, stream=True):
+    """Makes main build its LLMs and search tool from the fake backends (wrapped like the real ones)."""
+    FakeLLM, FakeSearchTool = fake_classes()
+    llm = FakeLLM(llm_backend, stream=stream)
+    translation_llm = FakeLLM(llm_backend, model="fake/gemini-2.0-flash-lite")
+    main.content_llms = lazy(lambda: (llm, main.instrument_llm(llm)))
+    main.translation_llms = lazy(lambda: (translation_llm, main.instrument_llm(translation_llm)))
+    main.get_search_tool = lazy(lambda: main.instrument_search_tool(FakeSearchTool(backend=search_backend)))
+
+
+class RunRecorder:
+    """Pipeline callback that records how long each stage took and how many tokens were streamed."""
+
+    def __init__(self, stream_tokens=True):
+        self.stream_tokens = stream_tokens
+        self.stages = {}
+        self.tokens = 0
+
+    def __call__(self, message):
+        event = as_event(message)
+        if event.kind == TOKEN:
+            self.tokens += 1
+        elif event.kind == STAGE_COMPLETED and not event.data.get('reused'):
+            self.stages[event.stage] = event.data.get('seconds', 0.0)
+
+
+def run_once(main, config):
+    """Runs the pipeline once; returns {'ok', 'seconds', 'stages', 'tokens'}."""
+    recorder = RunRecorder(stream_tokens=config['stream'])
+    start = time.perf_counter()
+    try:
+        content, _ = main.run_pipeline(
+            config['topic'], content_type=config['content_type'], callback=recorder, use_cache=False, coalesce=False,
+            writing_mode=config['writing_mode'], edit_mode=config['edit_mode']
+        )
+    except Exception as e:
+        logging.exception(f"Benchmark run failed: {e}")
+        content = None
+    return {'ok': bool(content), 'seconds': time.perf_counter() - start, 'stages': recorder.stages, 'tokens': recorder.tokens}
+
+
+def run_level(main, config, concurrency):
+    """Runs the pipeline at a concurrency level and returns its latency and throughput summary."""
+    count = max(config['runs'], concurrency)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        records = list(executor.map(lambda _: run_once(main, config), range(count)))
+    wall = time.perf_counter() - start
+    stages = {}
+    for record in records:
+        for stage, seconds in record['stages'].items():
+            stages.setdefault(stage, []).append(seconds)
+    return {
+        'concurrency': concurrency,
+        'runs': count,
+        'failures': sum(1 for record in records if not record['ok']),
+        'wall_seconds': round(wall, 4),
+        'throughput_per_minute': round(count * 60 / wall, 3) if wall else 0.0,
+        'e2e': summarize(record['seconds'] for record in records),
+        'stages': {stage: summarize(values) for stage, values in stages.items()},
+        'streamed_tokens': sum(record['tokens'] for record in records),
+    }
+
+
+def time_trending_topics(main, runs):
+    # Fetching and parsing trending topics (search call included), as the Streamlit sidebar does on a refresh
+    search_tool = main.get_search_tool()
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        main.get_trending_topics(search_tool)
+        timings.append(time.perf_counter() - start)
+    return summarize(timings)
+
+
+class RecordedSearch:
+    # Stands in for the search tool in get_trending_topics, answering with one recorded payload
+    def __init__(self, payload):
+        self.payload = payload
+
+    def run(self, **kwargs):
+        return self.payload
+
+
+def time_recorded_parsing(main, cassette, topic):
+    """Times the outline and trending topic parsers on the real responses recorded in a cassette."""
+    outlines = [
+        str(entry['response']).split("Final Answer:", 1)[-1] for entry in cassette.entries('llm')
+        if entry.get('label', '').startswith("Plan the structure") and 'response' in entry
+    ]
+    payloads = [entry['response'] for entry in cassette.entries('search') if 'response' in entry]
+    outline_timings, trending_timings = [], []
+    for outline in outlines:
+        start = time.perf_counter()
+        main.extract_subtopics_from_outline(outline, topic)
+        outline_timings.append(time.perf_counter() - start)
+    for payload in payloads:
+        start = time.perf_counter()
+        main.get_trending_topics(RecordedSearch(payload))
+        trending_timings.append(time.perf_counter() - start)
+    return {'outlines': summarize(outline_timings), 'search_payloads': summarize(trending_timings)}
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=10,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Not available on Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def run_benchmark(config=None):
+    """Runs the whole benchmark in this process (which must not have imported main yet) and returns the report."""
+    config = {**DEFAULT_CONFIG, **(config or {})}
+    workdir = tempfile.mkdtemp(prefix='content-studio-bench-')
+    try:
+        configure_environment(workdir, stream=config['stream'], cassette=config['cassette'], time_scale=config['time_scale'])
+        start = time.perf_counter()
+        import main
+        import_seconds = time.perf_counter() - start
+
+        if config['cassette']:
+            backends = None
+        else:
+            llm_settings, search_settings = dict(config['llm']), dict(config['search'])
+            backends = {
+                'llm': FakeLLMBackend(
+                    seed=config['seed'], error_rate=llm_settings.pop('error_rate'), latency=LatencyModel(**llm_settings),
+                    subtopics=config['subtopics'], article_words=config['article_words']
+                ),
+                'search': FakeSearchBackend(
+                    seed=config['seed'], error_rate=search_settings.pop('error_rate'), latency=LatencyModel(**search_settings)
+                ),
+            }
+            install_fakes(main, backends['llm'], backends['search'], stream=config['stream'])
+
+        # The first run pays for importing CrewAI and building the agents; it is reported on its own
+        cold_start = run_once(main, config)
+        if config['trace_memory']:
+            tracemalloc.start()
+        levels = {str(level): run_level(main, config, level) for level in config['concurrency']}
+        trending = time_trending_topics(main, config['trending_runs'])
+        parsing = time_recorded_parsing(main, main.cassette, config['topic']) if main.cassette else None
+        peak_traced = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None
+        tracemalloc.stop()
+
+        return {
+            'meta': {
+                'commit': git_commit(),
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'config': config,
+            },
+            'import_seconds': round(import_seconds, 4),
+            'cold_start': {'ok': cold_start['ok'], 'seconds': round(cold_start['seconds'], 4)},
+            'levels': levels,
+            'trending_topics': trending,
+            'peak_memory_mb': round(peak_traced / (1024 * 1024), 2) if peak_traced is not None else None,
+            'peak_rss_mb': peak_rss_mb(),
+            'parsing': parsing,
+            'calls': {kind: dict(backend.stats) for kind, backend in backends.items()} if backends else {'cassette': dict(main.cassette.stats)},
+            'agent_pool': main.agent_pool_report(),
+        }
+    finally:
+        if 'main' in sys.modules and sys.modules['main'].setup_logging.is_built():
+            sys.modules['main'].setup_logging().stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _metrics(report):
+    # Flattens the comparable metrics of a report into {name: value}
+    metrics = {'cold_start.seconds': report['cold_start']['seconds'], 'trending_topics.p50': report['trending_topics']['p50']}
+    for name, summary in (report.get('parsing') or {}).items():
+        metrics[f"parsing.{name}.p50"] = summary['p50']
+    for level, summary in report['levels'].items():
+        metrics[f"c{level}.e2e.p50"] = summary['e2e']['p50']
+        metrics[f"c{level}.e2e.p95"] = summary['e2e']['p95']
+        metrics[f"c{level}.throughput_per_minute"] = summary['throughput_per_minute']
+        for stage, stage_summary in summary['stages'].items():
+            metrics[f"c{level}.stage.{stage}.p50"] = stage_summary['p50']
+    if report.get('peak_memory_mb') is not None:
+        metrics['peak_memory_mb'] = report['peak_memory_mb']
+    return metrics
+
+
+def compare_reports(baseline, current, tolerance=0.10, min_delta=0.005):
+    """Returns the metrics of current that are more than tolerance (a fraction) worse than in baseline.
+
+    Each regression is {'metric', 'baseline', 'current', 'change'} (change as a fraction); differences smaller
+    than min_delta are treated as noise.
+    """
+    before, after = _metrics(baseline), _metrics(current)
+    regressions = []
+    for metric in sorted(before.keys() & after.keys()):
+        old, new = before[metric], after[metric]
+        if not old or abs(new - old) < min_delta:
+            continue
+        change = (new - old) / old
+        worse = -change if metric.endswith(HIGHER_IS_BETTER) else change
+        if worse > tolerance:
+            regressions.append({'metric': metric, 'baseline': old, 'current': new, 'change': round(change, 4)})
+    return regressions
+
+
+def format_report(report):
+    lines = [
+        f"Commit {report['meta']['commit'] or 'unknown'}: import {report['import_seconds']:.3f}s, cold start {report['cold_start']['seconds']:.2f}s",
+    ]
+    for level, summary in report['levels'].items():
+        lines.append(
+            f"  concurrency {level}: {summary['runs']} runs ({summary['failures']} failed), "
+            f"e2e p50 {summary['e2e']['p50']:.2f}s p95 {summary['e2e']['p95']:.2f}s, {summary['throughput_per_minute']:.1f} runs/min"
+        )
+        for stage, stage_summary in summary['stages'].items():
+            lines.append(f"    {stage:<24} p50 {stage_summary['p50']:.3f}s  p95 {stage_summary['p95']:.3f}s")
+    lines.append(f"  trending topics p50 {report['trending_topics']['p50'] * 1000:.1f}ms")
+    for name, summary in (report.get('parsing') or {}).items():
+        lines.append(f"  recorded {name}: {summary['count']} parsed, p50 {summary['p50'] * 1000:.1f}ms")
+    if report['peak_memory_mb'] is not None:
+        lines.append(f"  peak traced memory {report['peak_memory_mb']:.1f} MB")
+    return '\n'.join(lines)
+
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark of the content pipeline against a fake LLM and search API.")
+    parser.add_argument('--runs', type=int, default=DEFAULT_CONFIG['runs'], help="Runs per concurrency level")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=DEFAULT_CONFIG['concurrency'], help="Concurrency levels to measure")
+    parser.add_argument('--seed', type=int, default=DEFAULT_CONFIG['seed'])
+    parser.add_argument('--topic', default=DEFAULT_CONFIG['topic'])
+    parser.add_argument('--content-type', default=DEFAULT_CONFIG['content_type'])
+    parser.add_argument('--writing-mode', choices=["single", "sectioned"])
+    parser.add_argument('--edit-mode', choices=["rewrite", "patch"])
+    parser.add_argument('--distribution', choices=["fixed", "uniform", "lognormal"], default="lognormal", help="Latency distribution of both fakes")
+    parser.add_argument('--llm-latency', type=float, default=DEFAULT_CONFIG['llm']['base'], help="Base seconds per LLM call")
+    parser.add_argument('--llm-per-token', type=float, default=DEFAULT_CONFIG['llm']['per_token'], help="Extra seconds per generated token")
+    parser.add_argument('--llm-jitter', type=float, default=DEFAULT_CONFIG['llm']['jitter'])
+    parser.add_argument('--llm-error-rate', type=float, default=0.0, help="Share of LLM calls failing with a rate limit error")
+    parser.add_argument('--search-latency', type=float, default=DEFAULT_CONFIG['search']['base'], help="Base seconds per search call")
+    parser.add_argument('--search-jitter', type=float, default=DEFAULT_CONFIG['search']['jitter'])
+    parser.add_argument('--search-error-rate', type=float, default=0.0)
+    parser.add_argument('--subtopics', type=int, default=DEFAULT_CONFIG['subtopics'])
+    parser.add_argument('--article-words', type=int, default=DEFAULT_CONFIG['article_words'])
+    parser.add_argument('--no-stream', action='store_true', help="Do not stream LLM output tokens to the run callbacks")
+    parser.add_argument('--no-trace-memory', action='store_true', help="Skip tracemalloc (faster, but no peak memory)")
+    parser.add_argument('--cassette', help="Replay this recorded cassette instead of using the fake LLM and search API")
+    parser.add_argument('--time-scale', type=float, default=1.0, help="Scale for the recorded call durations when replaying (0 = instant)")
+    parser.add_argument('--output', default='bench_output.json', help="Where to write the JSON report")
+    parser.add_argument('--compare', help="Baseline JSON report to compare against; exits with status 1 on regressions")
+    parser.add_argument('--tolerance', type=float, default=0.10, help="Allowed slowdown as a fraction (default 0.10)")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark({
+        'topic': args.topic, 'content_type': args.content_type, 'writing_mode': args.writing_mode, 'edit_mode': args.edit_mode,
+        'runs': args.runs, 'concurrency': args.concurrency, 'seed': args.seed,
+        'llm': {'base': args.llm_latency, 'per_token': args.llm_per_token, 'jitter': args.llm_jitter, 'distribution': args.distribution, 'error_rate': args.llm_error_rate},
+        'search': {'base': args.search_latency, 'per_token': 0.0, 'jitter': args.search_jitter, 'distribution': args.distribution, 'error_rate': args.search_error_rate},
+        'subtopics': args.subtopics, 'article_words': args.article_words,
+        'stream': not args.no_stream, 'trace_memory': not args.no_trace_memory,
+        'cassette': args.cassette, 'time_scale': args.time_scale,
+    })
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(format_report(report))
+    print(f"Report written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_reports(baseline, report, tolerance=args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression['metric']}: {regression['baseline']} -> {regression['current']} ({regression['change']:+.0%})")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.compare} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(cli())
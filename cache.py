@@ -0,0 +1,150 @@
+"""
+On-disk caching for LLM responses (and other JSON-serializable results).
+
+``DiskCache`` is a small SQLite key/value store with TTL expiry, size-bounded
+LRU eviction and hit/miss counters. SQLite in WAL mode lets every Streamlit
+session thread and every server process share one cache file safely.
+
+``LLMResponseCache`` sits in front of a CrewAI ``LLM.call`` and keys responses
+on the agent role (system prompt), the rendered prompt, the model name and the
+temperature.
+"""
+
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+class DiskCache:
+    """SQLite-backed key/value cache with TTL, LRU eviction and hit/miss stats."""
+
+    def __init__(self, path, max_entries=2000, ttl=None, table='cache'):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.table = table
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        self._stats_lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connection() as conn:
+            # WAL is a property of the database file, so it only needs to be switched on once
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_accessed ON {self.table} (accessed)")
+
+    @contextmanager
+    def _connection(self):
+        # A short-lived connection per operation, so none is left open by the many short-lived worker threads that
+        # use the cache; WAL + busy timeout make concurrent sessions and processes safe
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA synchronous=NORMAL")
+            yield conn
+        finally:
+            conn.close()
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def get(self, key, default=None):
+        with self._connection() as conn:
+            row = conn.execute(f"SELECT value, created FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            now = time.time()
+            if row is None or (self.ttl is not None and now - row[1] > self.ttl):
+                if row is not None:
+                    conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self._count('misses')
+                return default
+            conn.execute(f"UPDATE {self.table} SET accessed = ? WHERE key = ?", (now, key))
+        self._count('hits')
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now)
+            )
+            self._evict(conn)
+
+    def _evict(self, conn):
+        # Drop the least recently used entries once the cache grows past max_entries
+        if not self.max_entries:
+            return
+        size = conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        overflow = size - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN (SELECT key FROM {self.table} ORDER BY accessed ASC LIMIT ?)",
+                (overflow,)
+            )
+            self._count('evictions', overflow)
+
+    def delete(self, key):
+        with self._connection() as conn:
+            conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._connection() as conn:
+            conn.execute(f"DELETE FROM {self.table}")
+
+    def __len__(self):
+        with self._connection() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def hit_rate(self):
+        lookups = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / lookups if lookups else 0.0
+
+
+def llm_cache_key(role, prompt, model, temperature):
+    """Stable hash of everything that determines an LLM response."""
+    payload = json.dumps([role, prompt, model, temperature], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def split_messages(messages):
+    # The system message carries the agent's role/backstory; everything else is the rendered prompt
+    if isinstance(messages, str):
+        return '', messages
+    role = "\n".join(str(m.get('content', '')) for m in messages if m.get('role') == 'system')
+    prompt = json.dumps([m for m in messages if m.get('role') != 'system'], sort_keys=True, default=str)
+    return role, prompt
+
+
+class LLMResponseCache:
+    """Caches LLM.call responses in a DiskCache."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def wrap(self, call, llm):
+        model = getattr(llm, 'model', None)
+        temperature = getattr(llm, 'temperature', None)
+
+        @functools.wraps(call)
+        def cached_call(messages, *args, **kwargs):
+            # Calls that may execute functions have side effects, so never serve them from cache
+            if kwargs.get('available_functions'):
+                return call(messages, *args, **kwargs)
+            role, prompt = split_messages(messages)
+            key = llm_cache_key(role, prompt, model, temperature)
+            cached = self.store.get(key)
+            if cached is not None:
+                return cached
+            response = call(messages, *args, **kwargs)
+            if isinstance(response, str) and response.strip():
+                self.store.set(key, response)
+            return response
+        return cached_call
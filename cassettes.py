@@ -0,0 +1,146 @@
+"""
+Record and replay of LLM and search traffic.
+
+A ``Cassette`` in "record" mode passes every wrapped call through and appends
+the request's key, the response (or error) and how long the call took to a
+gzip-compressed JSON lines file. In "replay" mode it answers the same calls
+from that file without touching the network, sleeping for the recorded
+duration scaled by ``time_scale`` (0 replays instantly), so a production run's
+latency profile and real model outputs can be reproduced offline.
+
+Requests are matched by a hash of their content. Identical requests are
+answered with their recorded responses in the order they were recorded; once
+those are used up the last one is repeated.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+CASSETTE_MODES = ["record", "replay"]
+FORMAT_VERSION = 1
+
+
+class CassetteMiss(LookupError):
+    """Raised in replay mode for a request that was never recorded."""
+
+
+class ReplayedError(Exception):
+    """A recorded call failure, raised again on replay. The message keeps the original type name and text."""
+
+
+def task_label(messages):
+    """The start of the CrewAI task an LLM request belongs to (or of the request itself), to label recorded calls."""
+    if isinstance(messages, list):
+        messages = '\n'.join(str(message.get('content', '')) if isinstance(message, dict) else str(message) for message in messages)
+    match = re.search(r'Current Task:\s*(.{0,120})', str(messages))
+    return match.group(1) if match else str(messages)[:120]
+
+
+def request_key(kind, request):
+    """Stable hash of a JSON-serializable request."""
+    canonical = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(f"{kind}\n{canonical}".encode('utf-8')).hexdigest()[:32]
+
+
+class Cassette:
+    """Records calls to, or replays them from, a compressed cassette file (see module docstring)."""
+
+    def __init__(self, path, mode="replay", time_scale=1.0, clock=time.perf_counter, sleep=time.sleep):
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.time_scale = time_scale
+        self.clock = clock
+        self.sleep = sleep
+        self.stats = {'recorded': 0, 'replayed': 0, 'missed': 0}
+        self._lock = threading.Lock()
+        self._tracks = None  # key -> [entry, ...] in recorded order, loaded on first replay
+        self._played = {}  # key -> how many of its entries have been replayed
+
+    def entries(self, kind=None):
+        """Returns the recorded entries (optionally only one kind), in recorded order."""
+        if not os.path.isfile(self.path):
+            return []
+        entries = []
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                entry = json.loads(line)
+                if 'key' in entry and (kind is None or entry['kind'] == kind):
+                    entries.append(entry)
+        return entries
+
+    def _append(self, entry):
+        # One gzip member per entry, so a crash mid-run keeps everything recorded so far
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            new_file = not os.path.isfile(self.path)
+            with gzip.open(self.path, 'at', encoding='utf-8') as f:
+                if new_file:
+                    f.write(json.dumps({'cassette': FORMAT_VERSION, 'created_at': time.time()}) + '\n')
+                f.write(json.dumps(entry, ensure_ascii=False, default=str) + '\n')
+            self.stats['recorded'] += 1
+
+    def record(self, kind, request, fn, *args, label=None, **kwargs):
+        """Calls fn(*args, **kwargs) and records its response or error under the request's key.
+
+        label is stored with the entry (it is not part of the key) so recorded calls can be found again.
+        """
+        key = request_key(kind, request)
+        start = self.clock()
+        entry = {'kind': kind, 'key': key, 'label': label if label is not None else json.dumps(request, default=str)[:120]}
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self._append({**entry, 'seconds': round(self.clock() - start, 4), 'error': f"{type(e).__name__}: {e}"})
+            raise
+        self._append({**entry, 'seconds': round(self.clock() - start, 4), 'response': result})
+        return result
+
+    def _next(self, key):
+        with self._lock:
+            if self._tracks is None:
+                self._tracks = {}
+                for entry in self.entries():
+                    self._tracks.setdefault(entry['key'], []).append(entry)
+            track = self._tracks.get(key)
+            if not track:
+                self.stats['missed'] += 1
+                return None
+            played = self._played.get(key, 0)
+            self._played[key] = played + 1
+            self.stats['replayed'] += 1
+            return track[min(played, len(track) - 1)]
+
+    def replay(self, kind, request):
+        """Returns the recorded response for a request after its (scaled) recorded duration, or raises its error."""
+        entry = self._next(request_key(kind, request))
+        if entry is None:
+            raise CassetteMiss(f"No recorded {kind} response for request ...{json.dumps(request, default=str)[-120:]}")
+        if self.time_scale and entry.get('seconds'):
+            self.sleep(entry['seconds'] * self.time_scale)
+        if 'error' in entry:
+            raise ReplayedError(entry['error'])
+        return entry['response']
+
+    def wrap(self, kind, fn, describe, on_replay=None, label=None):
+        """Wraps fn so that its calls are recorded or replayed.
+
+        describe(*args, **kwargs) returns the JSON-serializable request a call is matched by, and label(request) the
+        label it is recorded with. on_replay(response), if given, is called with each replayed response (e.g. to
+        stream it as the live call would have).
+        """
+        def call(*args, **kwargs):
+            request = describe(*args, **kwargs)
+            if self.mode == "record":
+                return self.record(kind, request, fn, *args, label=label(request) if label else None, **kwargs)
+            response = self.replay(kind, request)
+            if on_replay:
+                on_replay(response)
+            return response
+        return call
@@ -0,0 +1,103 @@
+"""
+Stage checkpoints for pipeline runs.
+
+Each run gets a directory under the runs root, keyed by run ID, holding the
+run's parameters (``run.json``) and one JSON file per completed stage. A run
+that fails late in the chain can be resumed and only the missing stages are
+executed again.
+
+``stage_memo_key`` addresses stage outputs by the inputs the stage actually
+depends on, so a new run that only changes, say, the tone can reuse the
+planner and research outputs of an earlier run.
+"""
+
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+
+RUN_ID_PATTERN = re.compile(r'^[A-Za-z0-9_.-]+$')
+
+
+def stage_memo_key(stage, inputs):
+    """Content address of a stage output: the stage name plus a hash of its inputs."""
+    payload = json.dumps(inputs, sort_keys=True, ensure_ascii=False, default=str)
+    return f"{stage}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+
+def normalize_topic(user_query):
+    """Topic form used for memo keys, so whitespace/case-only edits still reuse upstream stages."""
+    return ' '.join(str(user_query).split()).casefold()
+
+
+class RunStore:
+    """Persists run parameters and per-stage outputs on disk."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def new_run_id(self):
+        return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+    def run_dir(self, run_id):
+        if not run_id or not RUN_ID_PATTERN.match(run_id):
+            raise ValueError(f"Invalid run ID: {run_id!r}")
+        return os.path.join(self.root, run_id)
+
+    def _stage_path(self, run_id, stage):
+        return os.path.join(self.run_dir(run_id), f"{stage}.json")
+
+    def _write_json(self, path, data):
+        # Write to a temporary file first so a crash never leaves a half-written checkpoint
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def _read_json(self, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def exists(self, run_id):
+        return os.path.isfile(os.path.join(self.run_dir(run_id), 'run.json'))
+
+    def save_metadata(self, run_id, metadata):
+        self._write_json(os.path.join(self.run_dir(run_id), 'run.json'), metadata)
+
+    def load_metadata(self, run_id):
+        return self._read_json(os.path.join(self.run_dir(run_id), 'run.json'))
+
+    def update_metadata(self, run_id, **fields):
+        metadata = self.load_metadata(run_id) if self.exists(run_id) else {}
+        metadata.update(fields)
+        self.save_metadata(run_id, metadata)
+        return metadata
+
+    def save(self, run_id, stage, output):
+        self._write_json(self._stage_path(run_id, stage), {
+            'stage': stage,
+            'saved_at': time.time(),
+            'output': output,
+        })
+
+    def has(self, run_id, stage):
+        return os.path.isfile(self._stage_path(run_id, stage))
+
+    def load(self, run_id, stage, default=None):
+        if not self.has(run_id, stage):
+            return default
+        return self._read_json(self._stage_path(run_id, stage))['output']
+
+    def completed_stages(self, run_id, stages):
+        """Returns the stages (from the given ordered list) that have a saved checkpoint."""
+        return [stage for stage in stages if self.has(run_id, stage)]
+
+    def list_runs(self):
+        # Most recent first
+        if not os.path.isdir(self.root):
+            return []
+        runs = [name for name in os.listdir(self.root) if os.path.isfile(os.path.join(self.root, name, 'run.json'))]
+        return sorted(runs, key=lambda name: os.path.getmtime(os.path.join(self.root, name, 'run.json')), reverse=True)
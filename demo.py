@@ -1,11 +1,34 @@
-from main import run_pipeline, clean_code_blocks
+from main import run_pipeline, resume_pipeline, run_store, clean_code_blocks
+import argparse
 import markdown
 
 if __name__ == "__main__":
-    user_query = "Write a detailed report on the impact of AI in human life."
-    print(f"\nRunning multi-agent pipeline via demo script for query: {user_query}\n")
-    # Pass print function as a simple callback when running directly
-    final_content, fact_check_report = run_pipeline(user_query, content_type="Blog Post", language="English", tone="Informational", callback=print) # Specify tone
+    parser = argparse.ArgumentParser(description="Run the multi-agent content pipeline.")
+    parser.add_argument("--resume", nargs="?", const="latest", metavar="RUN_ID",
+                        help="Resume a previous run from its last completed stage (defaults to the most recent run).")
+    args = parser.parse_args()
+
+    if args.resume:
+        run_id = args.resume
+        if run_id == "latest":
+            runs = run_store.list_runs()
+            if not runs:
+                parser.error("No saved runs to resume.")
+            run_id = runs[0]
+        print(f"\nResuming pipeline run {run_id}\n")
+        result = resume_pipeline(run_id, callback=print)
+        if isinstance(result, dict):
+            # Multi-format run: save the blog post if there is one, otherwise the first format
+            result = result.get("Blog Post") or next(iter(result.values()), (None, None))
+        final_content, fact_check_report = result
+    else:
+        user_query = "Write a detailed report on the impact of AI in human life."
+        print(f"\nRunning multi-agent pipeline via demo script for query: {user_query}\n")
+        # Pass print function as a simple callback when running directly
+        final_content, fact_check_report = run_pipeline(user_query, content_type="Blog Post", language="English", tone="Informational", callback=print) # Specify tone
+    if final_content is None:
+        print("\nPipeline did not complete. Re-run with --resume to continue from the last completed stage.\n")
+        raise SystemExit(1)
     print("\n=== FINAL OUTPUT ===\n")
     print("Type of final_content:", type(final_content))
     print("repr(final_content) (first 200 chars):", repr(str(final_content)[:200]))
@@ -0,0 +1,147 @@
+"""
+Structured edit operations for the Editor and SEO stages.
+
+Instead of re-emitting a whole 2000+ word post, the model returns a list of
+section-anchored edits (plus an optional ``META_DESCRIPTION`` line) in the
+format described by ``EDIT_FORMAT``. ``apply_edits`` merges them into the post
+locally and raises ``EditError`` if any edit cannot be applied cleanly, so the
+caller can fall back to a full rewrite. A post that needs no changes is
+answered with ``NO_EDITS`` and kept as it is.
+"""
+
+import re
+
+# The whole reply (after any META_DESCRIPTION line) when the post needs no changes
+NO_EDITS = "NO_EDITS"
+
+EDIT_FORMAT = (
+    "Return ONLY your changes, using this exact format for each edit:\n"
+    "<<<EDIT\n"
+    "SECTION: <the section heading exactly as it appears in the post, without the # marks, or INTRO for text before the first heading>\n"
+    "ACTION: <REPLACE to replace text, INSERT_AFTER to add a new paragraph after the paragraph containing the FIND text, or APPEND to add a paragraph at the end of the section>\n"
+    "FIND:\n"
+    "<text copied exactly from that section; omit FIND for APPEND>\n"
+    "NEW:\n"
+    "<the new text>\n"
+    ">>>END\n"
+    "Keep each FIND short but unique within its section. Do not output the unchanged parts of the post. "
+    f"If the post needs no changes, reply with {NO_EDITS} on its own line instead of any edits."
+)
+
+EDIT_BLOCK_PATTERN = re.compile(r'<<<EDIT\s*\n(.*?)\n\s*>>>END', re.DOTALL)
+META_PATTERN = re.compile(r'^\s*\**META_DESCRIPTION\**\s*:\s*(.+)$', re.MULTILINE)
+NO_EDITS_PATTERN = re.compile(rf'^\s*\**{NO_EDITS}\**\s*$', re.MULTILINE)
+HEADING_PATTERN = re.compile(r'^#{1,6}\s+(.*)$', re.MULTILINE)
+ACTIONS = ('REPLACE', 'INSERT_AFTER', 'APPEND')
+
+
+class EditError(ValueError):
+    """Raised when model edits cannot be parsed or applied to the post."""
+
+
+def _normalize_heading(text):
+    return ' '.join(text.strip().strip('#*').split()).casefold()
+
+
+def parse_edits(text):
+    """Parses the model output into (meta_description, edits)."""
+    meta_match = META_PATTERN.search(text)
+    meta_description = meta_match.group(1).strip() if meta_match else None
+    edits = []
+    blocks = EDIT_BLOCK_PATTERN.findall(text)
+    if len(blocks) != text.count('<<<EDIT'):
+        # An edit block without its >>>END, e.g. a response cut off at the token limit: the edit set is incomplete
+        raise EditError(f"Response has {text.count('<<<EDIT')} edit blocks but only {len(blocks)} are complete")
+    for block in blocks:
+        match = re.match(
+            r'\s*SECTION:\s*(?P<section>.*?)\s*\n\s*ACTION:\s*(?P<action>\w+)\s*\n(?:\s*FIND:\s*\n(?P<find>.*?)\n)?\s*NEW:\s*\n(?P<new>.*)$',
+            block, re.DOTALL
+        )
+        if not match:
+            raise EditError(f"Malformed edit block: {block[:100]!r}")
+        action = match.group('action').upper()
+        if action not in ACTIONS:
+            raise EditError(f"Unknown edit action: {action}")
+        find = (match.group('find') or '').strip()
+        if action != 'APPEND' and not find:
+            raise EditError(f"{action} edit in section '{match.group('section')}' has no FIND text")
+        edits.append({
+            'section': match.group('section').strip(),
+            'action': action,
+            'find': find,
+            'new': match.group('new').strip(),
+        })
+    return meta_description, edits
+
+
+def split_sections(post):
+    """Splits a Markdown post into [(heading or None, text)] chunks, one per heading."""
+    starts = [m.start() for m in HEADING_PATTERN.finditer(post)]
+    if not starts or starts[0] != 0:
+        starts = [0] + starts
+    chunks = []
+    for i, start in enumerate(starts):
+        end = starts[i + 1] if i + 1 < len(starts) else len(post)
+        text = post[start:end]
+        heading = HEADING_PATTERN.match(text)
+        chunks.append([heading.group(1) if heading else None, text])
+    return chunks
+
+
+def _find_section(chunks, name):
+    if _normalize_heading(name) == 'intro':
+        if chunks and chunks[0][0] is None:
+            return chunks[0]
+        raise EditError("Post has no introduction before its first heading")
+    for chunk in chunks:
+        if chunk[0] is not None and _normalize_heading(chunk[0]) == _normalize_heading(name):
+            return chunk
+    raise EditError(f"Section not found: {name}")
+
+
+def _locate(text, find, section_name):
+    start = text.find(find)
+    if start == -1:
+        raise EditError(f"FIND text not found in section '{section_name}': {find[:80]!r}")
+    if text.find(find, start + 1) != -1:
+        raise EditError(f"FIND text is ambiguous in section '{section_name}': {find[:80]!r}")
+    return start
+
+
+def apply_edits(post, edits, meta_description=None):
+    """Applies parsed edits to the post; raises EditError if any edit does not apply cleanly."""
+    chunks = split_sections(post.strip())
+    for edit in edits:
+        chunk = _find_section(chunks, edit['section'])
+        text = chunk[1]
+        body_end = len(text.rstrip())
+        if edit['action'] == 'REPLACE':
+            start = _locate(text, edit['find'], edit['section'])
+            text = text[:start] + edit['new'] + text[start + len(edit['find']):]
+        elif edit['action'] == 'INSERT_AFTER':
+            start = _locate(text, edit['find'], edit['section'])
+            paragraph_end = text.find('\n\n', start + len(edit['find']))
+            if paragraph_end == -1 or paragraph_end > body_end:
+                paragraph_end = body_end
+            text = text[:paragraph_end] + '\n\n' + edit['new'] + text[paragraph_end:]
+        else:
+            text = text[:body_end] + '\n\n' + edit['new'] + text[body_end:]
+        chunk[1] = text
+    edited = ''.join(text for _, text in chunks).strip()
+    if len(HEADING_PATTERN.findall(edited)) < len(HEADING_PATTERN.findall(post)):
+        raise EditError("Edits removed section headings")
+    if meta_description:
+        # Same layout as a full SEO rewrite: the meta description line comes first
+        edited = META_PATTERN.sub('', edited).lstrip()
+        edited = f"META_DESCRIPTION: {meta_description}\n\n{edited}"
+    return edited
+
+
+def apply_edit_response(post, response, require_meta=False):
+    """Parses and applies a model's edit response to the post."""
+    meta_description, edits = parse_edits(response)
+    if require_meta and not meta_description:
+        raise EditError("Response has no META_DESCRIPTION line")
+    if not edits and not meta_description and not NO_EDITS_PATTERN.search(response):
+        raise EditError("Response contains no edits")
+    return apply_edits(post, edits, meta_description)
@@ -0,0 +1,105 @@
+"""
+Pipeline events for progress reporting and streaming.
+
+``run_pipeline`` reports progress through its ``callback``. Every message it
+sends is a ``PipelineEvent``: a plain string (so existing callbacks that print
+or log messages keep working) that also carries a kind, the stage it belongs
+to and structured data. Callbacks that set ``stream_tokens = True`` (such as
+``EventStream``) additionally receive the writer, editor and SEO output token
+by token as the LLM streams it.
+"""
+
+import copy
+import queue
+import threading
+
+from utils import wrap_method
+
+# Event kinds
+MESSAGE = "message"  # Free-form progress text
+STAGE_STARTED = "stage_started"
+STAGE_COMPLETED = "stage_completed"  # data: output, seconds, reused
+TOKEN = "token"  # A streamed chunk of LLM output; the text is the chunk itself
+RESULT = "result"  # Sent last by stream_pipeline; data: result (what run_pipeline returned)
+
+
+class PipelineEvent(str):
+    """A progress message that also carries an event kind, a stage name and structured data."""
+
+    def __new__(cls, kind, text="", stage=None, **data):
+        event = super().__new__(cls, text)
+        event.kind = kind
+        event.stage = stage
+        event.data = data
+        return event
+
+
+def as_event(message):
+    """Wraps a plain progress string as a MESSAGE event; events are returned unchanged."""
+    return message if isinstance(message, PipelineEvent) else PipelineEvent(MESSAGE, str(message))
+
+
+def wants_tokens(callback):
+    return bool(callback) and getattr(callback, 'stream_tokens', False)
+
+
+class EventStream:
+    """A callback that queues events from any thread so that one consumer can iterate over them in order."""
+
+    stream_tokens = True
+
+    def __init__(self):
+        self._queue = queue.Queue()
+
+    def __call__(self, message):
+        self._queue.put(as_event(message))
+
+    def close(self):
+        self._queue.put(None)
+
+    def __iter__(self):
+        while True:
+            event = self._queue.get()
+            if event is None:
+                return
+            yield event
+
+
+class TokenRoute:
+    """An on_token(stage, chunk) handler that forwards to a switchable target, so pooled agents stream to whichever run holds them."""
+
+    def __init__(self, handler=None):
+        self.handler = handler
+
+    def __call__(self, stage, chunk):
+        handler = self.handler
+        if handler:
+            handler(stage, chunk)
+
+
+# The sink for chunks streamed by the LLM call running on the current thread
+_token_sink = threading.local()
+
+
+def forward_token(chunk):
+    """Hands a streamed chunk to the sink of the LLM call running on this thread, if it has one."""
+    sink = getattr(_token_sink, 'sink', None)
+    if sink:
+        sink(chunk)
+
+
+def with_token_sink(instance, sink):
+    """Returns a copy of an LLM whose calls send the chunks streamed on their thread to sink(chunk)."""
+    streaming = copy.copy(instance)
+
+    def wrapper(call):
+        def call_with_sink(*args, **kwargs):
+            previous = getattr(_token_sink, 'sink', None)
+            _token_sink.sink = sink
+            try:
+                return call(*args, **kwargs)
+            finally:
+                _token_sink.sink = previous
+        return call_with_sink
+    wrap_method(streaming, 'call', wrapper)
+    return streaming
@@ -0,0 +1,427 @@
+"""
+Offline stand-ins for the Gemini LLM and the Serper search API.
+
+``FakeLLMBackend`` answers pipeline prompts with deterministic text shaped
+like the real responses (outlines, research summaries, Markdown articles,
+structured edits, stitching fields, reviews), and ``FakeSearchBackend``
+returns Serper-shaped result payloads. Both simulate call latency with a
+``LatencyModel`` and fail a configurable share of calls with a rate limit
+error, so the pipeline's timing, retry and parsing paths can be exercised
+without network access or API quota (see benchmark.py).
+
+Every response and delay is derived from a seed, the request and how often
+that request was made before, so a run produces the same calls and timings
+whatever order concurrent requests arrive in.
+
+``FakeCrewAgent`` stands in for a CrewAI agent: it runs a task as a ReAct
+loop over its LLM and tools on a thread of its own, as CrewAI does for agents
+with a ``max_execution_time``. ``offline_pipeline`` uses it to run main's
+pipeline in tests without CrewAI, network access or the real cache and run
+directories.
+"""
+
+import copy
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from agent_pool import AgentPool
+from cache import DiskCache
+from checkpoints import RunStore
+from edit_ops import HEADING_PATTERN
+from rate_limiter import RateLimiter
+from search_cache import SearchCache
+from structured_logging import agent_step_logger
+from utils import SingleFlight, lazy
+
+LATENCY_DISTRIBUTIONS = ["fixed", "uniform", "lognormal"]
+
+WORDS = (
+    "adoption analysis capacity data deployment efficiency evidence framework growth impact industry "
+    "infrastructure innovation investment market metrics model network outcome pilot platform policy "
+    "productivity research resilience revenue scale sector signal strategy supply system trend workflow"
+).split()
+
+
+class FakeAPIError(Exception):
+    """A simulated API failure; its message looks like a Gemini rate limit response so the limiter retries it."""
+
+
+class LatencyModel:
+    """Simulated call latency: base seconds plus per_token seconds per output token, with jitter.
+
+    jitter is the spread of the distribution: "uniform" scales the delay by a factor in [1 - jitter, 1 + jitter],
+    "lognormal" by a lognormal factor with sigma = jitter (a long right tail, like real API latency), and "fixed"
+    ignores it.
+    """
+
+    def __init__(self, base=0.0, per_token=0.0, jitter=0.0, distribution="lognormal"):
+        if distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {distribution}")
+        self.base = base
+        self.per_token = per_token
+        self.jitter = jitter
+        self.distribution = distribution
+
+    def sample(self, rng, tokens=0):
+        seconds = self.base + self.per_token * tokens
+        if self.distribution == "uniform":
+            seconds *= rng.uniform(max(0.0, 1 - self.jitter), 1 + self.jitter)
+        elif self.distribution == "lognormal" and self.jitter:
+            seconds *= rng.lognormvariate(0, self.jitter)
+        return max(0.0, seconds)
+
+    def as_dict(self):
+        return {'base': self.base, 'per_token': self.per_token, 'jitter': self.jitter, 'distribution': self.distribution}
+
+
+class _FakeBackend:
+    # Shared plumbing: per-request deterministic RNGs, simulated latency and errors, and call counts
+
+    def __init__(self, kind, seed=0, latency=None, error_rate=0.0, retry_delay=0.2, sleep=time.sleep):
+        self.kind = kind
+        self.seed = seed
+        self.latency = latency or LatencyModel()
+        self.error_rate = error_rate
+        self.retry_delay = retry_delay
+        self.sleep = sleep
+        self.stats = {'calls': 0, 'errors': 0, 'simulated_seconds': 0.0}
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def _rng(self, request):
+        # The n-th identical request always gets the same RNG, whichever thread makes it
+        digest = hashlib.sha256(request.encode('utf-8')).hexdigest()[:16]
+        with self._lock:
+            occurrence = self._seen.get(digest, 0)
+            self._seen[digest] = occurrence + 1
+        return random.Random(f"{self.seed}:{self.kind}:{digest}:{occurrence}")
+
+    def _simulate(self, rng, tokens):
+        seconds = self.latency.sample(rng, tokens)
+        failed = rng.random() < self.error_rate
+        with self._lock:
+            self.stats['calls'] += 1
+            self.stats['simulated_seconds'] += seconds
+            self.stats['errors'] += failed
+        if seconds:
+            self.sleep(seconds)
+        if failed:
+            raise FakeAPIError(f'429 RESOURCE_EXHAUSTED (simulated {self.kind} error). "retryDelay": "{self.retry_delay}s"')
+
+
+def _sentence(rng, topic):
+    words = rng.sample(WORDS, 9)
+    number = rng.choice([f"{rng.randint(2, 95)}%", f"${rng.randint(1, 900)} billion", str(rng.randint(2015, 2025))])
+    return f"{topic.capitalize()} {' '.join(words[:4])} reached {number} as {' '.join(words[4:])} improved."
+
+
+def _paragraph(rng, topic, sentences):
+    return ' '.join(_sentence(rng, topic) for _ in range(sentences))
+
+
+def _article(rng, topic, words, headings=None):
+    # A Markdown article of about `words` words: a title, an introduction and one section per heading
+    headings = headings or [f"{rng.choice(WORDS).capitalize()} and {topic}" for _ in range(5)]
+    paragraphs_per_section = max(1, words // (len(headings) * 2 * 14))
+    parts = [f"# {topic.title()}", _paragraph(rng, topic, 3)]
+    for i, heading in enumerate(headings):
+        parts.append(f"## {heading}")
+        parts.extend(_paragraph(rng, topic, 2) for _ in range(paragraphs_per_section))
+        if i == 0:
+            parts.append(f"See the [{rng.choice(WORDS)} report](https://example.com/{rng.choice(WORDS)}/{rng.randint(1, 999)}) for details.")
+    return '\n\n'.join(parts)
+
+
+class FakeLLMBackend(_FakeBackend):
+    """Answers CrewAI agent prompts with deterministic, correctly shaped text after a simulated delay.
+
+    The planner outlines `subtopics` sections, articles run to about `article_words` words, and tasks of the
+    roles in `search_roles` first ask for one web search (as a ReAct tool call) before giving their answer.
+    """
+
+    def __init__(self, seed=0, latency=None, error_rate=0.0, subtopics=5, article_words=2000,
+                 search_roles=("Researcher",), search_tool_name="Search the internet with Serper", **kwargs):
+        super().__init__("llm", seed=seed, latency=latency, error_rate=error_rate, **kwargs)
+        self.subtopics = subtopics
+        self.article_words = article_words
+        self.search_roles = tuple(search_roles)
+        self.search_tool_name = search_tool_name
+
+    def respond(self, messages):
+        """Returns the model output for a list of {'role', 'content'} chat messages."""
+        request = '\n'.join(str(message.get('content', '')) for message in messages)
+        rng = self._rng(request)
+        text = self.compose(messages, rng)
+        self._simulate(rng, (len(text) + 3) // 4)
+        return text
+
+    def compose(self, messages, rng):
+        request = '\n'.join(str(message.get('content', '')) for message in messages)
+        role_match = re.search(r'You are ([^.\n]+)\.', request)
+        role = role_match.group(1).strip() if role_match else ''
+        task_match = re.search(r'Current Task:\s*(.*?)(?:\n\nThis is the expected criteria|\Z)', request, re.DOTALL)
+        task = task_match.group(1).strip() if task_match else request
+        topic_match = re.search(r"(?:topic|about|for):? '([^']+)'", task)
+        topic = topic_match.group(1) if topic_match else "the topic"
+
+        if role in self.search_roles and 'Observation:' not in request:
+            return (
+                "Thought: I should look this up first.\n"
+                f"Action: {self.search_tool_name}\n"
+                f'Action Input: {{"search_query": "{topic} {rng.choice(WORDS)}"}}'
+            )
+        return f"Thought: I now know the final answer\nFinal Answer: {self.answer(task, topic, rng)}"
+
+    def answer(self, task, topic, rng):
+        """The final answer for one task description."""
+        if task.startswith("Plan the structure"):
+            sections = [f"{rng.choice(WORDS).capitalize()} of {topic} {i}" for i in range(1, self.subtopics + 1)]
+            return f"Outline for {topic}:\n" + '\n'.join(f"{i}. {section}" for i, section in enumerate(sections, 1))
+        if task.startswith("Research"):
+            subtopic = re.search(r'Subtopic: (.*?)\. Use', task)
+            return _paragraph(rng, subtopic.group(1) if subtopic else topic, 12)
+        if task.startswith("You are writing one section"):
+            subtopic = re.search(r'Write only the section on: (.*?)\. \n?Base it', task, re.DOTALL)
+            heading = subtopic.group(1).strip() if subtopic else topic
+            words = self.article_words // max(1, self.subtopics)
+            return f"## {heading}\n\n" + '\n\n'.join(_paragraph(rng, topic, 4) for _ in range(max(1, words // 56)))
+        if task.startswith("The following sections of a blog post"):
+            sections = len(re.findall(r'^#{1,6} ', task, re.MULTILINE)) or self.subtopics
+            transitions = '\n'.join(f"TRANSITION {i}: {_sentence(rng, topic)}" for i in range(1, sections))
+            return (
+                f"TITLE: {topic.title()}\nINTRODUCTION:\n{_paragraph(rng, topic, 4)}\n{transitions}\n"
+                f"CONCLUSION:\n{_paragraph(rng, topic, 4)}"
+            )
+        if "Translate the following" in task: # Retries lead with a note on what the last attempt got wrong
+            return task.split("Markdown format:\n\n", 1)[-1]
+        if '<<<EDIT' in task:
+            post = task.split("Here is the blog post:\n", 1)[-1]
+            headings = HEADING_PATTERN.findall(post)
+            section = headings[1] if len(headings) > 1 else 'INTRO'
+            meta = f"META_DESCRIPTION: {_sentence(rng, topic)}\n" if 'META_DESCRIPTION' in task else ''
+            return f"{meta}<<<EDIT\nSECTION: {section}\nACTION: APPEND\nNEW:\n{_paragraph(rng, topic, 3)}\n>>>END"
+        if task.startswith("Review"):
+            return f"Final Review: {_paragraph(rng, topic, 4)}"
+        if task.startswith("Fact-check"):
+            return "Fact-check report:\n" + '\n'.join(f"- {_sentence(rng, topic)} (verified)" for _ in range(5))
+        if task.startswith("Take the following blog post"):
+            return f"META_DESCRIPTION: {_sentence(rng, topic)}\n\n{_article(rng, topic, self.article_words)}"
+        if task.startswith("Generate") or "social media posts" in task:
+            return '\n---\n'.join(f"{_sentence(rng, topic)} #{rng.choice(WORDS)}" for _ in range(4))
+        return _article(rng, topic, self.article_words)
+
+
+class FakeSearchBackend(_FakeBackend):
+    """Returns Serper-shaped search results ({'searchParameters', 'organic': [...]}) after a simulated delay."""
+
+    def __init__(self, seed=0, latency=None, error_rate=0.0, results=8, **kwargs):
+        super().__init__("search", seed=seed, latency=latency, error_rate=error_rate, **kwargs)
+        self.results = results
+
+    def search(self, query):
+        rng = self._rng(query)
+        organic = [
+            {
+                'title': f"{rng.choice(WORDS).capitalize()} {rng.choice(WORDS)} in {query}"[:80],
+                'link': f"https://example.com/{rng.choice(WORDS)}/{rng.randint(1, 9999)}",
+                'snippet': f"{i}. {rng.choice(WORDS).capitalize()} {rng.choice(WORDS)} {rng.choice(WORDS)} {rng.choice(WORDS)}",
+                'position': i,
+            }
+            for i in range(1, self.results + 1)
+        ]
+        payload = {'searchParameters': {'q': query, 'type': 'search'}, 'organic': organic}
+        self._simulate(rng, sum(len(item['snippet']) for item in organic) // 4)
+        return payload
+
+
+class FakeLLMClient:
+    """An LLM client in the shape main expects (model, temperature, call(messages)) answering from a FakeLLMBackend."""
+
+    def __init__(self, backend, model="fake/gemini-2.0-flash", temperature=0.2):
+        self.backend = backend
+        self.model = model
+        self.temperature = temperature
+
+    def call(self, messages, *args, **kwargs):
+        if isinstance(messages, str):
+            messages = [{'role': 'user', 'content': messages}]
+        return self.backend.respond(messages)
+
+
+class FakeSearchClient:
+    """A search tool in the shape of SerperDevTool (name, _run(search_query=...)) answering from a FakeSearchBackend."""
+
+    name = "Search the internet with Serper"
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def _run(self, search_query, **kwargs):
+        return self.backend.search(search_query)
+
+    def run(self, **kwargs):
+        return self._run(**kwargs)
+
+
+class AgentAction:
+    """A tool-using step, as handed to a CrewAI agent's step_callback."""
+
+    def __init__(self, thought, tool, text, result):
+        self.thought = thought
+        self.tool = tool
+        self.text = text
+        self.result = result
+
+
+class AgentFinish:
+    """The final step of a task, as handed to a CrewAI agent's step_callback."""
+
+    def __init__(self, thought, output, text):
+        self.thought = thought
+        self.output = output
+        self.text = text
+
+
+class FakeCrewAgent:
+    """Stands in for a CrewAI agent: runs a task as a ReAct loop of LLM calls and tool calls up to a final answer.
+
+    Like a CrewAI agent with a max_execution_time, each task runs on a thread of its own executor, which does not
+    carry the caller's context variables.
+    """
+
+    def __init__(self, role, goal='', llm=None, tools=None, step_callback=None):
+        self.role = role
+        self.goal = goal
+        self.llm = llm
+        self.tools = list(tools or [])
+        self.step_callback = step_callback
+        self.max_iter = 5
+        self.max_execution_time = None
+        self.allow_delegation = True
+
+    def copy(self):
+        # As in CrewAI, a copy gets a shallow copy of the LLM and shares the tools
+        agent = FakeCrewAgent(self.role, self.goal, copy.copy(self.llm), self.tools, self.step_callback)
+        agent.max_iter, agent.max_execution_time, agent.allow_delegation = self.max_iter, self.max_execution_time, self.allow_delegation
+        return agent
+
+    def run_task(self, description, expected_output):
+        """Returns the final answer to a task."""
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            return executor.submit(self._run_task, description, expected_output).result(timeout=self.max_execution_time)
+        finally:
+            executor.shutdown(wait=False)
+
+    def _run_task(self, description, expected_output):
+        messages = [
+            {'role': 'system', 'content': f"You are {self.role}. {self.goal}\nYour personal goal is: {self.goal}"},
+            {'role': 'user', 'content': f"\nCurrent Task: {description}\n\nThis is the expected criteria for your final answer: {expected_output}"},
+        ]
+        for _ in range(self.max_iter):
+            text = self.llm.call(messages)
+            thought = text.split('\n', 1)[0].replace('Thought:', '').strip()
+            if 'Final Answer:' in text:
+                answer = text.split('Final Answer:', 1)[1].strip()
+                self._step(AgentFinish(thought, answer, text))
+                return answer
+            action = re.search(r'Action: (.*)\nAction Input: (\{.*\})', text)
+            tool = next((tool for tool in self.tools if action and tool.name == action.group(1).strip()), None)
+            observation = tool._run(**json.loads(action.group(2))) if tool else "Error: no such tool"
+            self._step(AgentAction(thought, action.group(1).strip() if action else None, text, observation))
+            messages[-1]['content'] += f"\n{text}\nObservation: {observation}"
+        return "Agent stopped due to iteration limit or time limit."
+
+    def _step(self, step):
+        if self.step_callback:
+            self.step_callback(step)
+
+
+class FakeAgent:
+    """Stands in for agents.BaseAgent: a named role around a FakeCrewAgent."""
+
+    def __init__(self, name, role, description, llm, tools=None):
+        self.name = name
+        self.role = role
+        self.description = description
+        self.llm = llm
+        self.tools = tools or []
+        self.crew_agent = FakeCrewAgent(role, description, llm, self.tools, step_callback=agent_step_logger(name))
+
+
+# main's agent classes and the (name, role) of the agents they build
+AGENT_CLASSES = {
+    'PlannerAgent': ("Planner", "Planner"),
+    'ResearcherAgent': ("Researcher", "Researcher"),
+    'WriterAgent': ("Writer", "Writer"),
+    'ReviewerAgent': ("Reviewer", "Reviewer"),
+    'EditorAgent': ("Editor", "Editor"),
+    'SEOAgent': ("SEO Specialist", "SEO Specialist"),
+    'FactCheckerAgent': ("Fact Checker", "Fact Checker"),
+    'TranslatorAgent': ("Translator", "Translator"),
+}
+
+
+def _fake_agent_class(name, role):
+    # Takes the same arguments as the classes in agents/
+    def build(llm, tools=None, description=''):
+        return FakeAgent(name, role, description, llm, tools)
+    return build
+
+
+@contextmanager
+def offline_pipeline(main, workdir, llm_backend=None, search_backend=None):
+    """Makes main run its pipeline offline inside the with block; yields (llm_backend, search_backend).
+
+    Agents are FakeAgents whose LLM and search tool answer from the fake backends through main's own wrappers
+    (rate limiting, caching, tracing). Checkpoints and caches live under workdir, agent pools start empty and rate
+    limits are lifted. Everything is restored on exit.
+    """
+    llm_backend = llm_backend or FakeLLMBackend()
+    search_backend = search_backend or FakeSearchBackend()
+    llm = FakeLLMClient(llm_backend)
+    translation_llm = FakeLLMClient(llm_backend, model="fake/gemini-2.0-flash-lite")
+    cache_dir, runs_dir = os.path.join(workdir, 'cache'), os.path.join(workdir, 'runs')
+    search_cache = DiskCache(os.path.join(cache_dir, 'search_cache.sqlite3'))
+    overrides = {
+        'CACHE_DIR': cache_dir,
+        'RUNS_DIR': runs_dir,
+        'run_store': RunStore(runs_dir),
+        'stage_memo': DiskCache(os.path.join(cache_dir, 'stage_memo.sqlite3')),
+        'llm_cache': DiskCache(os.path.join(cache_dir, 'llm_cache.sqlite3')),
+        'search_cache': search_cache,
+        'search_result_cache': SearchCache(search_cache),
+        'llm_rate_limiter': RateLimiter("gemini", 1e6, burst=1e6),
+        'search_rate_limiter': RateLimiter("serper", 1e6, burst=1e6),
+        'content_llms': lazy(lambda: (llm, main.instrument_llm(llm))),
+        'translation_llms': lazy(lambda: (translation_llm, main.instrument_llm(translation_llm))),
+        'get_search_tool': lazy(lambda: main.instrument_search_tool(FakeSearchClient(search_backend))),
+        'kickoff_task': lambda crew_agent, description, expected_output: crew_agent.run_task(description, expected_output),
+        'setup_logging': lambda: None,
+        'pipeline_flights': SingleFlight(ttl=main.COALESCE_RESULT_TTL, keep=main.is_successful_result),
+        'bypass_flights': SingleFlight(),
+        'agent_pools': {
+            use_cache: AgentPool(lambda use_cache=use_cache: main.build_pooled_agents(use_cache), kind='agent_set' if use_cache else 'agent_set_uncached', stats=main.construction_stats)
+            for use_cache in (True, False)
+        },
+        'translator_pools': {
+            use_cache: AgentPool(lambda use_cache=use_cache: main.build_translator(use_cache), kind='translator' if use_cache else 'translator_uncached', stats=main.construction_stats)
+            for use_cache in (True, False)
+        },
+        **{class_name: _fake_agent_class(name, role) for class_name, (name, role) in AGENT_CLASSES.items()},
+    }
+    saved = {name: getattr(main, name) for name in overrides}
+    for name, value in overrides.items():
+        setattr(main, name, value)
+    try:
+        yield llm_backend, search_backend
+    finally:
+        for name, value in saved.items():
+            setattr(main, name, value)
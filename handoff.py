@@ -0,0 +1,119 @@
+"""
+Streaming handoff between pipeline stages.
+
+``stream_results`` runs a function over a list of items on a worker pool and
+yields each result as soon as it is pushed onto the completion queue, so the
+next stage can start on finished items instead of waiting for the slowest one.
+A straggler deadline bounds how long a run waits: an item that has been running
+that long is no longer waited for, and is either deferred (its result is handed
+to a callback whenever it finishes) or dropped.
+``Prefetcher`` is the consuming side: it starts downstream work per item as
+results arrive, and the next stage later takes the finished work by key.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+STRAGGLER_POLICIES = ["defer", "drop"]
+
+# Status values yielded alongside each item
+DONE, ERROR, DEFERRED, DROPPED = "done", "error", "deferred", "dropped"
+
+# Queue message of a worker that started on an item
+_STARTED = object()
+
+
+def stream_results(fn, items, max_workers=4, deadline=None, straggler_policy="defer", on_late=None, clock=time.monotonic):
+    """Calls fn(item) for every item concurrently and yields (item, result, status) as items finish.
+
+    status is "done" (result is fn's return value) or "error" (result is the exception). An item that has been
+    running for deadline seconds is a straggler: it is yielded once with status "deferred" (or "dropped" with the
+    "drop" policy) and no longer waited for. When a deferred item finishes, on_late(item, result, status) is called
+    from its worker thread; a dropped item's result is discarded. An item's deadline starts when a worker picks it
+    up, so items queued behind busy workers are never stragglers, and nothing is given up on before at least one
+    item has finished, so a run always has something to work with.
+    """
+    if straggler_policy not in STRAGGLER_POLICIES:
+        raise ValueError(f"Unknown straggler policy: {straggler_policy}")
+    items = list(items)
+    if not items:
+        return
+    completed = queue.Queue()
+    lock = threading.Lock()
+    reported, given_up = set(), {}  # Indexes whose result was queued, and stragglers -> DEFERRED/DROPPED
+
+    def work(index):
+        completed.put((index, _STARTED, clock()))
+        try:
+            result, status = fn(items[index]), DONE
+        except Exception as e:
+            result, status = e, ERROR
+        with lock:
+            late = given_up.get(index)
+            if late is None:
+                reported.add(index)
+                completed.put((index, result, status))
+        if late == DEFERRED and on_late:
+            on_late(items[index], result, status)
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items))))
+    pending = set(range(len(items)))
+    started = {}  # Running items -> when their worker started on them
+    try:
+        for index in range(len(items)):
+            executor.submit(work, index)
+        finished = 0
+        while pending:
+            # Until the first item finishes there is nothing to work with, so the deadline only applies after that
+            timeout = None
+            if deadline and finished and started:
+                timeout = max(0.0, min(started.values()) + deadline - clock())
+            try:
+                index, result, status = completed.get(timeout=timeout)
+            except queue.Empty:
+                now = clock()
+                for index in sorted(started):
+                    if now - started[index] < deadline:
+                        continue
+                    with lock:
+                        if index in reported:  # Finished just now; its result is already queued
+                            continue
+                        given_up[index] = DROPPED if straggler_policy == "drop" else DEFERRED
+                    del started[index]
+                    pending.discard(index)
+                    yield items[index], None, given_up[index]
+                continue
+            if result is _STARTED:
+                started[index] = status
+                continue
+            started.pop(index, None)
+            pending.discard(index)
+            finished += 1
+            yield items[index], result, status
+    finally:
+        # Stragglers keep their worker thread until they return, but nothing waits for them. Items not yet started
+        # when the caller stops early are cancelled.
+        executor.shutdown(wait=not (given_up or pending), cancel_futures=bool(pending))
+
+
+class Prefetcher:
+    """Starts fn(key, value) on a worker pool as soon as a value arrives; the next stage takes the futures by key."""
+
+    def __init__(self, fn, max_workers=4):
+        self.fn = fn
+        self.futures = {}
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+
+    def submit(self, key, value):
+        if key not in self.futures:
+            self.futures[key] = self._executor.submit(self.fn, key, value)
+
+    def take(self, key):
+        """Returns the future started for key (removing it), or None if nothing was prefetched."""
+        return self.futures.pop(key, None)
+
+    def close(self):
+        # Work nobody took is cancelled if it has not started yet and otherwise left to finish in the background
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,238 @@
+"""
+Background jobs for pipeline runs.
+
+``JobManager`` runs submitted jobs on a bounded local worker pool, so a web
+session only submits a run and polls for it instead of executing it in its own
+thread. Each job's status, progress messages and result are persisted as one
+JSON file per job, so a browser refresh (or reconnect) can pick a job up again
+by ID. Each job records the manager that owns it, which refreshes the job's
+``updated_at`` while it is queued or running. On startup, queued or running
+jobs whose owner process is gone or whose heartbeat went stale are marked
+``interrupted`` and can be resumed; jobs another live process (e.g. a second
+web worker) is still running are left alone.
+
+Jobs submitted with a request key are coalesced: a job whose key matches one
+that is still queued or running (or completed within ``result_ttl`` seconds)
+attaches to that job instead of starting another run.
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from checkpoints import RUN_ID_PATTERN
+from events import STAGE_STARTED, STAGE_COMPLETED, TOKEN, as_event
+
+# Job IDs double as pipeline run IDs, so resuming a job resumes its run from the last checkpoint
+JOB_ID_PATTERN = RUN_ID_PATTERN
+ACTIVE_STATUSES = ('queued', 'running')
+RESUMABLE_STATUSES = ('failed', 'interrupted')
+
+
+class JobManager:
+    """Runs runner(params, callback, job_id) for each submitted job, at most max_workers at a time."""
+
+    def __init__(self, root, runner, max_workers=2, max_messages=50, result_ttl=0, heartbeat=30.0, stale_after=None):
+        self.root = root
+        self.runner = runner
+        self.max_messages = max_messages
+        self.result_ttl = result_ttl
+        # This manager's jobs are marked with its owner ID and touched every `heartbeat` seconds while unfinished;
+        # another manager treats them as abandoned once the owner process is gone or `stale_after` seconds pass
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.heartbeat = heartbeat
+        self.stale_after = stale_after or 4 * heartbeat
+        self._owned = set()  # IDs of this manager's queued and running jobs
+        self._stopped = threading.Event()
+        self._keys = {}  # request key -> ID of the latest job submitted with it
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='job')
+        self._lock = threading.Lock()
+        self._live = {}  # job_id -> in-memory progress (streamed draft text) that is not worth persisting
+        self._recover()
+        threading.Thread(target=self._beat, name='job-heartbeat', daemon=True).start()
+
+    def new_job_id(self):
+        return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+    def _path(self, job_id):
+        if not job_id or not JOB_ID_PATTERN.match(job_id):
+            raise ValueError(f"Invalid job ID: {job_id!r}")
+        return os.path.join(self.root, f"{job_id}.json")
+
+    def _write(self, job):
+        # Write to a temporary file first so readers never see a half-written job
+        path = self._path(job['id'])
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(job, f, ensure_ascii=False, indent=2, default=str)
+        os.replace(tmp_path, path)
+
+    def _load(self, job_id):
+        path = self._path(job_id)
+        if not os.path.isfile(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _change(self, job, message=None, **fields):
+        # Applies fields and a progress message to a loaded job and writes it; the caller holds self._lock
+        job.update(fields)
+        if message:
+            job['messages'] = (job['messages'] + [message])[-self.max_messages:]
+        job['updated_at'] = time.time()
+        self._write(job)
+        return job
+
+    def _update(self, job_id, message=None, **fields):
+        with self._lock:
+            return self._change(self._load(job_id), message, **fields)
+
+    def _beat(self):
+        # Heartbeat for this manager's unfinished jobs, so other managers can tell they are still alive
+        while not self._stopped.wait(self.heartbeat):
+            with self._lock:
+                for job_id in list(self._owned):
+                    job = self._load(job_id)
+                    if job and job['status'] in ACTIVE_STATUSES and job.get('owner') == self.owner:
+                        self._change(job)
+
+    def _abandoned(self, job):
+        # An unfinished job whose owner stopped: its process is gone, or it has not touched the job for too long
+        if time.time() - job['updated_at'] > self.stale_after:
+            return True
+        host, _, rest = (job.get('owner') or '').partition(':')
+        pid = rest.partition(':')[0]
+        if host != socket.gethostname() or not pid.isdigit():
+            return not job.get('owner')  # Another host's process can only be judged by its heartbeat
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return True
+        except OSError:
+            pass  # The process exists but belongs to someone else
+        return False
+
+    def _recover(self):
+        # Jobs left unfinished by a process that stopped will never complete; those of live processes are theirs
+        for job in reversed(self.list_jobs(limit=None)):
+            if job['status'] in ACTIVE_STATUSES and self._abandoned(job):
+                self._update(job['id'], message="Interrupted by a server restart.", status='interrupted')
+            if job.get('key'):
+                self._keys[job['key']] = job['id']
+
+    def _attachable(self, key, reuse_result):
+        # The job an identical request can attach to: one still queued or running, or one that completed recently
+        job = self._load(self._keys[key]) if key in self._keys else None
+        if not job:
+            return None
+        if job['status'] in ACTIVE_STATUSES:
+            return job
+        if reuse_result and job['status'] == 'completed' and job['finished_at'] >= time.time() - self.result_ttl:
+            return job
+        return None
+
+    def submit(self, params, job_id=None, key=None, reuse_result=True):
+        """Queues a job and returns its ID, or the ID of the identical job (same key) it was attached to.
+
+        reuse_result=False only attaches to a job that is still queued or running, never to a finished one.
+        """
+        job_id = job_id or self.new_job_id()
+        now = time.time()
+        with self._lock:
+            existing = self._attachable(key, reuse_result) if key else None
+            if existing:
+                existing['requests'] = existing.get('requests', 1) + 1
+                self._write(existing)
+                return existing['id']
+            self._write({
+                'id': job_id, 'status': 'queued', 'params': params, 'key': key, 'requests': 1, 'created_at': now, 'updated_at': now,
+                'started_at': None, 'finished_at': None, 'stage': None, 'messages': [], 'result': None, 'error': None,
+                'traceback': None, 'owner': self.owner,
+            })
+            self._owned.add(job_id)
+            if key:
+                self._keys[key] = job_id
+        self._executor.submit(self._run, job_id)
+        return job_id
+
+    def resume(self, job_id):
+        """Queues a failed or interrupted job again under the same ID; returns False if it cannot be resumed."""
+        # Check and claim the job in one step, so concurrent resumes of the same job queue it only once
+        with self._lock:
+            job = self._load(job_id)
+            if not job or job['status'] not in RESUMABLE_STATUSES:
+                return False
+            self._change(job, message="Resumed.", status='queued', error=None, traceback=None, finished_at=None, owner=self.owner)
+            self._owned.add(job_id)
+        self._executor.submit(self._run, job_id)
+        return True
+
+    def get(self, job_id):
+        """Returns the job record (plus any live progress), or None if there is no such job."""
+        job = self._load(job_id)
+        if job is not None:
+            job.update(self._live.get(job_id, {}))
+        return job
+
+    def list_jobs(self, limit=20):
+        """Returns job records, most recent first."""
+        if not os.path.isdir(self.root):
+            return []
+        jobs = [self._load(name[:-len('.json')]) for name in os.listdir(self.root) if name.endswith('.json')]
+        jobs = sorted((job for job in jobs if job), key=lambda job: job['created_at'], reverse=True)
+        return jobs if limit is None else jobs[:limit]
+
+    def queue_position(self, job_id):
+        """Number of queued jobs submitted before this one (0 when it is next or already running)."""
+        job = self._load(job_id)
+        if not job or job['status'] != 'queued':
+            return 0
+        return sum(1 for other in self.list_jobs(limit=None) if other['status'] == 'queued' and other['created_at'] < job['created_at'])
+
+    def _run(self, job_id):
+        job = self._update(job_id, message="Started.", status='running', started_at=time.time())
+        self._live[job_id] = {'draft': '', 'draft_stage': None}
+        try:
+            result = self.runner(job['params'], JobCallback(self, job_id), job_id)
+        except Exception as e:
+            self._update(job_id, message=f"Failed: {e}", status='failed', error=str(e), traceback=traceback.format_exc(), finished_at=time.time())
+        else:
+            self._update(job_id, message="Completed.", status='completed', result=result, finished_at=time.time())
+        finally:
+            self._live.pop(job_id, None)
+            self._owned.discard(job_id)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+        if wait:
+            self._stopped.set()  # Jobs left running (wait=False) keep their heartbeat
+
+
+class JobCallback:
+    """Pipeline callback that records a job's progress: stage events and messages on disk, streamed text in memory."""
+
+    stream_tokens = True
+
+    def __init__(self, manager, job_id):
+        self.manager = manager
+        self.job_id = job_id
+
+    def __call__(self, message):
+        event = as_event(message)
+        live = self.manager._live.setdefault(self.job_id, {'draft': '', 'draft_stage': None})
+        if event.kind == TOKEN:
+            if live['draft_stage'] != event.stage:
+                live.update(draft='', draft_stage=event.stage)
+            live['draft'] += event
+            return
+        if event.kind == STAGE_COMPLETED and isinstance(event.data.get('output'), str):
+            live.update(draft=event.data['output'], draft_stage=event.stage)
+        text = str(event).strip()
+        fields = {'stage': event.stage} if event.kind == STAGE_STARTED else {}
+        self.manager._update(self.job_id, message=text[:500] if text else None, **fields)
@@ -1,12 +1,12 @@
 import os
+import copy
 from dotenv import load_dotenv
-from langchain_google_genai import ChatGoogleGenerativeAI
-from crewai_tools import SerperDevTool
-from crewai import Task, Crew, LLM
 import time
 import re
-import markdown
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import logging
+from contextlib import contextmanager, nullcontext
 
 from agents.planner_agent import PlannerAgent
 from agents.researcher_agent import ResearcherAgent
@@ -15,6 +15,24 @@ from agents.reviewer_agent import ReviewerAgent
 from agents.editor_agent import EditorAgent
 from agents.seo_agent import SEOAgent
 from agents.fact_checker_agent import FactCheckerAgent
+from agents.translator_agent import TranslatorAgent
+from rate_limiter import RateLimiter, is_rate_limit_error, parse_retry_delay
+from cache import DiskCache, LLMResponseCache
+from search_cache import SearchCache
+from cassettes import Cassette, task_label
+from checkpoints import RunStore, stage_memo_key, normalize_topic
+from translation import mask_urls, unmask_urls, structure_mismatches
+from sections import ensure_section_heading, section_digest, parse_stitch_output, assemble_article
+from edit_ops import EDIT_FORMAT, EditError, apply_edit_response
+from token_budget import ContextBudget, estimate_tokens
+from trends import TrendStore
+from handoff import stream_results, Prefetcher, DONE, DEFERRED, DROPPED, ERROR
+from events import PipelineEvent, EventStream, STAGE_STARTED, STAGE_COMPLETED, TOKEN, RESULT, TokenRoute, wants_tokens, forward_token, with_token_sink
+from agent_pool import AgentPool, ConstructionStats
+from tracing import Tracer, Metrics, SpanBinding, propagate, start_metrics_server, current_span, thread_span
+from profiling import SamplingProfiler, profiling_requested, requested_interval
+from structured_logging import configure_logging, parse_levels, level_number
+from utils import wrap_method, SingleFlight, lazy
 
 # Load environment variables
 load_dotenv()
@@ -22,24 +40,267 @@ GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 SERPER_API_KEY = os.getenv('SERPER_API_KEY')
 
-# Set up the LLM (Gemini 2.0 Flash) using CrewAI's LLM class
-llm = LLM(
-    model="gemini/gemini-2.0-flash",
-    api_key=GEMINI_API_KEY,
-    temperature=0.2
+# Directory for on-disk caches shared by all sessions and processes
+CACHE_DIR = os.getenv('CONTENT_STUDIO_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache'))
+
+# Directory holding per-run stage checkpoints used to resume failed runs
+RUNS_DIR = os.getenv('CONTENT_STUDIO_RUNS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'runs'))
+run_store = RunStore(RUNS_DIR)
+
+# Background jobs submitted from the web UI (see jobs.py): where their status and results are kept, and how many
+# pipeline runs execute at once across all sessions
+JOBS_DIR = os.getenv('CONTENT_STUDIO_JOBS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jobs'))
+JOB_MAX_WORKERS = int(os.getenv('JOB_MAX_WORKERS', '2'))
+
+# Identical generation requests (same normalized topic, format, language, tone and length) running at the same
+# time share one execution; a successful result is also handed to identical requests for this many seconds after
+COALESCE_REQUESTS = os.getenv('COALESCE_REQUESTS', '1') == '1'
+COALESCE_RESULT_TTL = float(os.getenv('COALESCE_RESULT_TTL', '120'))
+
+# Maximum number of research subtopics in flight at once (set to 1 for serial research)
+RESEARCH_MAX_WORKERS = int(os.getenv('RESEARCH_MAX_WORKERS', '4'))
+
+# Research results are handed downstream as each subtopic finishes. Subtopics that have been running this many
+# seconds once another subtopic finished (0 = no deadline) are stragglers: the research stage moves on without
+# them, and their results are either "defer"red (saved with the run as late research when they arrive, and used
+# when it is resumed) or "drop"ped.
+RESEARCH_STRAGGLER_TIMEOUT = float(os.getenv('RESEARCH_STRAGGLER_TIMEOUT', '240'))
+RESEARCH_STRAGGLER_POLICY = os.getenv('RESEARCH_STRAGGLER_POLICY', 'defer')
+
+# Blog post writing mode: "single" writes the whole post in one LLM call, "sectioned" writes one section per
+# research subtopic concurrently and stitches them together with a short intro/transition/conclusion pass
+WRITING_MODES = ["single", "sectioned"]
+WRITING_MODE = os.getenv('WRITING_MODE', 'single')
+SECTION_MAX_WORKERS = int(os.getenv('SECTION_MAX_WORKERS', '4'))
+
+# Blog post editing mode for the Editor and SEO stages: "rewrite" makes the model re-emit the whole post,
+# "patch" asks only for structured edits that are applied locally (falling back to a rewrite if they don't apply)
+EDIT_MODES = ["rewrite", "patch"]
+EDIT_MODE = os.getenv('EDIT_MODE', 'rewrite')
+
+# Input budgets (estimated tokens, 0 = unlimited) for the research and drafts inlined into downstream prompts.
+# Research is deduped across subtopics and extractively trimmed to fit; the Editor and SEO stages rewrite the
+# whole post, so their input is only measured.
+CONTEXT_COMPACTION_ENABLED = os.getenv('CONTEXT_COMPACTION_ENABLED', '1') == '1'
+CONTEXT_BUDGETS = {
+    'writer': int(os.getenv('WRITER_CONTEXT_TOKENS', '3000')),
+    'section_writer': int(os.getenv('SECTION_CONTEXT_TOKENS', '1000')),
+    'reviewer': int(os.getenv('REVIEWER_CONTEXT_TOKENS', '2000')),
+    'fact_checker': int(os.getenv('FACT_CHECKER_CONTEXT_TOKENS', '2500')),
+}
+
+# Stream LLM responses so callers that ask for tokens (see events.py) can show output as it is generated
+STREAM_TOKENS = os.getenv('STREAM_TOKENS', '1') == '1'
+
+# CrewAI, its tools and the LLM clients are slow to import and construct, so they are only built on first use
+# (see content_llms, translation_llms and get_search_tool); importing this module stays fast
+
+# Translation only rewrites finished text, so it runs on a cheaper, faster model
+TRANSLATION_MODEL = os.getenv('TRANSLATION_MODEL', 'gemini/gemini-2.0-flash-lite')
+
+# Maximum number of translations running at once in the multi-language mode
+TRANSLATION_MAX_WORKERS = int(os.getenv('TRANSLATION_MAX_WORKERS', '3'))
+
+# Route every LLM and search call through shared, process-wide rate limiters
+llm_rate_limiter = RateLimiter(
+    "gemini",
+    requests_per_minute=float(os.getenv('LLM_REQUESTS_PER_MINUTE', '15')),
+    burst=float(os.getenv('LLM_BURST', '3'))
+)
+search_rate_limiter = RateLimiter(
+    "serper",
+    requests_per_minute=float(os.getenv('SEARCH_REQUESTS_PER_MINUTE', '300')),
+    burst=float(os.getenv('SEARCH_BURST', '5'))
+)
+
+# Cache LLM responses on disk so identical agent/prompt/model/temperature calls are only paid for once
+llm_cache = DiskCache(
+    os.path.join(CACHE_DIR, 'llm_cache.sqlite3'),
+    max_entries=int(os.getenv('LLM_CACHE_MAX_ENTRIES', '2000')),
+    ttl=float(os.getenv('LLM_CACHE_TTL_HOURS', '168')) * 3600
+)
+
+# Record every LLM and search call to a compressed cassette file, or replay a recorded one offline with its
+# original timings scaled by CASSETTE_TIME_SCALE (see cassettes.py). Caches are bypassed while a cassette is in use,
+# so that every call is recorded and every recorded call is replayed.
+CASSETTE_MODE = os.getenv('CASSETTE_MODE', '')
+cassette = Cassette(
+    os.getenv('CASSETTE_PATH', os.path.join(CACHE_DIR, 'cassette.jsonl.gz')),
+    mode=CASSETTE_MODE,
+    time_scale=float(os.getenv('CASSETTE_TIME_SCALE', '1'))
+) if CASSETTE_MODE else None
+
+# Spans for every run, stage, agent task and LLM/search call (see tracing.py). A run's finished spans are appended to
+# trace.jsonl in its run directory, and their durations and counters (estimated tokens, API requests, retries, cache
+# hits) feed the metrics served in the Prometheus text format on METRICS_PORT (0 = no endpoint).
+TRACING_ENABLED = os.getenv('TRACING_ENABLED', '1') == '1'
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+tracer = Tracer(
+    Metrics(window=int(os.getenv('METRICS_WINDOW', '500'))),
+    trace_path=lambda run_id: os.path.join(run_store.run_dir(run_id), 'trace.jsonl'),
+    enabled=TRACING_ENABLED
+)
+
+@lazy
+def serve_metrics():
+    """Starts the metrics endpoint once per process, if METRICS_PORT is set; returns the server or None."""
+    if not METRICS_PORT:
+        return None
+    try:
+        server = start_metrics_server(tracer.metrics, METRICS_PORT, METRICS_HOST)
+    except OSError as e:
+        # Another server process already serves this port
+        logging.warning(f"Metrics endpoint not started on {METRICS_HOST}:{METRICS_PORT}: {e}")
+        return None
+    logging.info(f"Serving metrics at http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+    return server
+
+# Opt-in sampling profiler (see profiling.py). With PROFILE_STAGES=1 every executed stage is sampled every
+# PROFILE_INTERVAL_MS, including the worker threads it hands work to, and its wall and CPU profiles are written as
+# collapsed stacks to runs/<run_id>/profile/<stage>.wall.collapsed and <stage>.cpu.collapsed. Needs TRACING_ENABLED.
+PROFILE_STAGES = profiling_requested()
+
+def stage_of_thread(ident):
+    # The stage span a thread is working for, so workers of concurrent stages are sampled into the right profile
+    span = thread_span(ident)
+    stage = span.ancestor('stage') if span else None
+    return stage.span_id if stage else None
+
+profiler = SamplingProfiler(interval=requested_interval(), label=stage_of_thread)
+
+def stage_latency_report():
+    """Returns {stage: {count, p50, p95, p99}} in seconds over this process's recent runs."""
+    return tracer.metrics.percentiles('stage_seconds', 'name')
+
+def llm_usage(args, kwargs, response):
+    # Estimated prompt and completion tokens of an LLM call, for its span and the token counters
+    messages = args[0] if args else kwargs.get('messages', '')
+    if isinstance(messages, list):
+        messages = '\n'.join(str(message.get('content', '')) if isinstance(message, dict) else str(message) for message in messages)
+    return {'prompt_tokens': estimate_tokens(str(messages)), 'completion_tokens': estimate_tokens(str(response or ''))}
+
+def replay_stream(response):
+    # Replayed responses arrive all at once; stream them in word-sized chunks as the live LLM would have
+    if STREAM_TOKENS and isinstance(response, str):
+        for chunk in re.findall(r'\S+\s*', response):
+            forward_token(chunk)
+
+def instrument_llm(instance):
+    # Route an LLM through the cassette (if any), the shared rate limiter and the response cache, traced as one span
+    # per call. Returns an uncached twin that still goes through the rate limiter, used for runs that bypass the cache.
+    trace_call, count_request = tracer.call_wrappers('llm', instance.model, measure=llm_usage)
+    if cassette:
+        wrap_method(instance, 'call', lambda call: cassette.wrap(
+            'llm', call, lambda messages, *args, **kwargs: {'model': instance.model, 'messages': messages},
+            on_replay=replay_stream, label=lambda request: task_label(request['messages'])
+        ))
+    wrap_method(instance, 'call', count_request)
+    wrap_method(instance, 'call', llm_rate_limiter.wrap)
+    uncached = copy.copy(instance)
+    if os.getenv('LLM_CACHE_ENABLED', '1') == '1' and not cassette:
+        wrap_method(instance, 'call', lambda call: LLMResponseCache(llm_cache).wrap(call, instance))
+    wrap_method(instance, 'call', trace_call)
+    wrap_method(uncached, 'call', trace_call)
+    return uncached
+
+@lazy
+def content_llms():
+    # The Gemini 2.0 Flash LLM every agent uses and its uncached twin
+    from crewai import LLM
+    from crewai.utilities.events import crewai_event_bus
+    from crewai.utilities.events.llm_events import LLMStreamChunkEvent
+    llm = LLM(
+        model="gemini/gemini-2.0-flash",
+        api_key=GEMINI_API_KEY,
+        temperature=0.2,
+        stream=STREAM_TOKENS
+    )
+
+    # CrewAI publishes streamed chunks on its global event bus; route each one to the sink of the call that produced it
+    @crewai_event_bus.on(LLMStreamChunkEvent)
+    def on_llm_stream_chunk(source, event):
+        forward_token(event.chunk)
+
+    return llm, instrument_llm(llm)
+
+@lazy
+def translation_llms():
+    # The translation LLM and its uncached twin
+    from crewai import LLM
+    translation_llm = LLM(
+        model=TRANSLATION_MODEL,
+        api_key=GEMINI_API_KEY,
+        temperature=0.2
+    )
+    return translation_llm, instrument_llm(translation_llm)
+
+# Cache search results (shared by every agent, run and process) and coalesce concurrent identical queries
+search_cache = DiskCache(
+    os.path.join(CACHE_DIR, 'search_cache.sqlite3'),
+    max_entries=int(os.getenv('SEARCH_CACHE_MAX_ENTRIES', '5000')),
+    ttl=float(os.getenv('SEARCH_CACHE_TTL_HOURS', '6')) * 3600
 )
+search_result_cache = SearchCache(search_cache)
 
-# Set up the search tool
-search_tool = SerperDevTool()
-tools = [search_tool]
+def instrument_search_tool(search_tool):
+    # Route a search tool through the cassette (if any), the shared rate limiter and the search cache, traced as one
+    # span per search
+    trace_call, count_request = tracer.call_wrappers('search', search_tool.name)
+    if cassette:
+        wrap_method(search_tool, '_run', lambda run: cassette.wrap('search', run, lambda *args, **kwargs: {'tool': search_tool.name, 'args': kwargs}))
+    wrap_method(search_tool, '_run', count_request)
+    wrap_method(search_tool, '_run', search_rate_limiter.wrap)
+    if os.getenv('SEARCH_CACHE_ENABLED', '1') == '1' and not cassette:
+        wrap_method(search_tool, '_run', lambda run: search_result_cache.wrap(run, search_tool))
+    wrap_method(search_tool, '_run', trace_call)
+    return search_tool
 
-# Set up logging
-logging.basicConfig(
-    filename='app.log',
-    level=logging.INFO,
-    format='%(asctime)s %(levelname)s %(message)s'
+@lazy
+def get_search_tool():
+    """Returns the shared Serper search tool, rate limited and cached, building it on first use."""
+    from crewai_tools import SerperDevTool
+    return instrument_search_tool(SerperDevTool())
+
+# Stage outputs addressed by the inputs each stage depends on, so changing only the tone/language/format
+# of a topic reuses earlier planner and research outputs instead of rerunning them
+stage_memo = DiskCache(
+    os.path.join(CACHE_DIR, 'stage_memo.sqlite3'),
+    max_entries=int(os.getenv('STAGE_MEMO_MAX_ENTRIES', '1000')),
+    ttl=float(os.getenv('STAGE_MEMO_TTL_HOURS', '24')) * 3600
 )
 
+# Logs are JSON lines tagged with the run, stage and agent they came from. A log call only queues the record; a
+# background thread writes it to LOG_FILE, rotated at LOG_MAX_BYTES (see structured_logging.py). LOG_STAGE_LEVELS
+# sets the verbosity of single stages (e.g. "research=DEBUG,seo=WARNING"), and only AGENT_TRACE_SAMPLE_RATE of the
+# agents' step-by-step traces are kept.
+LOG_FILE = os.getenv('LOG_FILE', 'app.log')
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOG_STAGE_LEVELS = os.getenv('LOG_STAGE_LEVELS', '')
+AGENT_TRACE_SAMPLE_RATE = float(os.getenv('AGENT_TRACE_SAMPLE_RATE', '0.1'))
+
+def log_context():
+    # The run, stage and agent of the span open on the logging thread (or bound to the agent whose step is logged)
+    span = current_span()
+    if span is None:
+        return {}
+    stage, agent = span.ancestor('stage'), span.ancestor('agent')
+    return {'run_id': span.trace_id, 'stage': stage.name if stage else None, 'agent': agent.name if agent else None}
+
+# Set up logging when a pipeline first runs rather than whenever this module is imported
+@lazy
+def setup_logging():
+    return configure_logging(
+        LOG_FILE,
+        level=level_number(LOG_LEVEL),
+        stage_levels=parse_levels(LOG_STAGE_LEVELS),
+        trace_sample_rate=AGENT_TRACE_SAMPLE_RATE,
+        max_bytes=int(os.getenv('LOG_MAX_BYTES', str(10 * 1024 * 1024))),
+        backups=int(os.getenv('LOG_BACKUPS', '5')),
+        queue_size=int(os.getenv('LOG_QUEUE_SIZE', '10000')),
+        context=log_context
+    )
+
 # Helper to add the search_query instruction to backstory
 def add_search_query_instruction(text):
     return f"{text}\n\nSet the input parameter as : search_query."
@@ -58,13 +319,65 @@ STATIC_RESEARCH_SUBTOPICS = [
     "Future trends"
 ]
 
+# Options accepted by run_pipeline (mirrors the choices offered in streamlit_app.py)
+CONTENT_TYPES = ["Blog Post", "Social Media Posts", "Video/Podcast Script"]
+LANGUAGES = ["English", "Hindi", "Odia"]
+TONES = ["Informational", "Conversational", "Formal", "Humorous", "Technical"]
+MAX_TOPIC_LENGTH = 200
+MAX_SCRIPT_LENGTH = 60
+
+# Pipeline stages in execution order; each completed stage is checkpointed under its name
+PIPELINE_STAGES = ['planner', 'research', 'writer', 'reviewer', 'editor', 'seo', 'fact_checker']
+
+# Replies that mean the agent did not actually produce the requested content
+PLACEHOLDER_OUTPUT_PATTERNS = [
+    r"^\s*I(?: am|'m) ready to",
+    r"^\s*Please provide",
+    r"once (?:it is|you have) provided",
+    r"^\s*Agent stopped due to",
+]
+
 # Instantiate agents with LLM and tools, set max_iter and max_execution_time
-def build_agents():
-    planner = PlannerAgent(llm=llm, tools=tools, description=add_search_query_instruction("Responsible for planning the workflow and assigning tasks."))
+def token_handler(callback):
+    # Returns on_token(stage, chunk) forwarding streamed output as TOKEN events, if the callback asked for tokens
+    if not (STREAM_TOKENS and wants_tokens(callback)):
+        return None
+    return lambda stage, chunk: callback(PipelineEvent(TOKEN, chunk, stage=stage))
+
+def bind_agent(crew_agent):
+    # CrewAI runs agents with a max_execution_time on executor threads of its own, which do not carry the current
+    # span. Give the agent its own LLM and tool instances whose calls run under the span bound to the agent for its
+    # current task (see run_crew_task), so they are still traced as part of that task, its stage and its run. Its
+    # step callback runs under that span too, so step logs are tagged with the run, stage and agent (see log_context).
+    binding = SpanBinding()
+    llm = copy.copy(crew_agent.llm)
+    wrap_method(llm, 'call', binding.wrap)
+    tools = []
+    for tool in crew_agent.tools or []:
+        tool = copy.copy(tool)
+        wrap_method(tool, '_run', binding.wrap)
+        tools.append(tool)
+    if getattr(crew_agent, 'step_callback', None):
+        object.__setattr__(crew_agent, 'step_callback', binding.wrap(crew_agent.step_callback))
+    object.__setattr__(crew_agent, 'llm', llm)
+    object.__setattr__(crew_agent, 'tools', tools)
+    object.__setattr__(crew_agent, 'span_binding', binding)
+    return crew_agent
+
+def build_agents(use_cache=True, on_token=None):
+    # use_cache=False bypasses the LLM response cache for this run only. on_token(stage, chunk) receives the
+    # streamed output of the agents that produce the content (writer, editor and SEO).
+    llm, uncached_llm = content_llms()
+    agent_llm = llm if use_cache else uncached_llm
+    tools = [get_search_tool()]
+
+    def content_llm(stage):
+        return with_token_sink(agent_llm, lambda chunk: on_token(stage, chunk)) if on_token else agent_llm
+    planner = PlannerAgent(llm=agent_llm, tools=tools, description=add_search_query_instruction("Responsible for planning the workflow and assigning tasks."))
     planner.crew_agent.max_iter = 10
     planner.crew_agent.max_execution_time = 60
     researcher = ResearcherAgent(
-        llm=llm,
+        llm=agent_llm,
         tools=tools,
         description=add_search_query_instruction(
             "Responsible for researching topics and gathering information. For each subtopic, do a maximum of 1 web search and summarize your findings in 2-3 concise bullet points."
@@ -72,11 +385,11 @@ def build_agents():
     )
     researcher.crew_agent.max_iter = 10
     researcher.crew_agent.max_execution_time = 60
-    writer = WriterAgent(llm=llm, tools=tools, description=add_search_query_instruction("Responsible for writing content based on research."))
+    writer = WriterAgent(llm=content_llm('writer'), tools=tools, description=add_search_query_instruction("Responsible for writing content based on research."))
     writer.crew_agent.max_iter = 10
     writer.crew_agent.max_execution_time = 60
     reviewer = ReviewerAgent(
-        llm=llm,
+        llm=agent_llm,
         tools=tools,
         description=add_search_query_instruction(
             "Responsible for reviewing and providing feedback on content. Review the blog post for factual accuracy, clarity, and coherence. Use the web search tool only if you need to verify a specific claim. After you have verified one or two claims, immediately write a review summary and end your response. Your output should be a single, concise review summary starting with 'Final Review:'. Do not output any more actions or thoughts after your summary."
@@ -84,16 +397,16 @@ def build_agents():
     )
     reviewer.crew_agent.max_iter = 10
     reviewer.crew_agent.max_execution_time = 60
-    editor = EditorAgent(llm=llm, tools=tools, description=add_search_query_instruction("Responsible for editing and polishing content for clarity, grammar, and style."))
+    editor = EditorAgent(llm=content_llm('editor'), tools=tools, description=add_search_query_instruction("Responsible for editing and polishing content for clarity, grammar, and style."))
     editor.crew_agent.max_iter = 10
     editor.crew_agent.max_execution_time = 60
-    seo = SEOAgent(llm=llm, tools=tools, description=add_search_query_instruction("Responsible for optimizing content for search engines."))
+    seo = SEOAgent(llm=content_llm('seo'), tools=tools, description=add_search_query_instruction("Responsible for optimizing content for search engines."))
     seo.crew_agent.max_iter = 10
     seo.crew_agent.max_execution_time = 60
-    fact_checker = FactCheckerAgent(llm=llm, tools=tools, description=add_search_query_instruction("Responsible for verifying the accuracy of information."))
+    fact_checker = FactCheckerAgent(llm=agent_llm, tools=tools, description=add_search_query_instruction("Responsible for verifying the accuracy of information."))
     fact_checker.crew_agent.max_iter = 10
     fact_checker.crew_agent.max_execution_time = 60
-    return {
+    agents = {
         'planner': planner,
         'researcher': researcher,
         'writer': writer,
@@ -102,6 +415,92 @@ def build_agents():
         'seo': seo,
         'fact_checker': fact_checker
     }
+    for agent in agents.values():
+        bind_agent(agent.crew_agent)
+    return agents
+
+def build_translator(use_cache=True):
+    # The translator works only on the text it is given, so it gets no search tool
+    translation_llm, uncached_translation_llm = translation_llms()
+    translator = TranslatorAgent(
+        llm=translation_llm if use_cache else uncached_translation_llm,
+        description="Responsible for translating finished content into another language while preserving its Markdown formatting and links."
+    )
+    translator.crew_agent.max_iter = 3
+    translator.crew_agent.max_execution_time = 120
+    translator.crew_agent.allow_delegation = False
+    bind_agent(translator.crew_agent)
+    return translator
+
+# Agent sets and translators are built once per process and checked out by one run at a time (see agent_pool.py)
+AGENT_POOL_MAX_IDLE = int(os.getenv('AGENT_POOL_MAX_IDLE', '4'))
+AGENT_POOL_WARM = int(os.getenv('AGENT_POOL_WARM', '1'))
+construction_stats = ConstructionStats()
+
+def build_pooled_agents(use_cache=True):
+    # An agent set for the pool. Its content agents stream to a route that points at the run holding the set, and
+    # every agent keeps a pool of isolated copies for the tasks it runs concurrently (subtopics, sections).
+    route = TokenRoute()
+    agents = build_agents(use_cache=use_cache, on_token=route)
+    for agent in agents.values():
+        agent.copies = AgentPool(
+            lambda agent=agent: bind_agent(agent.crew_agent.copy()), kind='agent_copy',
+            max_idle=max(RESEARCH_MAX_WORKERS, SECTION_MAX_WORKERS), stats=construction_stats
+        )
+    return agents, route
+
+agent_pools = {
+    use_cache: AgentPool(
+        lambda use_cache=use_cache: build_pooled_agents(use_cache), kind='agent_set' if use_cache else 'agent_set_uncached',
+        max_idle=AGENT_POOL_MAX_IDLE, stats=construction_stats
+    )
+    for use_cache in (True, False)
+}
+translator_pools = {
+    use_cache: AgentPool(
+        lambda use_cache=use_cache: build_translator(use_cache), kind='translator' if use_cache else 'translator_uncached',
+        max_idle=TRANSLATION_MAX_WORKERS, stats=construction_stats
+    )
+    for use_cache in (True, False)
+}
+
+@contextmanager
+def checkout_agents(use_cache=True, on_token=None):
+    """Checks an agent set out of the pool for one run; on_token(stage, chunk) receives its streamed output."""
+    pool = agent_pools[bool(use_cache)]
+    item = pool.acquire()
+    agents, route = item
+    route.handler = on_token
+    try:
+        yield agents
+    except BaseException:
+        pool.discard(item)
+        raise
+    # A copy still busy with abandoned work (e.g. a cancelled section prefetch) would stream into the next run
+    if any(agent.copies.in_use for agent in agents.values()):
+        pool.discard(item)
+    else:
+        route.handler = None
+        pool.release(item)
+
+@contextmanager
+def isolated(agent):
+    # A CrewAI agent of its own for one concurrent task: a pooled copy if the agent has a pool, else a fresh copy
+    copies = getattr(agent, 'copies', None)
+    if copies is None:
+        yield bind_agent(agent.crew_agent.copy())
+        return
+    with copies.checkout() as crew_agent:
+        yield crew_agent
+
+def warm_agent_pool(count=None):
+    """Builds agent sets ahead of the first run (AGENT_POOL_WARM by default)."""
+    agent_pools[True].warm(AGENT_POOL_WARM if count is None else count)
+
+def agent_pool_report():
+    """Returns construction counts and timings by kind, plus the idle and checked-out size of each pool."""
+    pools = [*agent_pools.values(), *translator_pools.values()]
+    return {'construction': construction_stats.report(), 'pools': {pool.kind: pool.report() for pool in pools}}
 
 # Role-specific prompt templates (explicitly instruct to use the search tool and provide a final answer)
 def get_prompt(agent_name, prev_output, user_query, content_type="Blog Post", script_length=None, language="English", tone="Informational", subtopic=None): # Added tone
@@ -141,6 +540,46 @@ def get_prompt(agent_name, prev_output, user_query, content_type="Blog Post", sc
     language_instruction = f"\n\n**IMPORTANT: Generate the entire output text in {language}.**" if language != "English" else ""
     tone_instruction = f" Ensure the overall tone is **{tone}**." # Separate tone instruction
 
+    if agent_name == 'Editor Patch':
+        return (
+            f"Edit the following blog post for grammar, style, readability and engagement, making sure the tone is consistently **{tone}**. "
+            "Fix awkward phrasing, strengthen weak transitions, add vivid detail or an example where a section feels thin, and, if a key claim lacks a source, "
+            "use the search tool to find one authoritative URL and add it as a Markdown link. Leave sections that already read well untouched. "
+            f"{EDIT_FORMAT}{language_instruction}\n\nHere is the blog post:\n{prev_output}"
+        )
+    if agent_name == 'SEO Patch':
+        return (
+            "Optimize the following blog post (in Markdown format) for SEO. Research relevant keywords using the search tool if necessary. "
+            "Integrate keywords naturally by editing individual sentences or headings, and preserve existing Markdown links. "
+            "Start your response with an optimized meta description on its own line, like: META_DESCRIPTION: [Your description here]. "
+            f"Do NOT explain your process or plan. {EDIT_FORMAT}\n\nHere is the blog post:\n{prev_output}"
+        )
+    if agent_name == 'Section Writer':
+        return (
+            f"You are writing one section of a blog post about '{user_query}'. Write only the section on: {subtopic}. "
+            f"Base it on this research: {prev_output}\n\n"
+            f"Start with the Markdown heading '## {subtopic}'. Write 300-500 words of engaging, descriptive paragraphs with concrete examples, insightful analysis and storytelling, in a **{tone}** tone. "
+            "Where appropriate, use the search tool to find one authoritative URL and embed it as a Markdown link. "
+            "Do NOT write an introduction or conclusion for the whole post, and do not refer to other sections. "
+            "Provide the final output as only this section in Markdown format."
+        ) + language_instruction
+    if agent_name == 'Stitcher':
+        return (
+            f"The following sections of a blog post about '{user_query}' were written separately. Here is each section's heading and opening:\n\n{prev_output}\n\n"
+            f"Write the connective parts of the post in a **{tone}** tone: a title, a compelling introduction (one or two paragraphs), "
+            "one transition sentence after each section except the last that leads into the next section, and a strong conclusion (one or two paragraphs). "
+            "Do not rewrite the sections. Use exactly this format and nothing else:\n"
+            "TITLE: <title>\nINTRODUCTION:\n<introduction>\nTRANSITION 1: <sentence leading from section 1 to section 2>\n...\nCONCLUSION:\n<conclusion>"
+        ) + language_instruction
+    if agent_name == 'Translator':
+        return (
+            f"Translate the following {content_type} from English into {language}. "
+            "Preserve the Markdown structure exactly: keep every heading, list item, table, emphasis marker and line break in the same place. "
+            "Translate link text but copy every {{URL_n}} placeholder unchanged. If the text starts with 'META_DESCRIPTION:', keep that label in English and translate the description after it. "
+            f"Keep the {tone} tone. Do not add, remove or summarize content, and do not add any commentary. "
+            f"Provide the final output as only the translated {content_type} in Markdown format:\n\n{prev_output}"
+        )
+
     # --- Modify prompts based on content_type ---
     if agent_name == 'Writer':
         prompt = ""
@@ -242,20 +681,31 @@ def extract_subtopics_from_outline(outline, user_query):
         subtopics = [line for line in lines if line and len(line) > 3] or [user_query] # Ensure at least the original query if all else fails
     return subtopics
 
+def run_crew_task(crew_agent, description, expected_output):
+    # Run one task on a CrewAI agent under the current span, wherever CrewAI makes the agent's calls
+    binding = getattr(crew_agent, 'span_binding', None)
+    with binding.bind(current_span()) if binding else nullcontext():
+        return kickoff_task(crew_agent, description, expected_output)
+
+def kickoff_task(crew_agent, description, expected_output):
+    # Run one task on a CrewAI agent in a single-agent crew and return the CrewOutput
+    from crewai import Task, Crew
+    task = Task(description=description, agent=crew_agent, expected_output=expected_output)
+    with construction_stats.measure('crew'):
+        crew = Crew(agents=[crew_agent], tasks=[task])
+    return crew.kickoff()
+
+@tracer.traced('plan_task')
 def plan_task(user_query, planner_agent, callback=None):
     # Use the planner agent to break down the user_query into subtasks
     prompt = get_prompt('Planner', '', user_query) # prev_output is empty for planner
-    task = Task(
-        description=prompt,
-        agent=planner_agent.crew_agent,
-        expected_output="A detailed outline or list of subtopics for the blog post."
-    )
-    crew = Crew(agents=[planner_agent.crew_agent], tasks=[task])
-    result = crew.kickoff()
+    result = str(run_crew_task( # kickoff returns a CrewOutput; its string form is the final answer
+        planner_agent.crew_agent, prompt, "A detailed outline or list of subtopics for the blog post."
+    ))
     if callback:
         callback(f"Planner Result:\n{result}")
     if isinstance(result, str):
-        subtopics = extract_subtopics_from_outline(result)
+        subtopics = extract_subtopics_from_outline(result, user_query)
         if len(subtopics) >= 3:
             if callback:
                 callback(f"Extracted Subtopics: {', '.join(subtopics)}")
@@ -265,47 +715,80 @@ def plan_task(user_query, planner_agent, callback=None):
         callback(f"Could not extract distinct subtopics. Using full query: '{user_query}'")
     return [user_query]
 
-def run_research_subtasks(user_query, subtopics, researcher_agent, callback=None):
-    results = {}
-    for subtopic in subtopics:
-        if callback:
-            callback(f"\n--- Researching: {subtopic} ---")
+def research_subtopic(user_query, subtopic, researcher_agent, callback=None, isolate=False):
+    # Research a single subtopic, retrying when the API reports rate limiting
+    if callback:
+        callback(f"\n--- Researching: {subtopic} ---")
+    # CrewAI agents keep per-execution state, so concurrent subtopics each get their own (pooled) copy
+    with tracer.span(researcher_agent.name, kind='agent', subtopic=subtopic), \
+            isolated(researcher_agent) if isolate else nullcontext(researcher_agent.crew_agent) as crew_agent:
         prompt = get_prompt('Researcher', '', user_query, subtopic=subtopic)
-        task = Task(
-            description=prompt,
-            agent=researcher_agent.crew_agent,
-            expected_output=f"A detailed summary paragraph (10 to 15 sentences minimum) of research findings for the subtopic: {subtopic}." # Corrected expected output length
-        )
-        crew = Crew(agents=[researcher_agent.crew_agent], tasks=[task])
+        expected_output = f"A detailed summary paragraph (10 to 15 sentences minimum) of research findings for the subtopic: {subtopic}." # Corrected expected output length
         max_retries = 3
         for attempt in range(max_retries):
             try:
-                result = crew.kickoff()
-                results[subtopic] = result
+                result = run_crew_task(crew_agent, prompt, expected_output)
                 if callback:
                     callback(f"\nResearch Result for '{subtopic}':\n{result}\n")
-                break
+                return result
             except Exception as e:
-                error_msg = str(e)
-                if 'RESOURCE_EXHAUSTED' in error_msg or 'RateLimitError' in error_msg:
-                    # Try to extract suggested retry delay from error message
-                    retry_delay = 20
-                    match = re.search(r'"retryDelay":\s*"(\\d+)s"', error_msg)
-                    if match:
-                        retry_delay = int(match.group(1))
-                    message = f"Rate limit hit. Waiting {retry_delay} seconds before retrying (attempt {attempt+1}/{max_retries})..."
+                if is_rate_limit_error(e):
+                    tracer.count('task_retries')
+                    # The limiter already retried the individual LLM call and slowed the shared bucket down for this
+                    # error; only back off the whole subtopic (using the API's hint) without penalizing the bucket again
+                    retry_delay = llm_rate_limiter.backoff_delay(attempt, parse_retry_delay(e))
+                    message = f"Rate limit hit for '{subtopic}'. Waiting {retry_delay:.0f} seconds before retrying (attempt {attempt+1}/{max_retries})..."
                     if callback: callback(message)
-                    else: print(message)
+                    else: logging.warning(message)
                     time.sleep(retry_delay)
                 else:
                     message = f"Error during research for subtopic '{subtopic}': {e}"
                     if callback: callback(message)
-                    else: print(message)
-                    results[subtopic] = f"Error: {e}"
-                    break
-        else:
-            results[subtopic] = "Error: Rate limit exceeded after retries."
-    return results
+                    else: logging.warning(message)
+                    return f"Error: {e}"
+        return "Error: Rate limit exceeded after retries."
+
+@tracer.traced('run_research_subtasks')
+def run_research_subtasks(user_query, subtopics, researcher_agent, callback=None, max_workers=None, on_result=None, deadline=None, straggler_policy=None, on_late=None):
+    # Research every subtopic, up to max_workers at a time (1 keeps the old serial behaviour). Each successful result
+    # is handed to on_result(subtopic, result) as soon as it completes, so downstream work can start before the
+    # slowest subtopic returns. Subtopics still running after the deadline are left out of the returned results;
+    # a deferred one is handed to on_late(subtopic, result) if it finishes successfully later.
+    if max_workers is None:
+        max_workers = RESEARCH_MAX_WORKERS
+    deadline = RESEARCH_STRAGGLER_TIMEOUT if deadline is None else deadline
+    straggler_policy = straggler_policy or RESEARCH_STRAGGLER_POLICY
+    subtopics = list(dict.fromkeys(subtopics)) # Drop duplicate subtopics, keeping outline order
+    max_workers = max(1, min(max_workers, len(subtopics)))
+    if callback and max_workers > 1:
+        callback(f"Researching {len(subtopics)} subtopics with up to {max_workers} in parallel...")
+    def late(subtopic, result, status):
+        if status == DONE and not str(result).startswith("Error:"):
+            logging.info(f"Deferred research for '{subtopic}' finished")
+            if on_late: on_late(subtopic, str(result))
+
+    results = {}
+    for subtopic, result, status in stream_results(
+        propagate(lambda subtopic: research_subtopic(user_query, subtopic, researcher_agent, callback, isolate=max_workers > 1)),
+        subtopics, max_workers=max_workers, deadline=deadline, straggler_policy=straggler_policy, on_late=late
+    ):
+        if status == DEFERRED:
+            logging.warning(f"Research for '{subtopic}' missed the {deadline:.0f}s deadline; continuing without waiting for it")
+            if callback: callback(f"Research for '{subtopic}' is taking longer than {deadline:.0f}s. Moving on without it; it will be saved with the run when it finishes.")
+            result = f"Error: Research deferred after missing the {deadline:.0f}s deadline."
+        elif status == DROPPED:
+            logging.warning(f"Research for '{subtopic}' missed the {deadline:.0f}s deadline and was dropped")
+            if callback: callback(f"Research for '{subtopic}' is taking longer than {deadline:.0f}s. Dropping it from this run.")
+            result = f"Error: Research dropped after missing the {deadline:.0f}s deadline."
+        elif status == ERROR:
+            result = f"Error: {result}"
+        results[subtopic] = result
+        if on_result and not str(result).startswith("Error:"):
+            on_result(subtopic, str(result))
+    # Collect in outline order so aggregate_research_results output does not depend on completion order
+    return {subtopic: results[subtopic] for subtopic in subtopics}
+
+TRENDING_QUERY = "list the top {num_topics} recent breakthroughs or new inventions in technology"
 
 def get_trending_topics(search_tool, num_topics=6, callback=None):
     """Fetches current trending topics using the search tool."""
@@ -314,7 +797,7 @@ def get_trending_topics(search_tool, num_topics=6, callback=None):
     try:
         # Use a query likely to return a list or summary of trends
         # Updated query to focus on new tech and inventions
-        search_query = f"list the top {num_topics} recent breakthroughs or new inventions in technology"
+        search_query = TRENDING_QUERY.format(num_topics=num_topics)
         # Pass the query using the expected keyword argument 'search_query'
         trends_result = search_tool.run(search_query=search_query)
         if callback:
@@ -363,9 +846,33 @@ def get_trending_topics(search_tool, num_topics=6, callback=None):
         return topics[:num_topics] # Return the requested number of topics
     except Exception as e:
         if callback: callback(f"Error fetching trending topics: {e}")
-        else: print(f"Error fetching trending topics: {e}")
+        else: logging.warning(f"Error fetching trending topics: {e}")
         return [] # Return empty list on error
 
+# Shown until the first live fetch of trending topics has completed, so a cold page load never waits on the search API
+DEFAULT_TRENDING_TOPICS = [
+    "Generative AI in everyday software",
+    "Advances in solid-state batteries",
+    "Quantum computing breakthroughs",
+    "Renewable energy storage",
+    "AI in healthcare diagnostics",
+    "The rise of humanoid robots",
+]
+
+def fetch_fresh_trending_topics(num_topics=6):
+    # The trend store decides when topics are stale, so drop the (longer-lived) search cache entry for the query first
+    search_tool = get_search_tool()
+    search_cache.delete(search_result_cache.cache_key(search_tool, {'search_query': TRENDING_QUERY.format(num_topics=num_topics)}))
+    return get_trending_topics(search_tool, num_topics=num_topics)
+
+# Trending topics shared by all server processes, served instantly and refreshed in the background once stale
+trend_store = TrendStore(
+    os.path.join(CACHE_DIR, 'trending_topics.json'),
+    fetch_fresh_trending_topics,
+    max_age=float(os.getenv('TRENDS_MAX_AGE_MINUTES', '60')) * 60,
+    fallback=DEFAULT_TRENDING_TOPICS
+)
+
 def aggregate_research_results(results):
     # Combine all subtopic results into a single research summary
     summary = "\n\n".join([f"**{subtopic}:**\n{output}" for subtopic, output in results.items()])
@@ -377,9 +884,653 @@ def clean_code_blocks(text):
     cleaned = re.sub(r'\s*```$', '', cleaned, flags=re.IGNORECASE)
     return cleaned.strip()
 
+def validate_pipeline_inputs(user_query, content_type="Blog Post", script_length=None, language="English", tone="Informational", writing_mode=None, edit_mode=None):
+    # Returns an error message if the pipeline inputs are invalid, otherwise None
+    if not isinstance(user_query, str) or not user_query.strip():
+        return "Please provide a topic."
+    if len(user_query) > MAX_TOPIC_LENGTH:
+        return f"Topic is too long (maximum {MAX_TOPIC_LENGTH} characters)."
+    if content_type not in CONTENT_TYPES:
+        return f"Unsupported content type: {content_type}"
+    if language not in LANGUAGES:
+        return f"Unsupported language: {language}"
+    if tone not in TONES:
+        return f"Unsupported tone: {tone}"
+    if content_type == "Video/Podcast Script" and script_length is not None:
+        if isinstance(script_length, bool) or not isinstance(script_length, int) or not 1 <= script_length <= MAX_SCRIPT_LENGTH:
+            return f"Script length must be a whole number of minutes between 1 and {MAX_SCRIPT_LENGTH}."
+    if writing_mode is not None and writing_mode not in WRITING_MODES:
+        return f"Unsupported writing mode: {writing_mode}"
+    if edit_mode is not None and edit_mode not in EDIT_MODES:
+        return f"Unsupported edit mode: {edit_mode}"
+    return None
+
+def is_valid_output(output):
+    # Rejects empty results and placeholder replies such as "I am ready to edit the blog post once it is provided."
+    text = str(output or '').strip()
+    if not text:
+        return False
+    return not any(re.search(pattern, text, re.IGNORECASE) for pattern in PLACEHOLDER_OUTPUT_PATTERNS)
+
+def run_agent_task(agent, prompt, expected_output, isolate=False):
+    # Run a single prompt through an agent and return the final answer as text.
+    # isolate=True runs on a copy of the CrewAI agent so the same agent can serve concurrent tasks.
+    with tracer.span(agent.name, kind='agent'), isolated(agent) if isolate else nullcontext(agent.crew_agent) as crew_agent:
+        return str(run_crew_task(crew_agent, prompt, expected_output))
+
+def run_patch_task(agent, patch_prompt, post, expected_output, require_meta=False, callback=None):
+    # Ask the agent for structured edits and apply them locally; returns None if the edits do not apply cleanly
+    response = run_agent_task(agent, patch_prompt, expected_output)
+    try:
+        return apply_edit_response(post, clean_code_blocks(response), require_meta=require_meta)
+    except EditError as e:
+        logging.warning(f"{agent.name} edits could not be applied ({e}); falling back to a full rewrite")
+        if callback: callback(f"{agent.name} edits could not be applied ({e}). Falling back to a full rewrite.")
+        return None
+
+def write_section(user_query, subtopic, research, writer_agent, content_type="Blog Post", script_length=None, language="English", tone="Informational", callback=None, budget=None):
+    # Write the blog post section for one researched subtopic
+    if budget:
+        research = budget.fit('section_writer', research, f"{user_query} {subtopic}")
+    prompt = get_prompt('Section Writer', research, user_query, content_type, script_length, language, tone, subtopic=subtopic)
+    section = run_agent_task(
+        writer_agent,
+        budget.measure('section_writer', prompt) if budget else prompt,
+        f"The section on '{subtopic}' in Markdown format, starting with its heading.",
+        isolate=True
+    )
+    if callback: callback(f"Section written: {subtopic}")
+    return ensure_section_heading(clean_code_blocks(section), subtopic)
+
+def start_section_prefetch(user_query, writer_agent, content_type="Blog Post", script_length=None, language="English", tone="Informational", writing_mode=None, callback=None, budget=None):
+    # For sectioned blog posts, start writing each section as soon as its subtopic's research arrives instead of
+    # waiting for the whole research stage. Returns a Prefetcher, or None if the content is not written in sections.
+    if content_type != "Blog Post" or (writing_mode or WRITING_MODE) != "sectioned":
+        return None
+    return Prefetcher(
+        propagate(lambda subtopic, research: write_section(user_query, subtopic, research, writer_agent, content_type, script_length, language, tone, callback, budget)),
+        max_workers=SECTION_MAX_WORKERS
+    )
+
+def write_sectioned(user_query, research_results, writer_agent, content_type="Blog Post", script_length=None, language="English", tone="Informational", callback=None, max_workers=None, budget=None, prefetch=None):
+    # Write one section per researched subtopic concurrently, then stitch them with a short intro/transition/conclusion pass.
+    # Sections already started by a prefetch while research was still running are reused.
+    subtopics = [subtopic for subtopic, research in research_results.items() if not str(research).startswith("Error:")]
+    if not subtopics:
+        raise ValueError("No research results to write sections from.")
+    max_workers = max(1, min(max_workers or SECTION_MAX_WORKERS, len(subtopics)))
+    if callback: callback(f"Writing {len(subtopics)} sections with up to {max_workers} in parallel...")
+
+    def section_for(subtopic, future):
+        if future is not None:
+            try:
+                return future.result()
+            except Exception as e:
+                logging.warning(f"Prefetched section '{subtopic}' failed ({e}); writing it again")
+        return write_section(user_query, subtopic, research_results[subtopic], writer_agent, content_type, script_length, language, tone, callback, budget)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        prefetched = {subtopic: prefetch.take(subtopic) if prefetch else None for subtopic in subtopics}
+        sections = list(executor.map(propagate(section_for), subtopics, prefetched.values()))
+    sections = [section for section in sections if is_valid_output(section)]
+    if not sections:
+        raise ValueError("Writer returned no usable sections.")
+
+    stitch_prompt = get_prompt('Stitcher', section_digest(sections), user_query, content_type, script_length, language, tone)
+    stitch_output = run_agent_task(
+        writer_agent,
+        budget.measure('writer', stitch_prompt) if budget else stitch_prompt,
+        "The title, introduction, transitions and conclusion in the requested format."
+    )
+    return assemble_article(sections, parse_stitch_output(stitch_output))
+
+@contextmanager
+def profiled_stage(run_id, stage):
+    # Profiles the with block as the current stage span when PROFILE_STAGES is set, then writes its collapsed stacks
+    span = current_span()
+    if not (PROFILE_STAGES and span):
+        yield
+        return
+    try:
+        with profiler.stage(span.span_id):
+            yield
+    finally:
+        paths = profiler.write(span.span_id, os.path.join(run_store.run_dir(run_id), 'profile'), stage)
+        if paths:
+            logging.info(f"Run {run_id}: stage '{stage}' profile written to {', '.join(paths)}", extra={'run_id': run_id, 'stage': stage})
+
+def is_clean_output(output):
+    # False if any part of a stage output is an "Error: ..." placeholder for work that failed
+    if isinstance(output, dict):
+        return all(is_clean_output(value) for value in output.values())
+    if isinstance(output, (list, tuple)):
+        return all(is_clean_output(value) for value in output)
+    return not (isinstance(output, str) and output.startswith("Error:"))
+
+def run_stage(run_id, stage, fn, callback=None, inputs=None, use_memo=True, cacheable=None):
+    # Run a pipeline stage, reusing its checkpoint if this run already completed it, or the memoized output
+    # of an earlier run whose stage had identical inputs. Only clean outputs (no failed parts, and passing
+    # cacheable(output) if given) are memoized, so a failure or fallback is retried by the next run.
+    if run_store.has(run_id, stage):
+        output = run_store.load(run_id, stage)
+        if callback:
+            callback(PipelineEvent(STAGE_COMPLETED, f"Resuming run {run_id}: reusing saved '{stage}' output.", stage, output=output, seconds=0.0, reused=True))
+        return output
+    memo_key = stage_memo_key(stage, inputs) if inputs is not None else None
+    if memo_key and use_memo:
+        output = stage_memo.get(memo_key)
+        if output is not None:
+            if callback:
+                callback(PipelineEvent(STAGE_COMPLETED, f"Reusing '{stage}' output from an earlier run with the same inputs.", stage, output=output, seconds=0.0, reused=True))
+            logging.info(f"Run {run_id}: stage '{stage}' reused from memo", extra={'run_id': run_id, 'stage': stage})
+            run_store.save(run_id, stage, output)
+            return output
+    if callback:
+        callback(PipelineEvent(STAGE_STARTED, f"\n=== Stage: {stage} ===", stage))
+    start = time.time()
+    with tracer.span(stage, kind='stage', trace_id=run_id), profiled_stage(run_id, stage):
+        output = fn()
+    run_store.save(run_id, stage, output)
+    if memo_key and is_clean_output(output) and (cacheable is None or cacheable(output)):
+        stage_memo.set(memo_key, output)
+    seconds = time.time() - start
+    logging.info(f"Run {run_id}: stage '{stage}' completed in {seconds:.1f}s", extra={'run_id': run_id, 'stage': stage})
+    if callback:
+        callback(PipelineEvent(STAGE_COMPLETED, f"Stage '{stage}' completed in {seconds:.1f}s.", stage, output=output, seconds=seconds, reused=False))
+    return output
+
+def format_slug(content_type):
+    # Checkpoint-safe name for a content type, e.g. "Video/Podcast Script" -> "video_podcast_script"
+    return re.sub(r'[^a-z0-9]+', '_', content_type.lower()).strip('_')
+
+def start_run(run_id, params, stages, callback=None):
+    # Create the run record, or reopen it when resuming, and return the run ID
+    if run_id and run_store.exists(run_id):
+        completed = run_store.completed_stages(run_id, stages)
+        if callback: callback(f"Resuming run {run_id} (completed stages: {', '.join(completed) or 'none'})")
+    else:
+        run_id = run_id or run_store.new_run_id()
+        run_store.save_metadata(run_id, {**params, 'created_at': time.time()})
+        if callback: callback(f"Starting run {run_id}")
+    run_store.update_metadata(run_id, status='running')
+    return run_id
+
+@contextmanager
+def run_span(run_id, name):
+    # The root span of a run's trace. Its counters add up everything the run spent (estimated tokens, LLM calls,
+    # searches, retries, cache hits) and are saved as the run's usage.
+    with tracer.span(name, kind='run', trace_id=run_id) as span:
+        try:
+            yield span
+        finally:
+            if span is not None:
+                run_store.update_metadata(run_id, usage=dict(span.counters))
+                logging.info(f"Run {run_id}: usage {span.counters}", extra={'run_id': run_id})
+
+def research_phase(run_id, user_query, agents, callback=None, use_cache=True, on_subtopic=None):
+    # Planner and research stages; they only depend on the topic, so changing tone, language or format reuses them.
+    # Returns the per-subtopic research results in outline order; on_subtopic(subtopic, result) receives each
+    # freshly researched subtopic as it completes.
+    topic = normalize_topic(user_query)
+    subtopics = run_stage(
+        run_id, 'planner', lambda: plan_task(user_query, agents['planner'], callback), callback,
+        inputs={'topic': topic}, use_memo=use_cache,
+        cacheable=lambda subtopics: subtopics != [user_query] # The fallback when no outline could be extracted
+    )
+    late_lock = threading.Lock()
+
+    def save_late(subtopic, result):
+        # A deferred subtopic finished after the research stage moved on: keep it with the run, for a resume
+        with late_lock:
+            late = run_store.load(run_id, 'research_late', {})
+            run_store.save(run_id, 'research_late', {**late, subtopic: result})
+        logging.info(f"Run {run_id}: late research for '{subtopic}' saved", extra={'run_id': run_id, 'stage': 'research'})
+
+    research_results = run_stage(
+        run_id, 'research',
+        lambda: {subtopic: str(result) for subtopic, result in run_research_subtasks(user_query, subtopics, agents['researcher'], callback, on_result=on_subtopic, on_late=save_late).items()},
+        callback, inputs={'topic': topic, 'subtopics': subtopics}, use_memo=use_cache
+    )
+    # Fill in subtopics whose deferred research arrived after the stage (e.g. when resuming the run)
+    late = run_store.load(run_id, 'research_late', {})
+    return {subtopic: late.get(subtopic, result) if str(result).startswith("Error:") else result for subtopic, result in research_results.items()}
+
+def context_budget():
+    # Budgets and token accounting for one content branch, including the sections its prefetch writes
+    return ContextBudget(CONTEXT_BUDGETS, enabled=CONTEXT_COMPACTION_ENABLED)
+
+def content_branch(run_id, user_query, research_results, agents, content_type="Blog Post", script_length=None, language="English", tone="Informational", callback=None, use_cache=True, stage_prefix='', writing_mode=None, edit_mode=None, prefetch=None, budget=None):
+    # Post-research stages for one content format; returns (final_content, fact_check_report).
+    # Only the editor and SEO stages change the content, so the critical path is writer -> editor -> SEO.
+    # The reviewer (on the draft) and the fact checker (on the edited text) run alongside them and are joined at the end.
+    # The meta description is not a branch of its own: the SEO stage writes it in the same call that optimizes the
+    # post (and patch mode requires it), so a separate extraction would add an LLM call rather than remove one.
+    format_inputs = {'content_type': content_type, 'script_length': script_length, 'language': language, 'tone': tone}
+    budget = budget or context_budget()
+    # Only blog posts are made of per-subtopic sections; other formats are always written in one pass
+    writing_mode = (writing_mode or WRITING_MODE) if content_type == "Blog Post" else "single"
+    edit_mode = (edit_mode or EDIT_MODE) if content_type == "Blog Post" else "rewrite"
+    # A single-pass writer gets all research compacted together. Each section gets its own subtopic's raw research
+    # fitted to the section budget (see write_section), the same input whether it was prefetched during research or not.
+    if writing_mode != "sectioned":
+        research_results = budget.fit_research('writer', research_results, user_query)
+    research_summary = aggregate_research_results(research_results)
+
+    def write():
+        if writing_mode == "sectioned":
+            draft = write_sectioned(user_query, research_results, agents['writer'], content_type, script_length, language, tone, callback, budget=budget, prefetch=prefetch)
+        else:
+            draft = run_agent_task(
+                agents['writer'],
+                budget.measure('writer', get_prompt('Writer', research_summary, user_query, content_type, script_length, language, tone)),
+                f"The complete {content_type} in Markdown format."
+            )
+        if not is_valid_output(draft):
+            raise ValueError(f"Writer returned no usable content: {draft[:200]}")
+        return draft
+    draft = run_stage(
+        run_id, f"{stage_prefix}writer", write, callback,
+        inputs={'research': research_summary, 'writing_mode': writing_mode, **format_inputs}, use_memo=use_cache
+    )
+    if callback: callback(f"Writer Draft ({content_type}):\n{draft}")
+
+    def review():
+        review_input = budget.fit('reviewer', draft, user_query)
+        output = run_stage(run_id, f"{stage_prefix}reviewer", lambda: run_agent_task(
+            agents['reviewer'],
+            budget.measure('reviewer', get_prompt('Reviewer', review_input, user_query, content_type, script_length, language, tone)),
+            "A concise review summary."
+        ), callback, inputs={'draft': review_input, **format_inputs}, use_memo=use_cache)
+        if callback: callback(f"Review ({content_type}):\n{output}")
+        return output
+
+    def edit():
+        if edit_mode == "patch":
+            edited = run_patch_task(
+                agents['editor'],
+                budget.measure('editor', get_prompt('Editor Patch', draft, user_query, content_type, script_length, language, tone)),
+                draft, "Only the edits, in the requested edit format.", callback=callback
+            )
+            if edited:
+                return edited
+        edited = run_agent_task(
+            agents['editor'],
+            budget.measure('editor', get_prompt('Editor', draft, user_query, content_type, script_length, language, tone)),
+            f"The polished {content_type} in Markdown format."
+        )
+        # Keep the writer's draft if the editor did not return real content
+        return edited if is_valid_output(edited) else draft
+
+    def optimize(edited):
+        # SEO optimization (and its META_DESCRIPTION line) only applies to blog posts
+        if content_type != "Blog Post":
+            return edited
+        if edit_mode == "patch":
+            optimized = run_patch_task(
+                agents['seo'],
+                budget.measure('seo', get_prompt('SEO Patch', edited, user_query, content_type, script_length, language, tone)),
+                edited, "The META_DESCRIPTION line followed by the edits, in the requested edit format.",
+                require_meta=True, callback=callback
+            )
+            if optimized:
+                return optimized
+        optimized = run_agent_task(
+            agents['seo'],
+            budget.measure('seo', get_prompt('SEO Specialist', edited, user_query, content_type, script_length, language, tone)),
+            "The complete SEO-optimized blog post in Markdown format, starting with the META_DESCRIPTION line."
+        )
+        return optimized if is_valid_output(optimized) else edited
+
+    def fact_check(edited):
+        # SEO only adds keywords and the meta description, so the facts can be checked on the edited text.
+        # Over budget, trimming keeps the sentences with checkable claims (numbers, links, topic terms).
+        check_input = budget.fit('fact_checker', edited, user_query)
+        return run_stage(run_id, f"{stage_prefix}fact_checker", lambda: run_agent_task(
+            agents['fact_checker'],
+            budget.measure('fact_checker', get_prompt('Fact Checker', check_input, user_query, content_type, script_length, language, tone)),
+            "A fact-check report listing any inaccuracies or unsupported claims."
+        ), callback, inputs={'content': check_input}, use_memo=use_cache)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        review_future = executor.submit(propagate(review))
+        edited = run_stage(run_id, f"{stage_prefix}editor", edit, callback, inputs={'draft': draft, 'edit_mode': edit_mode, **format_inputs}, use_memo=use_cache)
+        fact_check_future = executor.submit(propagate(fact_check), edited)
+        final_content = clean_code_blocks(run_stage(
+            run_id, f"{stage_prefix}seo", lambda: optimize(edited), callback,
+            inputs={'edited': edited, 'content_type': content_type, 'edit_mode': edit_mode}, use_memo=use_cache
+        ))
+        fact_check_report = fact_check_future.result()
+        try:
+            review_future.result()
+        except Exception as e:
+            # The review is advisory and does not change the content, so a failed review does not fail the branch
+            logging.warning(f"Run {run_id}: review ({content_type}) failed: {e}", extra={'run_id': run_id})
+            if callback: callback(f"Review ({content_type}) failed: {e}")
+
+    # Token accounting for this branch, kept next to its stage checkpoints
+    context_report = budget.report()
+    run_store.save(run_id, f"{stage_prefix}context_budget", context_report)
+    saved = ', '.join(f"{stage} {entry['saved_tokens']}" for stage, entry in context_report.items() if entry['saved_tokens'])
+    logging.info(f"Run {run_id}: context compaction ({content_type}) saved {budget.total_saved()} tokens ({saved or 'nothing to trim'})", extra={'run_id': run_id})
+    if callback: callback(f"Context compaction ({content_type}) saved ~{budget.total_saved()} tokens{f' ({saved})' if saved else ''}.")
+    return final_content, fact_check_report
+
+def generation_key(params):
+    # Identity of a generation request (run_pipeline keyword arguments), with the topic normalized and defaults
+    # filled in, so e.g. "AI  in Healthcare" and "ai in healthcare" are the same request
+    content_type = params.get('content_type', "Blog Post")
+    content_types = content_type if isinstance(content_type, (list, tuple)) else [content_type]
+    script_length = params.get('script_length')
+    return stage_memo_key('generation', {
+        'topic': normalize_topic(params['user_query']),
+        'content_type': content_type,
+        'script_length': (script_length or 5) if "Video/Podcast Script" in content_types else None,
+        'language': params.get('language', "English"),
+        'tone': params.get('tone', "Informational"),
+        'writing_mode': params.get('writing_mode') or WRITING_MODE,
+        'edit_mode': params.get('edit_mode') or EDIT_MODE,
+        'use_cache': params.get('use_cache', True),
+    })
+
+def is_successful_result(result):
+    # run_pipeline returns (content, report), or a dict of those for several formats/languages
+    results = result.values() if isinstance(result, dict) else [result]
+    return all(content for content, _ in results)
+
+pipeline_flights = SingleFlight(ttl=COALESCE_RESULT_TTL, keep=is_successful_result)
+bypass_flights = SingleFlight()
+
 # Define the workflow pipeline using CrewAI's Task and Crew
-def run_pipeline(*args, **kwargs):
-    return None, None
+def run_pipeline(user_query, content_type="Blog Post", script_length=None, language="English", tone="Informational", callback=None, use_cache=True, run_id=None, writing_mode=None, edit_mode=None, coalesce=True):
+    """Runs the full agent pipeline and returns (final_content, fact_check_report), or (None, None) on failure.
+
+    Every completed stage is checkpointed under run_id; passing the ID of a failed run resumes it from the
+    first stage without a checkpoint. Stage outputs are also memoized by their inputs, so a new run that only
+    changes tone, language or format reuses the planner outline and research of an earlier run.
+
+    Passing a list of content types runs the multi-format mode (see run_multi_format_pipeline) and returns a
+    dict of {content_type: (final_content, fact_check_report)} instead. Passing a list of languages runs the
+    translate-once mode (see run_multi_language_pipeline) and returns {language: (final_content, fact_check_report)}.
+
+    writing_mode ("single" or "sectioned", default WRITING_MODE) selects how blog posts are written, and
+    edit_mode ("rewrite" or "patch", default EDIT_MODE) how the Editor and SEO stages change them.
+
+    Concurrent identical requests (without an explicit run_id) share one execution and its result, which is
+    also reused for COALESCE_RESULT_TTL seconds; only the first caller's callback receives progress.
+    """
+    setup_logging()
+    serve_metrics()
+    if coalesce and COALESCE_REQUESTS and run_id is None:
+        params = {
+            'user_query': user_query, 'content_type': content_type, 'script_length': script_length, 'language': language,
+            'tone': tone, 'use_cache': use_cache, 'writing_mode': writing_mode, 'edit_mode': edit_mode
+        }
+        # Bypassing the cache asks for a fresh result, so it may only share an execution that is still running
+        flights = pipeline_flights if use_cache else bypass_flights
+        return flights.do(generation_key(params), run_pipeline, callback=callback, coalesce=False, **params)
+    if isinstance(language, (list, tuple)):
+        return run_multi_language_pipeline(user_query, language, content_type=content_type, script_length=script_length, tone=tone, callback=callback, use_cache=use_cache, run_id=run_id, writing_mode=writing_mode, edit_mode=edit_mode)
+    if isinstance(content_type, (list, tuple)):
+        return run_multi_format_pipeline(user_query, content_type, script_lengths=script_length, language=language, tone=tone, callback=callback, use_cache=use_cache, run_id=run_id, writing_mode=writing_mode, edit_mode=edit_mode)
+
+    error = validate_pipeline_inputs(user_query, content_type, script_length, language, tone, writing_mode, edit_mode)
+    if error:
+        logging.warning(f"Invalid pipeline input: {error}")
+        if callback: callback(error)
+        return None, None
+
+    params = {'user_query': user_query, 'content_type': content_type, 'script_length': script_length, 'language': language, 'tone': tone, 'writing_mode': writing_mode, 'edit_mode': edit_mode}
+    run_id = start_run(run_id, params, PIPELINE_STAGES, callback)
+    logging.info(f"Run {run_id}: pipeline started for '{user_query}' ({content_type}, {language}, {tone})", extra={'run_id': run_id})
+
+    prefetch = None
+    try:
+        with run_span(run_id, 'run_pipeline'), checkout_agents(use_cache=use_cache, on_token=token_handler(callback)) as agents:
+            try:
+                budget = context_budget()
+                prefetch = start_section_prefetch(user_query, agents['writer'], content_type, script_length, language, tone, writing_mode, callback, budget)
+                research_results = research_phase(run_id, user_query, agents, callback, use_cache, on_subtopic=prefetch.submit if prefetch else None)
+                final_content, fact_check_report = content_branch(
+                    run_id, user_query, research_results, agents, content_type, script_length, language, tone, callback, use_cache,
+                    writing_mode=writing_mode, edit_mode=edit_mode, prefetch=prefetch, budget=budget
+                )
+            finally:
+                if prefetch: prefetch.close()
+    except Exception as e:
+        logging.exception(f"Run {run_id}: pipeline failed", extra={'run_id': run_id})
+        run_store.update_metadata(run_id, status='failed', error=str(e))
+        if callback: callback(f"Pipeline failed: {e}\nResume with run ID {run_id} to continue from the last completed stage.")
+        return None, None
+
+    run_store.update_metadata(run_id, status='completed', completed_at=time.time())
+    logging.info(f"Run {run_id}: pipeline completed", extra={'run_id': run_id})
+    logging.info(f"Agent construction so far: {construction_stats.report()}")
+    return final_content, fact_check_report
+
+def run_multi_format_pipeline(user_query, content_types, script_lengths=None, language="English", tone="Informational", callback=None, use_cache=True, run_id=None, writing_mode=None, edit_mode=None):
+    """Plans and researches a topic once, then writes every requested format concurrently.
+
+    script_lengths may be a single number of minutes (used for the script format) or a dict keyed by content type.
+    Returns {content_type: (final_content, fact_check_report)}; a format that fails maps to (None, None).
+    """
+    setup_logging()
+    serve_metrics()
+    content_types = list(dict.fromkeys(content_types))
+    if not isinstance(script_lengths, dict):
+        script_lengths = {content_type: script_lengths for content_type in content_types}
+    failed = {content_type: (None, None) for content_type in content_types}
+    if not content_types:
+        return failed
+    for content_type in content_types:
+        error = validate_pipeline_inputs(user_query, content_type, script_lengths.get(content_type), language, tone, writing_mode, edit_mode)
+        if error:
+            logging.warning(f"Invalid pipeline input: {error}")
+            if callback: callback(error)
+            return failed
+
+    params = {'user_query': user_query, 'content_type': content_types, 'script_length': script_lengths, 'language': language, 'tone': tone, 'writing_mode': writing_mode, 'edit_mode': edit_mode}
+    stages = PIPELINE_STAGES[:2] + [f"{format_slug(c)}.{stage}" for c in content_types for stage in PIPELINE_STAGES[2:]]
+    run_id = start_run(run_id, params, stages, callback)
+    logging.info(f"Run {run_id}: multi-format pipeline started for '{user_query}' ({', '.join(content_types)})", extra={'run_id': run_id})
+
+    on_token = token_handler(callback)
+
+    def branch_token_handler(content_type):
+        # Tag streamed tokens with the branch's stage names, e.g. "blog_post.writer"
+        return (lambda stage, chunk: on_token(f"{format_slug(content_type)}.{stage}", chunk)) if on_token else None
+
+    def branch(content_type, research_results, prefetch, blog_budget):
+        # Each branch gets its own agents, since CrewAI agents are not safe to share between concurrent tasks
+        try:
+            with checkout_agents(use_cache=use_cache, on_token=branch_token_handler(content_type)) as agents:
+                return content_branch(
+                    run_id, user_query, research_results, agents, content_type,
+                    script_lengths.get(content_type), language, tone, callback, use_cache, stage_prefix=f"{format_slug(content_type)}.",
+                    writing_mode=writing_mode, edit_mode=edit_mode,
+                    prefetch=prefetch if content_type == "Blog Post" else None, budget=blog_budget if content_type == "Blog Post" else None
+                )
+        except Exception as e:
+            logging.exception(f"Run {run_id}: {content_type} branch failed", extra={'run_id': run_id})
+            if callback: callback(f"{content_type} generation failed: {e}")
+            return None, None
+
+    with run_span(run_id, 'run_multi_format_pipeline'), checkout_agents(use_cache=use_cache) as research_agents:
+        # Only the blog post can be written in sections, so only its sections are started while research is running
+        blog_budget = context_budget()
+        prefetch = start_section_prefetch(
+            user_query, research_agents['writer'], "Blog Post", script_lengths.get("Blog Post"), language, tone, writing_mode, callback, blog_budget
+        ) if "Blog Post" in content_types else None
+        try:
+            try:
+                research_results = research_phase(run_id, user_query, research_agents, callback, use_cache, on_subtopic=prefetch.submit if prefetch else None)
+            except Exception as e:
+                logging.exception(f"Run {run_id}: research failed", extra={'run_id': run_id})
+                run_store.update_metadata(run_id, status='failed', error=str(e))
+                if callback: callback(f"Pipeline failed: {e}\nResume with run ID {run_id} to continue from the last completed stage.")
+                return failed
+
+            with ThreadPoolExecutor(max_workers=len(content_types)) as executor:
+                futures = {content_type: executor.submit(propagate(branch), content_type, research_results, prefetch, blog_budget) for content_type in content_types}
+            results = {content_type: future.result() for content_type, future in futures.items()}
+        finally:
+            if prefetch: prefetch.close()
+
+    failures = [content_type for content_type, (content, _) in results.items() if content is None]
+    if failures:
+        run_store.update_metadata(run_id, status='failed', error=f"Failed formats: {', '.join(failures)}")
+    else:
+        run_store.update_metadata(run_id, status='completed', completed_at=time.time())
+    logging.info(f"Run {run_id}: multi-format pipeline finished ({len(content_types) - len(failures)}/{len(content_types)} formats)", extra={'run_id': run_id})
+    return results
+
+def translate_content(content, language, translator, content_type="Blog Post", tone="Informational"):
+    # Translate finished Markdown with URLs masked, so links come back byte-for-byte
+    masked, urls = mask_urls(content)
+    prompt = get_prompt('Translator', masked, '', content_type, language=language, tone=tone)
+    retry_note = ''
+    for attempt in range(2):
+        # The retry says what went wrong, which also keeps it from being answered by the cached first attempt
+        translated = clean_code_blocks(run_agent_task(translator, retry_note + prompt, f"The complete {content_type} translated into {language}, in Markdown format."))
+        if not is_valid_output(translated):
+            retry_note = "Your previous answer did not contain the translation. Reply with the complete translated text only.\n\n"
+            continue
+        translated, missing = unmask_urls(translated, urls)
+        if not missing:
+            break
+        logging.warning(f"Translation into {language} dropped {len(missing)} link(s) (attempt {attempt + 1})")
+        placeholders = ', '.join(f"{{{{URL_{n}}}}}" for n in missing)
+        retry_note = f"Your previous translation dropped these link placeholders: {placeholders}. Copy each of them unchanged into the translation.\n\n"
+    else:
+        raise ValueError(f"Translation into {language} did not return usable content with all links preserved")
+    mismatches = structure_mismatches(content, translated)
+    if mismatches:
+        logging.warning(f"Translation into {language} changed Markdown structure: {', '.join(mismatches)}")
+    return translated
+
+def run_multi_language_pipeline(user_query, languages, content_type="Blog Post", script_length=None, tone="Informational", callback=None, use_cache=True, run_id=None, max_workers=None, writing_mode=None, edit_mode=None):
+    """Produces the content once in English, then translates it into the other languages concurrently.
+
+    Returns {language: (final_content, fact_check_report)}; the fact-check report is the one for the English
+    source. A language whose translation fails maps to (None, None).
+    """
+    setup_logging()
+    serve_metrics()
+    languages = list(dict.fromkeys(languages))
+    failed = {language: (None, None) for language in languages}
+    if not languages:
+        return failed
+    for language in languages:
+        error = validate_pipeline_inputs(user_query, content_type, script_length, language, tone, writing_mode, edit_mode)
+        if error:
+            logging.warning(f"Invalid pipeline input: {error}")
+            if callback: callback(error)
+            return failed
+
+    targets = [language for language in languages if language != "English"]
+    params = {'user_query': user_query, 'content_type': content_type, 'script_length': script_length, 'language': languages, 'tone': tone, 'writing_mode': writing_mode, 'edit_mode': edit_mode}
+    stages = PIPELINE_STAGES + [f"translate.{format_slug(language)}" for language in targets]
+    run_id = start_run(run_id, params, stages, callback)
+    logging.info(f"Run {run_id}: multi-language pipeline started for '{user_query}' ({', '.join(languages)})", extra={'run_id': run_id})
+
+    with run_span(run_id, 'run_multi_language_pipeline'):
+        prefetch = None
+        try:
+            with checkout_agents(use_cache=use_cache, on_token=token_handler(callback)) as agents:
+                try:
+                    budget = context_budget()
+                    prefetch = start_section_prefetch(user_query, agents['writer'], content_type, script_length, "English", tone, writing_mode, callback, budget)
+                    research_results = research_phase(run_id, user_query, agents, callback, use_cache, on_subtopic=prefetch.submit if prefetch else None)
+                    content, fact_check_report = content_branch(
+                        run_id, user_query, research_results, agents, content_type, script_length, "English", tone, callback, use_cache,
+                        writing_mode=writing_mode, edit_mode=edit_mode, prefetch=prefetch, budget=budget
+                    )
+                finally:
+                    if prefetch: prefetch.close()
+        except Exception as e:
+            logging.exception(f"Run {run_id}: pipeline failed", extra={'run_id': run_id})
+            run_store.update_metadata(run_id, status='failed', error=str(e))
+            if callback: callback(f"Pipeline failed: {e}\nResume with run ID {run_id} to continue from the last completed stage.")
+            return failed
+
+        def translate_with_pooled_translator(language):
+            with translator_pools[bool(use_cache)].checkout() as translator:
+                return translate_content(content, language, translator, content_type, tone)
+
+        def translate(language):
+            try:
+                return run_stage(
+                    run_id, f"translate.{format_slug(language)}",
+                    lambda: translate_with_pooled_translator(language),
+                    callback, inputs={'content': content, 'language': language, 'model': TRANSLATION_MODEL}, use_memo=use_cache
+                )
+            except Exception as e:
+                logging.exception(f"Run {run_id}: translation into {language} failed", extra={'run_id': run_id})
+                if callback: callback(f"Translation into {language} failed: {e}")
+                return None
+
+        results = {"English": (content, fact_check_report)} if "English" in languages else {}
+        if targets:
+            max_workers = max(1, min(max_workers or TRANSLATION_MAX_WORKERS, len(targets)))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {language: executor.submit(propagate(translate), language) for language in targets}
+            for language, future in futures.items():
+                translated = future.result()
+                results[language] = (translated, fact_check_report) if translated else (None, None)
+    results = {language: results[language] for language in languages}
+
+    failures = [language for language, (translated, _) in results.items() if translated is None]
+    if failures:
+        run_store.update_metadata(run_id, status='failed', error=f"Failed languages: {', '.join(failures)}")
+    else:
+        run_store.update_metadata(run_id, status='completed', completed_at=time.time())
+    logging.info(f"Run {run_id}: multi-language pipeline finished ({len(languages) - len(failures)}/{len(languages)} languages)", extra={'run_id': run_id})
+    return results
+
+def stream_pipeline(user_query, **kwargs):
+    """Runs run_pipeline in a background thread and yields its PipelineEvents as they happen.
+
+    Accepts the same keyword arguments as run_pipeline (except callback). Stage events, progress messages and
+    streamed tokens are yielded in order; the last event is a RESULT event whose data['result'] is what
+    run_pipeline returned.
+    """
+    events = EventStream()
+
+    def run():
+        result = (None, None)
+        try:
+            result = run_pipeline(user_query, callback=events, **kwargs)
+        finally:
+            events(PipelineEvent(RESULT, "Pipeline finished.", result=result))
+            events.close()
+    threading.Thread(target=run, daemon=True).start()
+    yield from events
+
+def run_job(params, callback=None, job_id=None):
+    """Job runner for jobs.JobManager: runs the pipeline for a job (resuming its run if it already started).
+
+    The job ID is used as the run ID. Returns {'content', 'fact_check_report'}; raises if the run failed.
+    """
+    final_content, fact_check_report = run_pipeline(callback=callback, run_id=job_id, **params)
+    if not final_content:
+        metadata = run_store.load_metadata(job_id) if job_id and run_store.exists(job_id) else {}
+        raise RuntimeError(metadata.get('error') or "Content generation failed or returned empty.")
+    return {'content': final_content, 'fact_check_report': fact_check_report}
+
+def resume_pipeline(run_id, callback=None, use_cache=True):
+    """Resumes a saved run with its original parameters."""
+    params = run_store.load_metadata(run_id)
+    return run_pipeline(
+        params['user_query'],
+        content_type=params.get('content_type', "Blog Post"),
+        script_length=params.get('script_length'),
+        language=params.get('language', "English"),
+        tone=params.get('tone', "Informational"),
+        callback=callback,
+        use_cache=use_cache,
+        run_id=run_id,
+        writing_mode=params.get('writing_mode'),
+        edit_mode=params.get('edit_mode')
+    )
 
 def extract_body_content(html):
     match = re.search(r"<body[^>]*>(.*?)</body>", html, re.DOTALL | re.IGNORECASE)
@@ -0,0 +1,172 @@
+"""
+Opt-in sampling profiler for pipeline stages.
+
+``SamplingProfiler`` runs a background thread that, while at least one stage
+is being profiled, wakes up every ``interval`` seconds and records the Python
+stack of every thread working on a profiled stage. Each stack is weighted by
+the wall time since the previous sample and, where the platform exposes
+per-thread CPU clocks, by the CPU time the thread used in between, so time
+spent waiting on the network and time spent computing can be told apart.
+
+The samples of a stage are written as collapsed stacks (``frame;frame;frame
+weight``, weights in microseconds), the input format of flamegraph.pl,
+speedscope and similar tools. Nothing is sampled unless a stage is profiled,
+and then the cost is one stack walk per thread per interval.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+
+def profiling_requested():
+    """True when PROFILE_STAGES=1 is set, so profiling can be switched on without code changes."""
+    return os.getenv('PROFILE_STAGES', '0') == '1'
+
+
+def requested_interval():
+    """The sampling interval in seconds set by PROFILE_INTERVAL_MS (10 ms by default)."""
+    return float(os.getenv('PROFILE_INTERVAL_MS', '10')) / 1000
+
+
+def collapse(frame, limit=256):
+    """The stack ending at frame as root-first 'function (file.py:line)' entries joined by ';'."""
+    names = []
+    while frame is not None and len(names) < limit:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+def write_collapsed(path, counts):
+    """Writes {stack: weight} as a collapsed-stack file, heaviest stacks first; returns the path or None if empty."""
+    lines = [f"{stack} {int(weight)}" for stack, weight in sorted(counts.items(), key=lambda item: -item[1]) if int(weight) > 0]
+    if not lines:
+        return None
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+    return path
+
+
+def _thread_cpu_clock(ident):
+    # Per-thread CPU clock id (POSIX only); None where it is not available
+    try:
+        return time.pthread_getcpuclockid(ident)
+    except (AttributeError, OSError, OverflowError):
+        return None
+
+
+class SamplingProfiler:
+    """Samples the stacks of threads working on profiled stages into per-stage wall and CPU profiles.
+
+    A thread belongs to a stage while it runs inside stage(key), or whenever label(thread_ident) returns the key
+    (e.g. for worker threads a stage hands work to). take(key) returns and clears a stage's samples.
+    """
+
+    def __init__(self, interval=0.01, label=None, clock=time.perf_counter):
+        self.interval = interval
+        self.label = label
+        self.clock = clock
+        self.samples = 0
+        self._threads = {}  # thread ident -> [key, ...] (innermost last)
+        self._open = Counter()  # key -> stage() blocks currently profiling it
+        self._wall = {}  # key -> Counter(stack -> microseconds)
+        self._cpu = {}
+        self._cpu_seen = {}  # thread ident -> CPU seconds at the previous sample
+        self._active = 0
+        self._sampler = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, key):
+        """Profiles the with block (and any thread label() assigns to key) under key."""
+        ident = threading.get_ident()
+        with self._lock:
+            self._threads.setdefault(ident, []).append(key)
+            self._open[key] += 1
+            self._active += 1
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._run, name='stage-profiler', daemon=True)
+                self._sampler.start()
+        try:
+            yield
+        finally:
+            with self._lock:
+                keys = self._threads[ident]
+                keys.pop()
+                if not keys:
+                    del self._threads[ident]
+                self._open[key] -= 1
+                if not self._open[key]:
+                    del self._open[key]
+                self._active -= 1
+
+    def take(self, key):
+        """Returns ({stack: wall µs}, {stack: CPU µs}) sampled for key and forgets them."""
+        with self._lock:
+            return dict(self._wall.pop(key, {})), dict(self._cpu.pop(key, {}))
+
+    def write(self, key, directory, name):
+        """Writes a stage's samples to <directory>/<name>.wall.collapsed and .cpu.collapsed; returns the paths written."""
+        wall, cpu = self.take(key)
+        paths = [
+            write_collapsed(os.path.join(directory, f"{name}.wall.collapsed"), wall),
+            write_collapsed(os.path.join(directory, f"{name}.cpu.collapsed"), cpu),
+        ]
+        return [path for path in paths if path]
+
+    def _key_for(self, ident):
+        keys = self._threads.get(ident)
+        if keys:
+            return keys[-1]
+        return self.label(ident) if self.label else None
+
+    def _run(self):
+        sampler = threading.get_ident()
+        previous = self.clock()
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    self._sampler = None
+                    self._cpu_seen.clear()
+                    return
+            now = self.clock()
+            self._sample(sampler, int((now - previous) * 1e6))
+            previous = now
+
+    def _sample(self, sampler, wall_us):
+        frames = sys._current_frames()
+        alive = {thread.ident for thread in threading.enumerate()}
+        for ident, frame in frames.items():
+            if ident == sampler or ident not in alive:
+                continue
+            with self._lock:
+                key = self._key_for(ident)
+                if key not in self._open:
+                    continue
+            stack = collapse(frame)
+            cpu_us = 0
+            clock_id = _thread_cpu_clock(ident)
+            if clock_id is not None:
+                try:
+                    cpu = time.clock_gettime(clock_id)
+                except OSError:
+                    cpu = None
+                if cpu is not None:
+                    last = self._cpu_seen.get(ident)
+                    self._cpu_seen[ident] = cpu
+                    cpu_us = int((cpu - last) * 1e6) if last is not None else 0
+            with self._lock:
+                self._wall.setdefault(key, Counter())[stack] += wall_us
+                if cpu_us > 0:
+                    self._cpu.setdefault(key, Counter())[stack] += cpu_us
+        self.samples += 1
+        # Forget CPU clocks of threads that have exited
+        for ident in set(self._cpu_seen) - set(frames):
+            del self._cpu_seen[ident]
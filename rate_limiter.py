@@ -0,0 +1,141 @@
+"""
+Process-wide rate limiting for the Gemini LLM and Serper search calls.
+
+Every call goes through a shared token bucket, so concurrent agents and runs
+spread their requests out instead of bursting into the API quota. When the API
+still answers with a rate limit error, the limiter reads the suggested
+``retryDelay``, pauses the whole bucket, halves its rate and retries with
+jittered backoff. Successful calls slowly raise the rate back up.
+"""
+
+import functools
+import logging
+import random
+import re
+import threading
+import time
+
+RATE_LIMIT_MARKERS = ('RESOURCE_EXHAUSTED', 'RateLimitError', 'Too Many Requests', '429 Client Error')
+
+# Matches '"retryDelay": "33s"' (JSON errors) as well as 'retry_delay { seconds: 33 }' (gRPC errors)
+RETRY_DELAY_PATTERN = re.compile(
+    r'retry_?delay["\']?\s*[:{]\s*(?:seconds:\s*)?["\']?(\d+(?:\.\d+)?)s?',
+    re.IGNORECASE
+)
+
+
+def is_rate_limit_error(error):
+    """Returns True if the exception (or message) looks like an API rate limit response."""
+    message = f"{type(error).__name__}: {error}" if isinstance(error, BaseException) else str(error)
+    return any(marker in message for marker in RATE_LIMIT_MARKERS)
+
+
+def parse_retry_delay(error):
+    """Extracts the server suggested retry delay in seconds, or None if there is none."""
+    match = RETRY_DELAY_PATTERN.search(str(error))
+    if match:
+        return float(match.group(1))
+    return None
+
+
+class TokenBucket:
+    """Thread-safe token bucket whose refill rate adapts to rate limit feedback."""
+
+    def __init__(self, rate, burst=None, min_rate=None, clock=time.monotonic):
+        self.max_rate = rate
+        self.min_rate = min_rate or rate / 8
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self.tokens = self.burst
+        self.clock = clock
+        self.updated = clock()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self):
+        # Take a token (possibly going into debt) and return how long the caller must wait for it
+        with self._lock:
+            now = self.clock()
+            self._refill(now)
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.blocked_until - now)
+
+    def penalize(self, delay):
+        # Block all callers for delay seconds and halve the rate
+        with self._lock:
+            now = self.clock()
+            self._refill(now)
+            self.blocked_until = max(self.blocked_until, now + delay)
+            self.tokens = min(self.tokens, 0.0)
+            self.rate = max(self.min_rate, self.rate / 2)
+
+    def reward(self):
+        # Additive increase back towards the configured rate after a successful call
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+
+
+class RateLimiter:
+    """Shared limiter that throttles, retries and backs off calls to one API."""
+
+    def __init__(self, name, requests_per_minute, burst=None, max_retries=3,
+                 base_delay=2.0, max_delay=60.0, jitter=0.25, clock=time.monotonic, sleep=time.sleep):
+        self.name = name
+        self.bucket = TokenBucket(requests_per_minute / 60.0, burst=burst, clock=clock)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.sleep = sleep
+        self.stats = {'calls': 0, 'throttled': 0, 'retries': 0, 'wait_seconds': 0.0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def acquire(self):
+        wait = self.bucket.reserve()
+        if wait > 0:
+            self._count('wait_seconds', wait)
+            self.sleep(wait)
+
+    def backoff_delay(self, attempt, retry_after=None):
+        # Server hint wins; otherwise exponential backoff. Jitter keeps concurrent callers from retrying in lockstep.
+        if retry_after is None:
+            retry_after = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return retry_after + random.uniform(0, retry_after * self.jitter)
+
+    def throttle(self, error, attempt=0):
+        """Records a rate limit error, pauses the shared bucket and returns the delay applied."""
+        delay = self.backoff_delay(attempt, parse_retry_delay(error))
+        self._count('throttled')
+        self.bucket.penalize(delay)
+        logging.warning(f"[{self.name}] rate limited, backing off {delay:.1f}s (attempt {attempt + 1})")
+        return delay
+
+    def call(self, fn, *args, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            self.acquire()
+            self._count('calls')
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == self.max_retries:
+                    raise
+                self.throttle(e, attempt)
+                self._count('retries')
+                continue
+            self.bucket.reward()
+            return result
+
+    def wrap(self, fn):
+        @functools.wraps(fn)
+        def limited(*args, **kwargs):
+            return self.call(fn, *args, **kwargs)
+        return limited
@@ -0,0 +1,67 @@
+"""
+Caching and in-run deduplication for the web search tool.
+
+Queries are normalized (case, whitespace, quotes, trailing punctuation) so
+near-identical ``search_query`` values from different agents share one entry.
+Results are persisted in a ``DiskCache`` with a TTL, and concurrent lookups of
+the same query are coalesced into a single API request.
+"""
+
+import functools
+import hashlib
+import json
+import re
+import unicodedata
+
+from utils import SingleFlight
+
+
+def normalize_query(query):
+    """Canonical form of a search query used for cache lookups."""
+    query = unicodedata.normalize('NFKC', str(query or '')).casefold()
+    query = re.sub(r'\s+', ' ', query).strip()
+    query = query.strip('"\'` ')
+    return query.rstrip('?!.,;: ')
+
+
+class SearchCache:
+    """Wraps a search tool's _run with a persistent, single-flight result cache."""
+
+    def __init__(self, store):
+        self.store = store
+        self.flights = SingleFlight()
+
+    def cache_key(self, tool, kwargs):
+        query = kwargs.get('search_query') or kwargs.get('query')
+        params = {
+            'query': normalize_query(query),
+            'search_type': kwargs.get('search_type', getattr(tool, 'search_type', None)),
+            'n_results': getattr(tool, 'n_results', None),
+            'country': getattr(tool, 'country', None),
+            'location': getattr(tool, 'location', None),
+            'locale': getattr(tool, 'locale', None),
+        }
+        payload = json.dumps(params, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def wrap(self, run, tool):
+        @functools.wraps(run)
+        def cached_run(*args, **kwargs):
+            if args or not (kwargs.get('search_query') or kwargs.get('query')):
+                return run(*args, **kwargs)
+            key = self.cache_key(tool, kwargs)
+            cached = self.store.get(key)
+            if cached is not None:
+                return cached
+            return self.flights.do(key, self._fetch, key, run, kwargs)
+        return cached_run
+
+    def _fetch(self, key, run, kwargs):
+        # Another caller may have filled the cache while we waited to become the leader
+        cached = self.store.get(key)
+        if cached is not None:
+            return cached
+        result = run(**kwargs)
+        if result:
+            self.store.set(key, result)
+        return result
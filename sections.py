@@ -0,0 +1,62 @@
+"""
+Helpers for the sectioned writing mode.
+
+Each research subtopic is written as its own section concurrently; a short
+stitching pass then only has to produce a title, an introduction, a transition
+sentence between consecutive sections and a conclusion. These helpers build the
+stitching input, parse its output and assemble the final Markdown article.
+"""
+
+import re
+
+STITCH_FIELD_PATTERN = re.compile(r'^(TITLE|INTRODUCTION|TRANSITION\s+(\d+)|CONCLUSION)\s*:\s*', re.MULTILINE | re.IGNORECASE)
+
+
+def ensure_section_heading(section, subtopic):
+    """Makes sure a section starts with a Markdown heading."""
+    section = section.strip()
+    if section.startswith('#'):
+        return section
+    return f"## {subtopic}\n\n{section}"
+
+
+def section_digest(sections, chars=300):
+    """Short view of each section (heading plus its opening) used as the stitching prompt input."""
+    digests = []
+    for i, section in enumerate(sections, 1):
+        heading, _, body = section.partition('\n')
+        opening = ' '.join(body.split())[:chars]
+        digests.append(f"Section {i}: {heading.lstrip('# ').strip()}\n{opening}")
+    return "\n\n".join(digests)
+
+
+def parse_stitch_output(text):
+    """Parses TITLE/INTRODUCTION/TRANSITION n/CONCLUSION fields from the stitching pass."""
+    parsed = {'title': '', 'introduction': '', 'transitions': {}, 'conclusion': ''}
+    matches = list(STITCH_FIELD_PATTERN.finditer(text))
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        value = text[match.end():end].strip()
+        field = match.group(1).upper()
+        if field.startswith('TRANSITION'):
+            parsed['transitions'][int(match.group(2))] = value
+        else:
+            parsed[field.lower()] = value
+    return parsed
+
+
+def assemble_article(sections, stitch):
+    """Joins the sections with the stitched title, introduction, transitions and conclusion."""
+    parts = []
+    if stitch.get('title'):
+        parts.append(f"# {stitch['title'].lstrip('# ').strip()}")
+    if stitch.get('introduction'):
+        parts.append(stitch['introduction'])
+    for i, section in enumerate(sections, 1):
+        parts.append(section)
+        transition = stitch.get('transitions', {}).get(i)
+        if transition and i < len(sections):
+            parts.append(transition)
+    if stitch.get('conclusion'):
+        parts.append(f"## Conclusion\n\n{stitch['conclusion']}")
+    return "\n\n".join(parts)
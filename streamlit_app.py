@@ -1,7 +1,7 @@
 import os
 import streamlit as st
 import sys
-import traceback
+import threading
 import streamlit.components.v1 as components
 import streamlit as st # Ensure streamlit is imported as st
 import markdown # Import the markdown library
@@ -15,7 +15,8 @@ if project_root not in sys.path:
 # Import the main pipeline function AFTER setting the path
 try:
     # Assuming main.py is in the same directory as this streamlit_app.py
-    from main import run_pipeline, clean_code_blocks, get_trending_topics, search_tool # Import new function and search_tool
+    from main import run_job, generation_key, clean_code_blocks, trend_store, warm_agent_pool, stage_latency_report, serve_metrics, JOBS_DIR, JOB_MAX_WORKERS, COALESCE_REQUESTS, COALESCE_RESULT_TTL # Import pipeline helpers and the shared trending topics store
+    from jobs import JobManager, ACTIVE_STATUSES, RESUMABLE_STATUSES
 except ImportError as e:
     st.error(f"Error importing functions from main.py: {e}")
     st.error(f"Project Root: {project_root}")
@@ -25,6 +26,18 @@ except ImportError as e:
 # --- Page Config ---
 st.set_page_config(layout="wide", page_title="AI Content Studio", page_icon="🚀")
 
+# --- Background Jobs ---
+# One job manager per server process: pipeline runs execute on its worker pool, not in the session's script thread,
+# and their status/results are kept on disk so a refresh or reconnect can pick them up again by job ID
+@st.cache_resource
+def get_job_manager():
+    # Build the pooled agents in the background so the first run does not pay for it
+    threading.Thread(target=warm_agent_pool, daemon=True).start()
+    serve_metrics()
+    return JobManager(JOBS_DIR, run_job, max_workers=JOB_MAX_WORKERS, result_ttl=COALESCE_RESULT_TTL)
+
+job_manager = get_job_manager()
+
 # --- Custom CSS (Optional - for finer control if needed later) ---
 # st.markdown("""<style> ... </style>""", unsafe_allow_html=True)
 
@@ -72,13 +85,10 @@ left_spacer, main_col, right_spacer = st.columns([1, 2, 1]) # Adjust ratios as n
 
 with main_col:
     # --- Trending Topics Section ---
-    @st.cache_data(ttl=3600) # Cache for 1 hour
     def fetch_trends():
-        print("Attempting to fetch trending topics...") # Add print statement for debugging
+        # Served instantly from the shared on-disk store; stale topics are refreshed in the background
         try:
-            topics = get_trending_topics(search_tool, num_topics=6)
-            print(f"Fetched topics: {topics}") # Debug print
-            return topics
+            return trend_store.get()
         except Exception as e:
             print(f"Error in fetch_trends: {e}") # Debug print
             return []
@@ -162,6 +172,13 @@ with main_col:
             help="Enter the desired duration for the video/podcast script."
         )
 
+    # --- Cache Bypass ---
+    st.checkbox(
+        "Regenerate from scratch (ignore cached AI responses)",
+        key='bypass_cache',
+        help="By default, identical agent requests are answered from the response cache. Tick this to force fresh responses for this run."
+    )
+
     st.markdown("<br>", unsafe_allow_html=True) # Add space before button
 
 # Initialize session state for blog content if it doesn't exist
@@ -182,35 +199,89 @@ if run_button:
     if not st.session_state.get('user_query_input', ''):
         show_warning_message("Please enter a topic description above.")
     else:
-        with main_col, st.spinner("🤖 The AI agents are working... This may take several minutes..."):
-            try:
-                query_to_run = st.session_state.user_query_input
-                selected_content_type = st.session_state.content_type
-                script_length = None
-                if selected_content_type == "Video/Podcast Script":
-                    script_length = st.session_state.get('script_length_minutes', 5)
-                selected_language = st.session_state.selected_language
-                selected_tone = st.session_state.selected_tone
-
-                blog_post_content, fact_check_report = run_pipeline(
-                    query_to_run, content_type=selected_content_type, script_length=script_length, language=selected_language, tone=selected_tone, callback=None)
-
-                st.session_state.blog_post_content = blog_post_content
-                st.session_state.fact_check_report = fact_check_report
-
-                if blog_post_content:
-                    show_success_message("✅ Content generation complete!")
-                else:
-                    show_error_message(
-                        "😔 Content generation failed or returned empty. Please check your input and try again.",
-                        debug_info="If you see this message repeatedly, please check your topic, content type, and other settings. If the problem persists, contact support or check the logs for more details."
-                    )
-                    st.session_state.blog_post_content = None
-                    st.session_state.fact_check_report = None
-            except Exception as e:
-                show_error_message("An error occurred during the pipeline execution:", debug_info=traceback.format_exc())
-                st.session_state.blog_post_content = None
-                st.session_state.fact_check_report = None
+        script_length = None
+        if st.session_state.content_type == "Video/Podcast Script":
+            script_length = st.session_state.get('script_length_minutes', 5)
+        job_params = {
+            'user_query': st.session_state.user_query_input,
+            'content_type': st.session_state.content_type,
+            'script_length': script_length,
+            'language': st.session_state.selected_language,
+            'tone': st.session_state.selected_tone,
+            'use_cache': not st.session_state.get('bypass_cache', False),
+        }
+        # Identical requests (e.g. several users clicking the same trending topic) attach to one job and share its result
+        job_id = job_manager.submit(
+            job_params, key=generation_key(job_params) if COALESCE_REQUESTS else None, reuse_result=job_params['use_cache']
+        )
+        # Keep the job ID in the URL so a browser refresh or reconnect finds the job again
+        st.query_params['job'] = job_id
+        st.session_state.blog_post_content = None
+        st.session_state.fact_check_report = None
+
+@st.fragment(run_every=2)
+def show_job_progress(job_id):
+    # Poll the job while it is queued or running; once it finishes, rerun the whole app to show the result
+    job = job_manager.get(job_id)
+    if job['status'] not in ACTIVE_STATUSES:
+        st.rerun(scope="app")
+    if job['status'] == 'queued':
+        ahead = job_manager.queue_position(job_id)
+        st.info(f"⏳ Job `{job_id}` is queued{f' behind {ahead} other job(s)' if ahead else ''}. You can close this page and come back later.")
+    else:
+        st.info(f"🤖 The AI agents are working on job `{job_id}`... Current stage: **{job.get('stage') or 'starting'}**")
+    with st.expander("Progress", expanded=False):
+        st.text("\n".join(job['messages'][-15:]))
+    if job.get('draft'):
+        st.markdown(f"**Live output ({job.get('draft_stage')}):**\n\n{clean_code_blocks(job['draft'])}")
+
+current_job_id = st.query_params.get('job')
+if current_job_id:
+    try:
+        current_job = job_manager.get(current_job_id)
+    except ValueError:
+        current_job = None
+    with main_col:
+        if current_job is None:
+            show_warning_message(f"Job {current_job_id} was not found.")
+        elif current_job['status'] in ACTIVE_STATUSES:
+            show_job_progress(current_job_id)
+        elif current_job['status'] == 'completed':
+            if st.session_state.get('loaded_job_id') != current_job_id:
+                st.session_state.loaded_job_id = current_job_id
+                st.session_state.blog_post_content = current_job['result']['content']
+                st.session_state.fact_check_report = current_job['result']['fact_check_report']
+                st.session_state.result_content_type = current_job['params']['content_type']
+                show_success_message("✅ Content generation complete!")
+        elif current_job['status'] in RESUMABLE_STATUSES:
+            show_error_message(
+                "😔 Content generation failed or was interrupted. You can resume it from the last completed stage.",
+                debug_info=current_job.get('traceback') or current_job.get('error') or "The server restarted while this job was running."
+            )
+            if st.button("🔁 Resume job", use_container_width=True):
+                job_manager.resume(current_job_id)
+                st.rerun()
+
+# --- Recent Jobs ---
+with st.sidebar:
+    st.subheader("🗂️ Recent jobs")
+    for job in job_manager.list_jobs(limit=10):
+        label = f"{job['status']} · {str(job['params'].get('user_query', ''))[:40]}"
+        if st.button(label, key=f"job_{job['id']}", use_container_width=True):
+            st.query_params['job'] = job['id']
+            st.rerun()
+
+# --- Stage Latency ---
+with st.sidebar:
+    st.subheader("📈 Stage latency")
+    latency = stage_latency_report()
+    if latency:
+        st.dataframe(
+            [{'stage': stage, 'runs': entry['count'], 'p50 (s)': entry['p50'], 'p95 (s)': entry['p95'], 'p99 (s)': entry['p99']} for stage, entry in latency.items()],
+            hide_index=True, use_container_width=True
+        )
+    else:
+        st.caption("Percentiles appear here once a run has completed a stage.")
 
 # --- Display Area (Remains full width) ---
 st.markdown("---")
@@ -241,7 +312,7 @@ if st.session_state.get('blog_post_content'):
         st.error(f"Error preparing Markdown download data: {e}")
 
     # --- Prepare HTML Download Data (Only for Blog Posts) ---
-    if st.session_state.content_type == "Blog Post":
+    if st.session_state.get('result_content_type', st.session_state.content_type) == "Blog Post":
         try:
             # Convert Markdown from session state to HTML
             html_content = markdown.markdown(cleaned_md_content)
@@ -288,7 +359,7 @@ if st.session_state.get('blog_post_content'):
 elif run_button and not st.session_state.get('user_query_input', ''):
     # This case is handled inside the main 'if run_button' block now
     pass # No need for separate handling here
-elif not run_button and not st.session_state.get('blog_post_content'):
+elif not run_button and not st.session_state.get('blog_post_content') and not current_job_id:
     # Show initial message only if not run and no content exists
     st.info("Enter a topic or select a trending one, then click 'Generate Content' to start.")
 
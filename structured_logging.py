@@ -0,0 +1,224 @@
+"""
+Non-blocking structured logging.
+
+``configure_logging`` replaces the synchronous ``logging.basicConfig`` file
+handler with a bounded queue: a log call on a pipeline thread only filters
+the record, merges its message and puts it on the queue (dropping it, and
+counting the drop, if the queue is full), and a background listener thread
+formats records as JSON lines and writes them to a size-rotated file.
+
+Every record is tagged with the run, stage and agent it was logged from (see
+``context``), each stage can have its own verbosity, and the step-by-step
+traces of CrewAI agents (``agent_step_logger``, which replaces their
+``verbose`` console output) are sampled.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import threading
+import time
+
+AGENT_TRACE_LOGGER = "agents.trace"
+
+# Attributes every LogRecord has; anything else on a record was passed in `extra` and is logged as a field
+_STANDARD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'taskName'}
+
+
+def level_number(name):
+    """The number of a level name such as "debug"; unknown names raise ValueError."""
+    number = logging.getLevelName(str(name).strip().upper())
+    if not isinstance(number, int):
+        raise ValueError(f"Unknown log level: {name}")
+    return number
+
+
+def parse_levels(spec):
+    """Parses "research=DEBUG,seo=WARNING" into {stage: level number}; unknown levels raise ValueError."""
+    levels = {}
+    for item in (spec or '').split(','):
+        if not item.strip():
+            continue
+        stage, _, level = item.partition('=')
+        levels[stage.strip()] = level_number(level)
+    return levels
+
+
+def _truncate(text, limit):
+    text = str(text or '')
+    return text if len(text) <= limit else text[:limit] + '…'
+
+
+def agent_step_logger(agent_name, limit=500):
+    """Returns a CrewAI step_callback that logs each agent step (thought, tool call, output) as a trace record."""
+    logger = logging.getLogger(AGENT_TRACE_LOGGER)
+
+    def log_step(step):
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        tool = getattr(step, 'tool', None)
+        logger.info(
+            f"{agent_name} {'called ' + tool if tool else 'step'}",
+            extra={
+                'agent': agent_name, 'step': type(step).__name__, 'tool': tool,
+                'thought': _truncate(getattr(step, 'thought', ''), limit),
+                'output': _truncate(getattr(step, 'output', None) or getattr(step, 'result', None) or getattr(step, 'text', ''), limit),
+            }
+        )
+    return log_step
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as one JSON object: time, level, logger, message, run_id/stage/agent and any extra fields."""
+
+    def format(self, record):
+        entry = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'run_id': getattr(record, 'run_id', None),
+            'stage': getattr(record, 'stage', None),
+            'agent': getattr(record, 'agent', None),
+            'thread': record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRIBUTES and key not in entry:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class ContextFilter(logging.Filter):
+    """Tags records with context() (e.g. {'run_id', 'stage', 'agent'}) and applies per-stage levels and trace sampling.
+
+    Runs on the logging thread, before the record is queued, so it sees that thread's run and stage.
+    """
+
+    def __init__(self, context=None, level=logging.INFO, stage_levels=None, trace_sample_rate=1.0, rng=None):
+        super().__init__()
+        self.context = context
+        self.level = level
+        self.stage_levels = stage_levels or {}
+        self.trace_sample_rate = trace_sample_rate
+        self.rng = rng or random.Random()
+
+    def stage_level(self, stage):
+        # "blog_post.writer" uses the level set for "blog_post.writer" or, failing that, for "writer"
+        if stage is None:
+            return self.level
+        return self.stage_levels.get(stage, self.stage_levels.get(stage.rsplit('.', 1)[-1], self.level))
+
+    def filter(self, record):
+        for key, value in (self.context() if self.context else {}).items():
+            if getattr(record, key, None) is None:
+                setattr(record, key, value)
+        if record.levelno < self.stage_level(getattr(record, 'stage', None)):
+            return False
+        if record.name == AGENT_TRACE_LOGGER and record.levelno < logging.WARNING:
+            return self.rng.random() < self.trace_sample_rate
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """A QueueHandler that never blocks: when the queue is full the record is dropped and counted."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Merge the message and render the traceback here, so the listener never touches the caller's arguments
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg, record.args, record.exc_info = record.message, None, None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class DrainingQueueListener(logging.handlers.QueueListener):
+    """A QueueListener whose stop waits for room on a full queue instead of failing to enqueue its sentinel."""
+
+    def __init__(self, log_queue, *handlers, stop_timeout=5.0):
+        super().__init__(log_queue, *handlers)
+        self.stop_timeout = stop_timeout
+
+    def enqueue_sentinel(self):
+        # The thread is still writing out the queued records, so room frees up; raises queue.Full if it does not
+        self.queue.put(self._sentinel, timeout=self.stop_timeout)
+
+
+class LogPipeline:
+    """The queue handler installed on a logger and the listener thread that writes its records."""
+
+    def __init__(self, logger, handler, listener, file_handler):
+        self.logger = logger
+        self.handler = handler
+        self.listener = listener
+        self.file_handler = file_handler
+        self._stopped = False
+        self._lock = threading.Lock()
+
+    @property
+    def dropped(self):
+        return self.handler.dropped
+
+    def stop(self):
+        """Writes out the queued records, then detaches the handler and closes the file."""
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+        self.logger.removeHandler(self.handler)
+        try:
+            self.listener.stop()
+        except queue.Full:
+            # The listener made no progress within its stop timeout; write out what is left from this thread
+            while True:
+                try:
+                    record = self.handler.queue.get_nowait()
+                except queue.Empty:
+                    break
+                self.file_handler.handle(record)
+        if self.handler.dropped:
+            self.file_handler.handle(logging.makeLogRecord({
+                'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                'msg': f"{self.handler.dropped} log records were dropped because the log queue was full",
+            }))
+        self.file_handler.close()
+
+
+def configure_logging(path, level=logging.INFO, stage_levels=None, trace_sample_rate=1.0, max_bytes=10 * 1024 * 1024,
+                      backups=5, queue_size=10000, context=None, logger=None):
+    """Sends the records of logger (the root logger by default) through a queue to a rotating JSON lines file.
+
+    Returns the LogPipeline; it is stopped (flushing the queue) at interpreter exit.
+    """
+    logger = logger or logging.getLogger()
+    stage_levels = stage_levels or {}
+    file_handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8', delay=True)
+    file_handler.setFormatter(JsonFormatter())
+    handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    handler.addFilter(ContextFilter(context, level, stage_levels, trace_sample_rate))
+    # The logger lets through everything some stage may want; the filter applies each stage's own level
+    logger.setLevel(min([level, *stage_levels.values()]))
+    logger.addHandler(handler)
+    listener = DrainingQueueListener(handler.queue, file_handler)
+    listener.start()
+    pipeline = LogPipeline(logger, handler, listener, file_handler)
+    atexit.register(pipeline.stop)
+    return pipeline
@@ -0,0 +1,75 @@
+import threading
+import unittest
+from agent_pool import AgentPool, ConstructionStats
+
+class TestAgentPool(unittest.TestCase):
+    def setUp(self):
+        self.built = []
+
+        def factory():
+            self.built.append(object())
+            return self.built[-1]
+        self.pool = AgentPool(factory, kind='agents', max_idle=2)
+
+    def test_released_objects_are_reused(self):
+        first = self.pool.acquire()
+        self.pool.release(first)
+        self.assertIs(self.pool.acquire(), first)
+        report = self.pool.report()
+        self.assertEqual((report['built'], report['reused'], report['in_use'], report['idle']), (1, 1, 1, 0))
+
+    def test_concurrent_users_get_distinct_objects(self):
+        held = []
+        lock = threading.Lock()
+        barrier = threading.Barrier(4)
+
+        def use():
+            with self.pool.checkout() as item:
+                with lock:
+                    held.append(item)
+                barrier.wait(5)
+        threads = [threading.Thread(target=use) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len({id(item) for item in held}), 4)
+        # Only max_idle objects are kept once everyone is done
+        self.assertEqual((self.pool.idle, self.pool.in_use), (2, 0))
+
+    def test_objects_from_a_failed_checkout_are_discarded(self):
+        with self.assertRaises(RuntimeError):
+            with self.pool.checkout():
+                raise RuntimeError("run failed")
+        self.assertEqual((self.pool.idle, self.pool.in_use), (0, 0))
+        with self.pool.checkout() as item:
+            self.assertIs(item, self.built[-1])
+        self.assertEqual(len(self.built), 2)
+
+    def test_warm_builds_ahead_of_use(self):
+        self.pool.warm(5)
+        self.assertEqual((len(self.built), self.pool.idle), (2, 2))
+        with self.pool.checkout():
+            pass
+        self.assertEqual(self.pool.report()['reused'], 1)
+
+    def test_failed_factory_does_not_leak_a_checkout(self):
+        pool = AgentPool(lambda: 1 / 0)
+        with self.assertRaises(ZeroDivisionError):
+            pool.acquire()
+        self.assertEqual(pool.in_use, 0)
+
+class TestConstructionStats(unittest.TestCase):
+    def test_report(self):
+        stats = ConstructionStats()
+        stats.record('crew', 0.25)
+        stats.record('crew', 0.75)
+        stats.record_reuse('agent_set')
+        with stats.measure('agent_set'):
+            pass
+        report = stats.report()
+        self.assertEqual(report['crew'], {'built': 2, 'reused': 0, 'seconds': 1.0, 'avg_ms': 500.0})
+        self.assertEqual((report['agent_set']['built'], report['agent_set']['reused']), (1, 1))
+
+if __name__ == '__main__':
+    unittest.main()
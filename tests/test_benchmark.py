@@ -0,0 +1,32 @@
+import unittest
+from benchmark import compare_reports, summarize
+
+def report(e2e_p50, throughput, stage_p50, memory=50.0):
+    return {
+        'cold_start': {'seconds': 2.0},
+        'trending_topics': {'p50': 0.01},
+        'levels': {'1': {
+            'e2e': {'p50': e2e_p50, 'p95': e2e_p50 * 1.5},
+            'throughput_per_minute': throughput,
+            'stages': {'writer': {'p50': stage_p50}},
+        }},
+        'peak_memory_mb': memory,
+    }
+
+class TestBenchmarkReports(unittest.TestCase):
+    def test_summarize(self):
+        self.assertEqual(summarize([4.0, 1.0, 3.0, 2.0])['p50'], 2.5)
+        self.assertEqual(summarize([]), {'count': 0, 'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'max': 0.0})
+        self.assertEqual(summarize([1.0, 2.0, 3.0]), {'count': 3, 'mean': 2.0, 'p50': 2.0, 'p95': 2.9, 'max': 3.0})
+
+    def test_compare_flags_slowdowns_and_throughput_drops(self):
+        baseline = report(10.0, 6.0, 3.0)
+        self.assertEqual(compare_reports(baseline, report(10.5, 5.8, 3.1)), [])
+        regressions = {item['metric']: item for item in compare_reports(baseline, report(12.0, 5.0, 3.0, memory=80.0))}
+        self.assertEqual(sorted(regressions), ['c1.e2e.p50', 'c1.e2e.p95', 'c1.throughput_per_minute', 'peak_memory_mb'])
+        self.assertEqual(regressions['c1.e2e.p50']['change'], 0.2)
+        # Getting faster is never a regression
+        self.assertEqual(compare_reports(baseline, report(5.0, 12.0, 1.0, memory=20.0)), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+from cache import DiskCache, LLMResponseCache, llm_cache_key
+
+class FakeLLM:
+    model = "gemini/test"
+    temperature = 0.2
+    def __init__(self):
+        self.calls = 0
+    def call(self, messages, tools=None, callbacks=None, available_functions=None):
+        self.calls += 1
+        return f"response {self.calls}"
+
+class TestDiskCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'cache.sqlite3')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_hit_and_miss_counters(self):
+        cache = DiskCache(self.path)
+        self.assertIsNone(cache.get('missing'))
+        cache.set('key', {'value': 1})
+        self.assertEqual(cache.get('key'), {'value': 1})
+        self.assertEqual(cache.stats['hits'], 1)
+        self.assertEqual(cache.stats['misses'], 1)
+
+    def test_ttl_expiry(self):
+        cache = DiskCache(self.path, ttl=10)
+        with patch('cache.time.time', return_value=1000):
+            cache.set('key', 'value')
+        with patch('cache.time.time', return_value=1011):
+            self.assertIsNone(cache.get('key'))
+        self.assertEqual(len(cache), 0)
+
+    def test_lru_eviction(self):
+        cache = DiskCache(self.path, max_entries=2)
+        with patch('cache.time.time', return_value=1):
+            cache.set('a', 1)
+        with patch('cache.time.time', return_value=2):
+            cache.set('b', 2)
+        with patch('cache.time.time', return_value=3):
+            cache.get('a')
+        with patch('cache.time.time', return_value=4):
+            cache.set('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.stats['evictions'], 1)
+
+    def test_shared_between_threads(self):
+        cache = DiskCache(self.path)
+        threads = [threading.Thread(target=cache.set, args=(f"k{i}", i)) for i in range(8)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+        self.assertEqual(DiskCache(self.path).get('k7'), 7)
+
+    def test_worker_threads_leave_no_connection_open(self):
+        cache = DiskCache(self.path)
+        connections = []
+        connect = sqlite3.connect
+        def tracked(*args, **kwargs):
+            connections.append(connect(*args, **kwargs))
+            return connections[-1]
+        with patch('cache.sqlite3.connect', tracked):
+            threads = [threading.Thread(target=lambda i=i: (cache.set(f"k{i}", i), cache.get(f"k{i}"))) for i in range(4)]
+            for t in threads: t.start()
+            for t in threads: t.join()
+        self.assertEqual(len(connections), 8)
+        for conn in connections:
+            with self.assertRaises(sqlite3.ProgrammingError):
+                conn.execute("SELECT 1") # Closed
+
+class TestLLMResponseCache(unittest.TestCase):
+    def test_same_prompt_is_served_from_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            llm = FakeLLM()
+            cached = LLMResponseCache(DiskCache(os.path.join(tmp, 'llm.sqlite3'))).wrap(llm.call, llm)
+            messages = [{'role': 'system', 'content': 'You are Writer.'}, {'role': 'user', 'content': 'Write.'}]
+            self.assertEqual(cached(messages), "response 1")
+            self.assertEqual(cached(messages), "response 1")
+            self.assertEqual(cached(messages[:1] + [{'role': 'user', 'content': 'Edit.'}]), "response 2")
+            self.assertEqual(llm.calls, 2)
+
+    def test_key_depends_on_model_and_temperature(self):
+        self.assertNotEqual(llm_cache_key('r', 'p', 'm', 0.2), llm_cache_key('r', 'p', 'm', 0.7))
+        self.assertNotEqual(llm_cache_key('r', 'p', 'm1', 0.2), llm_cache_key('r', 'p', 'm2', 0.2))
+
+if __name__ == '__main__':
+    unittest.main()
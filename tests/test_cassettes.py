@@ -0,0 +1,88 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from cassettes import Cassette, CassetteMiss, ReplayedError, task_label
+from rate_limiter import is_rate_limit_error
+
+class TestCassette(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.path = os.path.join(self.root, 'nested', 'cassette.jsonl.gz')
+        self.sleeps = []
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def cassette(self, mode, time_scale=1.0, clock=None):
+        return Cassette(self.path, mode=mode, time_scale=time_scale, clock=clock or (lambda: 0.0), sleep=self.sleeps.append)
+
+    def wrap(self, cassette, fn, **kwargs):
+        return cassette.wrap('llm', fn, lambda prompt, **_: {'prompt': prompt}, **kwargs)
+
+    def test_record_then_replay_offline(self):
+        ticks = iter([0.0, 1.5, 2.0, 2.25])
+        recorder = self.cassette('record', clock=lambda: next(ticks))
+        call = self.wrap(recorder, lambda prompt: prompt.upper())
+        self.assertEqual(call("outline"), "OUTLINE")
+        self.assertEqual(call("draft"), "DRAFT")
+        self.assertEqual(recorder.stats['recorded'], 2)
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            self.assertEqual(json.loads(f.readline())['cassette'], 1)
+
+        def offline(prompt):
+            raise AssertionError("replay must not call through")
+        player = self.cassette('replay', time_scale=0.5)
+        call = self.wrap(player, offline)
+        self.assertEqual(call("draft"), "DRAFT")
+        self.assertEqual(call("outline"), "OUTLINE")
+        self.assertEqual(self.sleeps, [0.125, 0.75])
+        self.assertEqual(player.stats, {'recorded': 0, 'replayed': 2, 'missed': 0})
+        self.assertEqual([entry['response'] for entry in player.entries('llm')], ["OUTLINE", "DRAFT"])
+
+    def test_repeated_requests_replay_in_order_then_repeat_last(self):
+        answers = iter(["first", "second"])
+        call = self.wrap(self.cassette('record'), lambda prompt: next(answers))
+        self.assertEqual([call("same"), call("same")], ["first", "second"])
+        call = self.wrap(self.cassette('replay', time_scale=0), lambda prompt: None)
+        self.assertEqual([call("same"), call("same"), call("same")], ["first", "second", "second"])
+        self.assertEqual(self.sleeps, [])
+
+    def test_recorded_errors_are_raised_again(self):
+        def fail(prompt):
+            raise RuntimeError('429 RESOURCE_EXHAUSTED "retryDelay": "2s"')
+        with self.assertRaises(RuntimeError):
+            self.wrap(self.cassette('record'), fail)("busy")
+        with self.assertRaises(ReplayedError) as raised:
+            self.wrap(self.cassette('replay'), fail)("busy")
+        self.assertTrue(str(raised.exception).startswith("RuntimeError: 429"))
+        self.assertTrue(is_rate_limit_error(raised.exception))
+
+    def test_unknown_request_is_a_miss(self):
+        self.wrap(self.cassette('record'), lambda prompt: "ok")("known")
+        player = self.cassette('replay')
+        with self.assertRaises(CassetteMiss):
+            self.wrap(player, lambda prompt: "ok")("unknown")
+        self.assertEqual(player.stats['missed'], 1)
+
+    def test_replayed_responses_are_passed_to_on_replay_and_labels_are_stored(self):
+        self.wrap(self.cassette('record'), lambda prompt: "text", label=lambda request: request['prompt'][:4])("labelled")
+        self.assertEqual(self.cassette('replay').entries()[0]['label'], "labe")
+        seen = []
+        self.wrap(self.cassette('replay', time_scale=0), lambda prompt: None, on_replay=seen.append)("labelled")
+        self.assertEqual(seen, ["text"])
+
+    def test_invalid_mode(self):
+        with self.assertRaises(ValueError):
+            Cassette(self.path, mode="rewind")
+
+class TestTaskLabel(unittest.TestCase):
+    def test_label_is_the_current_task(self):
+        messages = [{'role': 'system', 'content': "You are Planner."}, {'role': 'user', 'content': "\nCurrent Task: Plan the structure for 'AI'\n"}]
+        self.assertEqual(task_label(messages), "Plan the structure for 'AI'")
+        self.assertEqual(task_label("Just a prompt"), "Just a prompt")
+
+if __name__ == '__main__':
+    unittest.main()
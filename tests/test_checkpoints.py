@@ -0,0 +1,41 @@
+import tempfile
+import unittest
+from checkpoints import RunStore, stage_memo_key, normalize_topic
+
+class TestRunStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = RunStore(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_save_and_resume_stages(self):
+        run_id = self.store.new_run_id()
+        self.store.save_metadata(run_id, {'user_query': 'AI in healthcare'})
+        self.store.save(run_id, 'planner', ['Diagnostics', 'Drug discovery'])
+        self.store.save(run_id, 'research', {'Diagnostics': 'Findings'})
+        stages = ['planner', 'research', 'writer']
+        self.assertEqual(self.store.completed_stages(run_id, stages), ['planner', 'research'])
+        self.assertEqual(self.store.load(run_id, 'research'), {'Diagnostics': 'Findings'})
+        self.assertIsNone(self.store.load(run_id, 'writer'))
+        self.assertEqual(self.store.list_runs(), [run_id])
+        self.assertEqual(self.store.load_metadata(run_id)['user_query'], 'AI in healthcare')
+
+    def test_rejects_unsafe_run_ids(self):
+        with self.assertRaises(ValueError):
+            self.store.run_dir('../outside')
+
+class TestStageMemoKey(unittest.TestCase):
+    def test_key_depends_only_on_inputs(self):
+        inputs = {'topic': normalize_topic('AI in  Healthcare'), 'subtopics': ['Diagnostics']}
+        same = {'subtopics': ['Diagnostics'], 'topic': normalize_topic('ai in healthcare')}
+        self.assertEqual(stage_memo_key('research', inputs), stage_memo_key('research', same))
+        self.assertNotEqual(stage_memo_key('research', inputs), stage_memo_key('planner', inputs))
+        self.assertNotEqual(
+            stage_memo_key('writer', {'research': 'x', 'tone': 'Formal'}),
+            stage_memo_key('writer', {'research': 'x', 'tone': 'Humorous'})
+        )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+from edit_ops import EditError, apply_edit_response, parse_edits
+
+POST = """Opening paragraph about AI.
+
+## Diagnostics
+
+AI reads scans. It is fast.
+
+Doctors still decide.
+
+## Drug Discovery
+
+Molecules are found faster."""
+
+class TestEditOps(unittest.TestCase):
+    def test_replace_insert_and_append(self):
+        response = """<<<EDIT
+SECTION: Diagnostics
+ACTION: REPLACE
+FIND:
+It is fast.
+NEW:
+It is remarkably fast.
+>>>END
+<<<EDIT
+SECTION: Diagnostics
+ACTION: INSERT_AFTER
+FIND:
+AI reads scans.
+NEW:
+Radiologists call it a second pair of eyes.
+>>>END
+<<<EDIT
+SECTION: drug discovery
+ACTION: APPEND
+NEW:
+Trials remain slow.
+>>>END"""
+        edited = apply_edit_response(POST, response)
+        self.assertIn("AI reads scans. It is remarkably fast.\n\nRadiologists call it a second pair of eyes.\n\nDoctors still decide.", edited)
+        self.assertTrue(edited.endswith("Molecules are found faster.\n\nTrials remain slow."))
+
+    def test_meta_description_is_placed_first(self):
+        response = "META_DESCRIPTION: How AI is changing medicine.\n<<<EDIT\nSECTION: INTRO\nACTION: REPLACE\nFIND:\nOpening paragraph\nNEW:\nAn opening paragraph\n>>>END"
+        edited = apply_edit_response(POST, response, require_meta=True)
+        self.assertTrue(edited.startswith("META_DESCRIPTION: How AI is changing medicine.\n\nAn opening paragraph about AI."))
+
+    def test_unappliable_edits_raise(self):
+        missing = "<<<EDIT\nSECTION: Diagnostics\nACTION: REPLACE\nFIND:\nnot in the post\nNEW:\nx\n>>>END"
+        with self.assertRaises(EditError):
+            apply_edit_response(POST, missing)
+        with self.assertRaises(EditError):
+            apply_edit_response(POST, "Here is the full rewritten post...")
+        with self.assertRaises(EditError):
+            apply_edit_response(POST, "<<<EDIT\nSECTION: Nowhere\nACTION: APPEND\nNEW:\nx\n>>>END")
+
+    def test_parse_requires_find_for_replace(self):
+        with self.assertRaises(EditError):
+            parse_edits("<<<EDIT\nSECTION: Diagnostics\nACTION: REPLACE\nNEW:\nx\n>>>END")
+
+    def test_no_edits_keeps_the_post(self):
+        self.assertEqual(apply_edit_response(POST, "NO_EDITS"), POST)
+        edited = apply_edit_response(POST, "META_DESCRIPTION: How AI is changing medicine.\nNO_EDITS", require_meta=True)
+        self.assertEqual(edited, f"META_DESCRIPTION: How AI is changing medicine.\n\n{POST}")
+        with self.assertRaises(EditError):
+            apply_edit_response(POST, "No changes needed.")
+        with self.assertRaises(EditError):
+            apply_edit_response(POST, "NO_EDITS", require_meta=True)
+
+    def test_truncated_edit_block_raises(self):
+        first = "<<<EDIT\nSECTION: Diagnostics\nACTION: APPEND\nNEW:\nRadiologists agree.\n>>>END\n"
+        with self.assertRaises(EditError):
+            apply_edit_response(POST, first + "<<<EDIT\nSECTION: Drug Discovery\nACTION: REPLACE\nFIND:\nMolecules are")
+
+if __name__ == '__main__':
+    unittest.main()
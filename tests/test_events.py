@@ -0,0 +1,48 @@
+import threading
+import unittest
+from events import EventStream, PipelineEvent, TokenRoute, MESSAGE, STAGE_COMPLETED, as_event, forward_token, wants_tokens, with_token_sink
+
+class FakeLLM:
+    def call(self, prompt):
+        for chunk in prompt.split():
+            forward_token(chunk)
+        return prompt
+
+class TestEvents(unittest.TestCase):
+    def test_events_are_strings(self):
+        event = PipelineEvent(STAGE_COMPLETED, "Stage 'writer' completed.", "writer", output="Draft")
+        self.assertEqual(event, "Stage 'writer' completed.")
+        self.assertEqual((event.kind, event.stage, event.data), (STAGE_COMPLETED, "writer", {'output': "Draft"}))
+        self.assertEqual(as_event("hello").kind, MESSAGE)
+        self.assertIs(as_event(event), event)
+
+    def test_event_stream_collects_events_from_threads(self):
+        stream = EventStream()
+        self.assertTrue(wants_tokens(stream))
+        self.assertFalse(wants_tokens(print))
+
+        def produce():
+            for i in range(3):
+                stream(f"message {i}")
+            stream.close()
+        threading.Thread(target=produce).start()
+        self.assertEqual(list(stream), ["message 0", "message 1", "message 2"])
+
+    def test_token_sink_only_receives_its_own_calls(self):
+        llm = FakeLLM()
+        chunks = []
+        streaming = with_token_sink(llm, chunks.append)
+        self.assertEqual(streaming.call("hello streamed world"), "hello streamed world")
+        llm.call("not captured")
+        self.assertEqual(chunks, ["hello", "streamed", "world"])
+
+    def test_token_route_follows_its_current_handler(self):
+        route = TokenRoute()
+        streaming = with_token_sink(FakeLLM(), lambda chunk: route('writer', chunk))
+        streaming.call("dropped")
+        first, second = [], []
+        route.handler = lambda stage, chunk: first.append((stage, chunk))
+        streaming.call("first run")
+        route.handler = lambda stage, chunk: second.append(chunk)
+        streaming.call("second")
+        self.assertEqual((first, second), ([('writer', 'first'), ('writer', 'run')], ['second']))
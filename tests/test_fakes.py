@@ -0,0 +1,90 @@
+import random
+import threading
+import unittest
+from edit_ops import apply_edit_response
+from fakes import FakeAPIError, FakeLLMBackend, FakeSearchBackend, LatencyModel
+from rate_limiter import is_rate_limit_error, parse_retry_delay
+from sections import parse_stitch_output
+
+def messages(role, task):
+    return [
+        {'role': 'system', 'content': f"You are {role}. Responsible for things.\nYour personal goal is: things"},
+        {'role': 'user', 'content': f"\nCurrent Task: {task}\n\nThis is the expected criteria for your final answer: text"},
+    ]
+
+def final_answer(text):
+    return text.split("Final Answer: ", 1)[1]
+
+class TestLatencyModel(unittest.TestCase):
+    def test_distributions(self):
+        rng = random.Random(1)
+        self.assertEqual(LatencyModel(base=0.5, per_token=0.01, jitter=0.9, distribution="fixed").sample(rng, 10), 0.6)
+        uniform = [LatencyModel(base=1.0, jitter=0.2, distribution="uniform").sample(rng) for _ in range(200)]
+        self.assertTrue(all(0.8 <= seconds <= 1.2 for seconds in uniform))
+        lognormal = [LatencyModel(base=1.0, jitter=0.5).sample(rng) for _ in range(200)]
+        self.assertTrue(min(lognormal) > 0 and max(lognormal) > 1.5)
+        with self.assertRaises(ValueError):
+            LatencyModel(distribution="pareto")
+
+class TestFakeLLMBackend(unittest.TestCase):
+    def setUp(self):
+        self.slept = []
+        self.backend = FakeLLMBackend(seed=3, latency=LatencyModel(base=0.1, jitter=0.3), subtopics=4, article_words=800, sleep=self.slept.append)
+
+    def test_responses_and_delays_are_deterministic(self):
+        other = FakeLLMBackend(seed=3, latency=LatencyModel(base=0.1, jitter=0.3), subtopics=4, article_words=800, sleep=lambda seconds: None)
+        request = messages("Writer", "Write a comprehensive, engaging, and descriptive blog post based on this research")
+        self.assertEqual(self.backend.respond(request), other.respond(request))
+        self.assertEqual(self.backend.stats['simulated_seconds'], other.stats['simulated_seconds'])
+        # Repeating a request draws a new (but equally reproducible) response
+        self.assertNotEqual(self.backend.respond(request), self.backend.respond(request))
+        self.assertEqual(len(self.slept), 3)
+
+    def test_concurrent_callers_get_the_same_set_of_responses(self):
+        request = messages("Reviewer", "Review the following blog post for factual accuracy")
+        serial_backend = FakeLLMBackend(seed=1)
+        serial = sorted(serial_backend.respond(request) for _ in range(6))
+        backend, results = FakeLLMBackend(seed=1), []
+        threads = [threading.Thread(target=lambda: results.append(backend.respond(request))) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(results), serial)
+
+    def test_planner_outline_and_research(self):
+        outline = final_answer(self.backend.respond(messages("Planner", "Plan the structure and main points for a blog post about: 'solar power'.")))
+        self.assertEqual(len([line for line in outline.splitlines() if line[0].isdigit()]), 4)
+        request = messages("Researcher", "Research the following subtopic thoroughly for the main topic: 'solar power'. Subtopic: Costs. Use the web search tool")
+        action = self.backend.respond(request)
+        self.assertIn("Action: Search the internet with Serper", action)
+        request[-1]['content'] += f"\n{action}\nObservation: results"
+        self.assertGreater(len(final_answer(self.backend.respond(request)).split('. ')), 10)
+
+    def test_structured_answers_parse(self):
+        task = "The following sections of a blog post about 'solar power' were written separately.\n\n## A\nx\n\n## B\ny\n\n## C\nz"
+        stitch = parse_stitch_output(final_answer(self.backend.respond(messages("Writer", task))))
+        self.assertEqual((bool(stitch['title']), sorted(stitch['transitions'])), (True, [1, 2]))
+        post = "# Solar\n\nIntro.\n\n## Costs\n\nPanels got cheaper.\n\n## Storage\n\nBatteries too."
+        edits = self.backend.respond(messages("SEO Specialist", f"Optimize the following blog post. META_DESCRIPTION: x. <<<EDIT\n\nHere is the blog post:\n{post}"))
+        edited = apply_edit_response(post, final_answer(edits), require_meta=True)
+        self.assertIn("## Storage", edited)
+        self.assertGreater(len(edited), len(post))
+
+    def test_errors_look_like_rate_limits(self):
+        backend = FakeLLMBackend(error_rate=1.0, retry_delay=0.5)
+        with self.assertRaises(FakeAPIError) as raised:
+            backend.respond(messages("Writer", "Write a blog post"))
+        self.assertTrue(is_rate_limit_error(raised.exception))
+        self.assertEqual(parse_retry_delay(raised.exception), 0.5)
+        self.assertEqual(backend.stats['errors'], 1)
+
+class TestFakeSearchBackend(unittest.TestCase):
+    def test_serper_shaped_results(self):
+        payload = FakeSearchBackend(seed=2, results=5).search("battery breakthroughs")
+        self.assertEqual(payload['searchParameters']['q'], "battery breakthroughs")
+        self.assertEqual([item['position'] for item in payload['organic']], [1, 2, 3, 4, 5])
+        self.assertEqual(payload, FakeSearchBackend(seed=2, results=5).search("battery breakthroughs"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import threading
+import time
+import unittest
+from handoff import Prefetcher, stream_results
+
+class TestHandoff(unittest.TestCase):
+    def test_results_stream_in_completion_order(self):
+        release_slow = threading.Event()
+
+        def work(item):
+            if item == 'slow':
+                release_slow.wait(5)
+            return item.upper()
+
+        order = []
+        for item, result, status in stream_results(work, ['slow', 'fast'], max_workers=2):
+            order.append((item, result, status))
+            release_slow.set()  # The slow item only finishes once the fast one has been handed over
+        self.assertEqual(order, [('fast', 'FAST', 'done'), ('slow', 'SLOW', 'done')])
+
+    def test_errors_are_yielded(self):
+        def work(item):
+            raise RuntimeError("boom")
+        [(item, result, status)] = list(stream_results(work, ['a']))
+        self.assertEqual(status, 'error')
+        self.assertIsInstance(result, RuntimeError)
+
+    def test_drop_policy_abandons_stragglers(self):
+        release = threading.Event()
+        work = lambda item: release.wait(5) if item == 'slow' else item
+        start = time.monotonic()
+        events = [(item, status) for item, _, status in stream_results(work, ['fast', 'slow'], max_workers=2, deadline=0.1, straggler_policy='drop')]
+        release.set()
+        self.assertEqual(events, [('fast', 'done'), ('slow', 'dropped')])
+        self.assertLess(time.monotonic() - start, 2)
+
+    def test_defer_policy_hands_stragglers_over_late(self):
+        release = threading.Event()
+        late = []
+        work = lambda item: release.wait(5) and item if item == 'slow' else item
+        start = time.monotonic()
+        events = list(stream_results(work, ['fast', 'slow'], max_workers=2, deadline=0.1, on_late=lambda *args: late.append(args)))
+        # The stream ends without waiting for the straggler
+        self.assertEqual(events, [('fast', 'fast', 'done'), ('slow', None, 'deferred')])
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertEqual(late, [])
+        release.set()
+        for _ in range(50):
+            if late:
+                break
+            time.sleep(0.02)
+        self.assertEqual(late, [('slow', 'slow', 'done')])
+
+    def test_queued_items_are_not_stragglers(self):
+        # One worker: each item runs for less than the deadline, although the last one finishes long after it
+        work = lambda item: time.sleep(0.1) or item
+        events = [(item, status) for item, _, status in stream_results(work, ['a', 'b', 'c', 'd'], max_workers=1, deadline=0.15, straggler_policy='drop')]
+        self.assertEqual(events, [('a', 'done'), ('b', 'done'), ('c', 'done'), ('d', 'done')])
+
+    def test_deadline_waits_for_first_result(self):
+        work = lambda item: time.sleep(0.2) or item
+        events = [(item, status) for item, _, status in stream_results(work, ['only'], deadline=0.05, straggler_policy='drop')]
+        self.assertEqual(events, [('only', 'done')])
+
+    def test_prefetcher(self):
+        prefetch = Prefetcher(lambda key, value: f"{key}:{value}")
+        prefetch.submit('a', 1)
+        prefetch.submit('a', 2)  # Already started
+        self.assertEqual(prefetch.take('a').result(), 'a:1')
+        self.assertIsNone(prefetch.take('a'))
+        prefetch.close()
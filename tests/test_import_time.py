@@ -0,0 +1,44 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Importing main must stay cheap: the Streamlit app, the demo and the tests all import it
+IMPORT_BUDGET_SECONDS = float(os.getenv('MAIN_IMPORT_BUDGET_SECONDS', '2.0'))
+HEAVY_MODULES = ['crewai', 'crewai_tools', 'langchain_google_genai', 'litellm', 'markdown']
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import main
+seconds = time.perf_counter() - start
+print(json.dumps({'seconds': seconds, 'loaded': sorted(set(name.split('.')[0] for name in sys.modules))}))
+"""
+
+
+def import_main():
+    # A fresh interpreter, so nothing is already imported or cached in sys.modules
+    result = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, capture_output=True, text=True, timeout=120)
+    if result.returncode != 0:
+        if 'ModuleNotFoundError' in result.stderr:
+            raise unittest.SkipTest(f"main's dependencies are not installed: {result.stderr.strip().splitlines()[-1]}")
+        raise AssertionError(result.stderr)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+class TestImportTime(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.probe = import_main()
+
+    def test_import_stays_within_budget(self):
+        self.assertLess(self.probe['seconds'], IMPORT_BUDGET_SECONDS)
+
+    def test_heavy_modules_are_not_imported(self):
+        self.assertEqual([name for name in HEAVY_MODULES if name in self.probe['loaded']], [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from events import PipelineEvent, STAGE_STARTED, TOKEN
+from jobs import JobManager
+
+def wait_for(manager, job_id, statuses=('completed', 'failed'), timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = manager.get(job_id)
+        if job['status'] in statuses:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not reach {statuses}")
+
+class TestJobManager(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_job_runs_and_persists_result(self):
+        def runner(params, callback, job_id):
+            callback(PipelineEvent(STAGE_STARTED, "=== Stage: writer ===", "writer"))
+            callback(PipelineEvent(TOKEN, "Hello", stage="writer"))
+            return {'content': params['topic'].upper()}
+        manager = JobManager(self.root, runner)
+        job_id = manager.submit({'topic': 'solar'})
+        job = wait_for(manager, job_id)
+        self.assertEqual(job['status'], 'completed')
+        self.assertEqual(job['result'], {'content': 'SOLAR'})
+        self.assertEqual(job['stage'], 'writer')
+        self.assertIn("=== Stage: writer ===", job['messages'])
+        # A new manager (e.g. after a server restart) still sees the finished job
+        self.assertEqual(JobManager(self.root, runner).get(job_id)['result'], {'content': 'SOLAR'})
+        manager.shutdown()
+
+    def test_failed_job_can_be_resumed(self):
+        attempts = []
+
+        def runner(params, callback, job_id):
+            attempts.append(job_id)
+            if len(attempts) == 1:
+                raise RuntimeError("quota exceeded")
+            return "done"
+        manager = JobManager(self.root, runner)
+        job_id = manager.submit({})
+        failed = wait_for(manager, job_id)
+        self.assertEqual(failed['error'], "quota exceeded")
+        self.assertIn("RuntimeError: quota exceeded", failed['traceback'])
+        self.assertTrue(manager.resume(job_id))
+        completed = wait_for(manager, job_id, ('completed',))
+        self.assertEqual(completed['result'], "done")
+        self.assertIsNone(completed['traceback'])
+        self.assertEqual(attempts, [job_id, job_id])
+        self.assertFalse(manager.resume(job_id))
+        manager.shutdown()
+
+    def test_concurrent_resumes_run_the_job_once(self):
+        attempts = []
+
+        def runner(params, callback, job_id):
+            attempts.append(job_id)
+            if len(attempts) == 1:
+                raise RuntimeError("quota exceeded")
+            return "done"
+        manager = JobManager(self.root, runner, max_workers=4)
+        job_id = manager.submit({})
+        wait_for(manager, job_id)
+        barrier = threading.Barrier(8)
+        resumed = []
+
+        def resume():
+            barrier.wait()
+            resumed.append(manager.resume(job_id))
+        threads = [threading.Thread(target=resume) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wait_for(manager, job_id, ('completed',))
+        manager.shutdown()
+        self.assertEqual(resumed.count(True), 1)
+        self.assertEqual(len(attempts), 2)
+
+    def test_max_workers_limits_concurrency(self):
+        release = threading.Event()
+        manager = JobManager(self.root, lambda params, callback, job_id: release.wait(5), max_workers=1)
+        first, second = manager.submit({}), manager.submit({})
+        wait_for(manager, first, ('running',))
+        self.assertEqual(manager.get(second)['status'], 'queued')
+        self.assertEqual(manager.queue_position(second), 0)
+        release.set()
+        wait_for(manager, second)
+        manager.shutdown()
+
+    def test_only_abandoned_jobs_are_interrupted_on_startup(self):
+        release = threading.Event()
+        manager = JobManager(self.root, lambda params, callback, job_id: release.wait(5), heartbeat=0.05)
+        live = manager.submit({})
+        running = wait_for(manager, live, ('running',))
+        # Still running in a live manager (e.g. another web worker): left alone, and its heartbeat keeps it fresh
+        self.assertEqual(JobManager(self.root, None).get(live)['status'], 'running')
+        time.sleep(0.2)
+        self.assertGreater(manager.get(live)['updated_at'], running['updated_at'])
+
+        finished = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'], capture_output=True, text=True)
+        now = time.time()
+        jobs = {
+            'gone': f"{socket.gethostname()}:{finished.stdout.strip()}:dead", # Its process has exited
+            'stale': manager.owner, # A live process that stopped touching it
+        }
+        for name, owner in jobs.items():
+            manager._write({
+                'id': name, 'status': 'running', 'params': {}, 'key': None, 'requests': 1, 'created_at': now,
+                'updated_at': now - 600 if name == 'stale' else now, 'messages': [], 'owner': owner,
+            })
+        recovered = JobManager(self.root, None)
+        self.assertEqual(recovered.get('gone')['status'], 'interrupted')
+        self.assertEqual(recovered.get('stale')['status'], 'interrupted')
+        self.assertEqual(recovered.get(live)['status'], 'running')
+        release.set()
+        manager.shutdown()
+        recovered.shutdown()
+        with self.assertRaises(ValueError):
+            manager.get('../escape')
+
+class TestJobCoalescing(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_identical_requests_share_one_job(self):
+        release = threading.Event()
+        runs = []
+
+        def runner(params, callback, job_id):
+            runs.append(job_id)
+            release.wait(5)
+            return "done"
+        manager = JobManager(self.root, runner, result_ttl=60)
+        first = manager.submit({'topic': 'solar'}, key='solar')
+        self.assertEqual(manager.submit({'topic': 'solar'}, key='solar'), first)
+        other = manager.submit({'topic': 'wind'}, key='wind')
+        self.assertNotEqual(other, first)
+        release.set()
+        wait_for(manager, first)
+        # Recently completed: reused, unless the caller wants a fresh result
+        self.assertEqual(manager.submit({'topic': 'solar'}, key='solar'), first)
+        fresh = manager.submit({'topic': 'solar'}, key='solar', reuse_result=False)
+        self.assertNotEqual(fresh, first)
+        wait_for(manager, fresh)
+        self.assertEqual(manager.get(first)['requests'], 3)
+        self.assertEqual(sorted(runs), sorted([first, other, fresh]))
+        manager.shutdown()
@@ -0,0 +1,294 @@
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import main
+from fakes import FakeAPIError, FakeLLMBackend, offline_pipeline
+from structured_logging import AGENT_TRACE_LOGGER, ContextFilter
+
+SUBTOPICS = ["Qubits", "Error correction", "Quantum algorithms", "Hardware"]
+
+class ScriptedBackend(FakeLLMBackend):
+    # A FakeLLMBackend whose answers can be delayed or failed per request, matched on a fragment of the prompt
+    def __init__(self, delays=None, failures=None, **kwargs):
+        super().__init__(**kwargs)
+        self.delays = delays or {}
+        self.failures = failures or {}
+        self.failure_lock = threading.Lock()
+
+    def respond(self, messages):
+        request = '\n'.join(str(message.get('content', '')) for message in messages)
+        for fragment, seconds in self.delays.items():
+            if fragment in request:
+                time.sleep(seconds)
+        with self.failure_lock:
+            for fragment, (error, remaining) in self.failures.items():
+                if fragment in request and remaining:
+                    self.failures[fragment] = (error, remaining - 1)
+                    raise error
+        return super().respond(messages)
+
+class TimedBackend(ScriptedBackend):
+    # Records when each agent role's LLM calls start and end
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.intervals = {}
+
+    def respond(self, messages):
+        role = re.search(r'You are ([^.\n]+)\.', str(messages[0].get('content', ''))).group(1)
+        start = time.monotonic()
+        try:
+            return super().respond(messages)
+        finally:
+            with self.failure_lock:
+                self.intervals.setdefault(role, []).append((start, time.monotonic()))
+
+class PipelineTestCase(unittest.TestCase):
+    def setUp(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        self.workdir = workdir.name
+
+    def offline(self, backend=None):
+        return offline_pipeline(main, self.workdir, llm_backend=backend)
+
+class TestResearchSubtasks(PipelineTestCase):
+    def research(self, backend, max_workers=4):
+        completed = []
+        with self.offline(backend), main.checkout_agents() as agents:
+            results = main.run_research_subtasks(
+                "quantum computing", SUBTOPICS, agents['researcher'], max_workers=max_workers,
+                on_result=lambda subtopic, result: completed.append(subtopic)
+            )
+            stats = dict(main.llm_rate_limiter.stats)
+        return results, completed, stats
+
+    def test_results_in_subtopic_order(self):
+        # Earlier subtopics take longer, so they finish last
+        delays = {f"Subtopic: {subtopic}.": 0.05 * (len(SUBTOPICS) - i) for i, subtopic in enumerate(SUBTOPICS)}
+        results, completed, _ = self.research(ScriptedBackend(delays=delays))
+        self.assertEqual(list(results), SUBTOPICS)
+        self.assertNotEqual(completed, SUBTOPICS)
+        self.assertFalse(any(str(result).startswith("Error:") for result in results.values()))
+
+    def test_rate_limited_subtopic_is_retried_and_penalized_once_per_error(self):
+        # Five 429s in a row: the limiter gives up on the LLM call after four attempts, then research retries the subtopic
+        error = FakeAPIError('429 RESOURCE_EXHAUSTED "retryDelay": "0s"')
+        backend = ScriptedBackend(failures={"Subtopic: Hardware.": (error, main.llm_rate_limiter.max_retries + 2)})
+        results, _, stats = self.research(backend)
+        self.assertFalse(str(results["Hardware"]).startswith("Error:"))
+        # One penalty per 429 except the last one the limiter gives up on, which research must not count again
+        self.assertEqual(stats['throttled'], main.llm_rate_limiter.max_retries + 1)
+
+    def test_failing_subtopic_does_not_sink_the_others(self):
+        backend = ScriptedBackend(failures={"Subtopic: Qubits.": (ValueError("malformed response"), 1)})
+        results, completed, _ = self.research(backend)
+        self.assertEqual(results["Qubits"], "Error: malformed response")
+        self.assertEqual(sorted(completed), sorted(SUBTOPICS[1:]))
+        self.assertFalse(any(str(results[subtopic]).startswith("Error:") for subtopic in SUBTOPICS[1:]))
+
+class TestRunStage(PipelineTestCase):
+    def run_stage(self, run_id, fn, **kwargs):
+        events = []
+        output = main.run_stage(run_id, 'research', fn, callback=events.append, inputs={'topic': 'quantum computing'}, **kwargs)
+        return output, [event for event in events if getattr(event, 'kind', None) == main.STAGE_COMPLETED]
+
+    def test_memo_hit_reuses_an_earlier_runs_output(self):
+        with self.offline():
+            self.run_stage('run-1', lambda: {'Qubits': "Findings"})
+            output, [completed] = self.run_stage('run-2', lambda: self.fail("stage ran again"))
+            self.assertEqual(output, {'Qubits': "Findings"})
+            self.assertTrue(completed.data['reused'])
+            self.assertEqual(main.run_store.load('run-2', 'research'), {'Qubits': "Findings"})
+
+    def test_bypass_runs_the_stage_again(self):
+        with self.offline():
+            self.run_stage('run-1', lambda: {'Qubits': "Findings"})
+            output, [completed] = self.run_stage('run-2', lambda: {'Qubits': "Fresh findings"}, use_memo=False)
+            self.assertEqual(output, {'Qubits': "Fresh findings"})
+            self.assertFalse(completed.data['reused'])
+            # A bypassing run still refreshes the memo for later runs
+            output, _ = self.run_stage('run-3', lambda: self.fail("stage ran again"))
+            self.assertEqual(output, {'Qubits': "Fresh findings"})
+
+    def test_failed_and_fallback_outputs_are_not_memoized(self):
+        with self.offline():
+            failed = {'Qubits': "Findings", 'Hardware': "Error: Rate limit exceeded after retries."}
+            self.run_stage('run-1', lambda: failed)
+            self.assertEqual(main.run_store.load('run-1', 'research'), failed)
+            self.run_stage('run-2', lambda: ["quantum computing"], cacheable=lambda subtopics: subtopics != ["quantum computing"])
+            output, [completed] = self.run_stage('run-3', lambda: {'Qubits': "Findings", 'Hardware': "More findings"})
+            self.assertFalse(completed.data['reused'])
+            self.assertEqual(output['Hardware'], "More findings")
+
+class TestMultiFormatPipeline(PipelineTestCase):
+    FORMATS = ["Blog Post", "Social Media Posts"]
+
+    def run_formats(self, backend):
+        with self.offline(backend), mock.patch.object(main, 'run_research_subtasks', wraps=main.run_research_subtasks) as research:
+            results = main.run_pipeline("quantum computing", content_type=self.FORMATS, coalesce=False)
+            [run_id] = main.run_store.list_runs()
+            metadata = main.run_store.load_metadata(run_id)
+        self.assertEqual(research.call_count, 1) # Researched once, shared by every format
+        return results, metadata
+
+    def test_formats_share_one_research_stage(self):
+        results, metadata = self.run_formats(FakeLLMBackend(subtopics=3, article_words=300))
+        self.assertEqual(list(results), self.FORMATS)
+        self.assertTrue(all(main.is_valid_output(content) for content, _ in results.values()))
+        self.assertEqual(metadata['status'], 'completed')
+
+    def test_failed_format_does_not_cancel_the_others(self):
+        backend = ScriptedBackend(subtopics=3, article_words=300, failures={
+            "Generate 3-5 distinct social media posts": (ValueError("malformed response"), 100)
+        })
+        results, metadata = self.run_formats(backend)
+        self.assertEqual(results["Social Media Posts"], (None, None))
+        self.assertTrue(main.is_valid_output(results["Blog Post"][0]))
+        self.assertEqual(metadata['status'], 'failed')
+        self.assertEqual(metadata['error'], "Failed formats: Social Media Posts")
+
+class LinkDroppingBackend(FakeLLMBackend):
+    # Translates by echoing the text, but drops the first link unless told which placeholders it dropped
+    def compose(self, messages, rng):
+        text = super().compose(messages, rng)
+        request = '\n'.join(str(message.get('content', '')) for message in messages)
+        if "Translate the following" in request and "dropped these link placeholders" not in request:
+            text = text.replace("{{URL_1}}", "")
+        return text
+
+class TestTranslateContent(PipelineTestCase):
+    def test_retry_after_dropped_link_is_not_a_cache_hit(self):
+        content = "# Quantum\n\nSee [the paper](https://example.com/paper) and [the lab](https://example.com/lab)."
+        backend = LinkDroppingBackend()
+        with self.offline(backend), main.translator_pools[True].checkout() as translator:
+            translated = main.translate_content(content, "Hindi", translator)
+        self.assertIn("https://example.com/paper", translated)
+        self.assertIn("https://example.com/lab", translated)
+        self.assertEqual(backend.stats['calls'], 2)
+
+class TestContentBranch(PipelineTestCase):
+    def run_blog_post(self, backend):
+        with self.offline(backend):
+            result = main.run_pipeline("quantum computing", coalesce=False)
+            [run_id] = main.run_store.list_runs()
+            metadata = main.run_store.load_metadata(run_id)
+        return result, metadata
+
+    def test_review_overlaps_the_editor(self):
+        backend = TimedBackend(subtopics=3, article_words=300, delays={"You are Reviewer.": 0.2, "You are Editor.": 0.2})
+        (content, report), _ = self.run_blog_post(backend)
+        self.assertTrue(main.is_valid_output(content))
+        [(review_start, review_end)] = backend.intervals["Reviewer"]
+        [(edit_start, edit_end)] = backend.intervals["Editor"]
+        self.assertLess(review_start, edit_end)
+        self.assertLess(edit_start, review_end)
+        # The fact checker works on the edited text
+        self.assertGreaterEqual(backend.intervals["Fact Checker"][0][0], edit_end)
+
+    def test_failed_review_does_not_fail_the_run(self):
+        backend = ScriptedBackend(subtopics=3, article_words=300, failures={"You are Reviewer.": (ValueError("malformed response"), 100)})
+        (content, report), metadata = self.run_blog_post(backend)
+        self.assertTrue(main.is_valid_output(content))
+        self.assertTrue(report.startswith("Fact-check report:"))
+        self.assertEqual(metadata['status'], 'completed')
+
+class TestStragglers(PipelineTestCase):
+    def test_deferred_subtopic_leaves_the_research_stage_early(self):
+        # The third subtopic's research takes 1.2s (two LLM calls); the deadline is 0.2s
+        backend = ScriptedBackend(subtopics=3, delays={" 3. Use the web search tool": 0.6})
+        with self.offline(backend), mock.patch.object(main, 'RESEARCH_STRAGGLER_TIMEOUT', 0.2), main.checkout_agents() as agents:
+            run_id = main.run_store.new_run_id()
+            start = time.monotonic()
+            results = main.research_phase(run_id, "quantum computing", agents)
+            self.assertLess(time.monotonic() - start, 0.6)
+            [straggler] = [subtopic for subtopic in results if subtopic.endswith(" 3")]
+            self.assertTrue(results[straggler].startswith("Error: Research deferred"))
+            self.assertEqual(sum(result.startswith("Error:") for result in results.values()), 1)
+            for _ in range(100):
+                if main.run_store.has(run_id, 'research_late'):
+                    break
+                time.sleep(0.05)
+            # Resuming the run picks up the late research
+            resumed = main.research_phase(run_id, "quantum computing", agents)
+            self.assertFalse(resumed[straggler].startswith("Error:"))
+            self.assertEqual(main.run_store.load(run_id, 'research_late'), {straggler: resumed[straggler]})
+
+class TestSectionedWriting(PipelineTestCase):
+    def test_sectioned_blog_post(self):
+        with self.offline(FakeLLMBackend(subtopics=3, article_words=600)):
+            content, report = main.run_pipeline("quantum computing", writing_mode='sectioned', coalesce=False)
+            [run_id] = main.run_store.list_runs()
+            draft = main.run_store.load(run_id, 'writer')
+            context = main.run_store.load(run_id, 'context_budget')
+        self.assertTrue(main.is_valid_output(content))
+        self.assertEqual(len(re.findall(r'^## .* \d$', draft, re.MULTILINE)), 3) # One section per subtopic
+        self.assertIn("## Conclusion", draft)
+        # Prefetched sections and the stitch pass are both measured against their budgets
+        self.assertGreater(context['section_writer']['prompt_tokens'], 0)
+        self.assertGreater(context['section_writer']['input_tokens'], 0)
+        self.assertGreater(context['writer']['prompt_tokens'], 0)
+
+    def test_rewritten_section_gets_the_prefetched_input(self):
+        # The prefetched attempt at the first section fails, so content_branch writes it again from the research results
+        backend = ScriptedBackend(subtopics=3, article_words=600, failures={"Write only the section on:": (ValueError("malformed response"), 1)})
+        prompts = []
+        run_agent_task = main.run_agent_task
+        def record(agent, description, *args, **kwargs):
+            if description.startswith("You are writing one section"):
+                prompts.append(description)
+            return run_agent_task(agent, description, *args, **kwargs)
+        # A writer budget well below the research so that compacting it for a single-pass writer would change the sections' input
+        with self.offline(backend), mock.patch.object(main, 'run_agent_task', record), mock.patch.dict(main.CONTEXT_BUDGETS, {'writer': 100}):
+            content, report = main.run_pipeline("quantum computing", writing_mode='sectioned', coalesce=False)
+        self.assertTrue(main.is_valid_output(content))
+        # Three sections, one written twice from the same prompt
+        self.assertEqual(len(prompts), 4)
+        self.assertEqual(len(set(prompts)), 3)
+
+class TestTracing(PipelineTestCase):
+    def test_llm_and_search_calls_nest_under_their_stage(self):
+        with self.offline(FakeLLMBackend(subtopics=3, article_words=300)):
+            main.run_pipeline("quantum computing", coalesce=False)
+            [run_id] = main.run_store.list_runs()
+            with open(os.path.join(main.run_store.run_dir(run_id), 'trace.jsonl'), encoding='utf-8') as f:
+                spans = {span['span_id']: span for span in map(json.loads, f)}
+
+        def stage_of(span):
+            while span and span['kind'] != 'stage':
+                span = spans.get(span['parent_id'])
+            return span['name'] if span else None
+        calls = [span for span in spans.values() if span['kind'] in ('llm', 'search')]
+        self.assertTrue(any(span['kind'] == 'search' for span in calls))
+        self.assertEqual({span['trace_id'] for span in calls}, {run_id})
+        self.assertEqual({stage_of(span) for span in calls}, set(main.PIPELINE_STAGES))
+        stages = {span['name']: span for span in spans.values() if span['kind'] == 'stage'}
+        self.assertEqual(stages['research']['counters']['search_calls'], 3)
+        self.assertGreater(stages['writer']['counters']['prompt_tokens'], 0)
+
+class TestAgentStepLogs(PipelineTestCase):
+    def test_step_logs_carry_the_run_stage_and_agent_across_the_agents_thread(self):
+        records = []
+        handler = logging.Handler()
+        handler.emit = records.append
+        handler.addFilter(ContextFilter(main.log_context, trace_sample_rate=1.0))
+        trace_logger = logging.getLogger(AGENT_TRACE_LOGGER)
+        trace_logger.addHandler(handler)
+        self.addCleanup(trace_logger.removeHandler, handler)
+        self.addCleanup(trace_logger.setLevel, trace_logger.level)
+        trace_logger.setLevel(logging.INFO)
+        with self.offline(), main.checkout_agents() as agents, main.run_span('run-1', 'run_pipeline'):
+            main.run_stage('run-1', 'research', lambda: main.research_subtopic("quantum computing", "Qubits", agents['researcher']))
+        self.assertEqual([record.step for record in records], ['AgentAction', 'AgentFinish'])
+        for record in records:
+            self.assertEqual((record.run_id, record.stage, record.agent), ('run-1', 'research', 'Researcher'))
+            self.assertNotEqual(record.thread, threading.get_ident())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from profiling import SamplingProfiler, collapse, write_collapsed
+from workflow import Workflow
+
+def spin(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(200))
+
+def nap(seconds):
+    time.sleep(seconds)
+
+class TestCollapsedStacks(unittest.TestCase):
+    def test_collapse_is_root_first(self):
+        def inner():
+            return collapse(sys._getframe())
+        stack = inner().split(';')
+        self.assertTrue(stack[-1].startswith("inner (test_profiling.py:"))
+        self.assertTrue(stack[-2].startswith("test_collapse_is_root_first (test_profiling.py:"))
+
+    def test_write_collapsed_sorts_by_weight_and_skips_empty_profiles(self):
+        root = tempfile.mkdtemp()
+        try:
+            path = write_collapsed(os.path.join(root, 'p', 'writer.wall.collapsed'), {'a;b': 5, 'a;c': 20, 'a;d': 0})
+            with open(path, encoding='utf-8') as f:
+                self.assertEqual(f.read(), "a;c 20\na;b 5\n")
+            self.assertIsNone(write_collapsed(os.path.join(root, 'empty.collapsed'), {}))
+            self.assertFalse(os.path.exists(os.path.join(root, 'empty.collapsed')))
+        finally:
+            shutil.rmtree(root)
+
+class TestSamplingProfiler(unittest.TestCase):
+    def test_stages_are_sampled_separately_with_wall_and_cpu_time(self):
+        profiler = SamplingProfiler(interval=0.005)
+
+        def work(key, fn):
+            with profiler.stage(key):
+                fn(0.3)
+        threads = [threading.Thread(target=work, args=('busy', spin)), threading.Thread(target=work, args=('idle', nap))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        busy_wall, busy_cpu = profiler.take('busy')
+        idle_wall, idle_cpu = profiler.take('idle')
+        self.assertTrue(any('spin (test_profiling.py' in stack for stack in busy_wall))
+        self.assertFalse(any('spin (' in stack for stack in idle_wall))
+        self.assertTrue(any('nap (test_profiling.py' in stack for stack in idle_wall))
+        self.assertGreater(sum(busy_wall.values()), 100000)
+        if hasattr(time, 'pthread_getcpuclockid'):
+            self.assertGreater(sum(busy_cpu.values()), 5 * sum(idle_cpu.values()))
+        self.assertEqual(profiler.take('busy'), ({}, {}))
+
+    def test_label_assigns_worker_threads_to_an_open_stage(self):
+        workers = set()
+        profiler = SamplingProfiler(interval=0.005, label=lambda ident: 'research' if ident in workers else None)
+
+        def worker():
+            workers.add(threading.get_ident())
+            nap(0.15)
+        with profiler.stage('research'):
+            thread = threading.Thread(target=worker)
+            thread.start()
+            thread.join()
+        wall, _ = profiler.take('research')
+        self.assertTrue(any('worker (test_profiling.py' in stack for stack in wall))
+        # Nothing is sampled once no stage is open
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+        self.assertEqual(profiler.take('research'), ({}, {}))
+
+class FakeAgent:
+    def __init__(self, name):
+        self.name = name
+
+    def run(self, task):
+        nap(0.1)
+        return f"{self.name} done"
+
+class TestWorkflowProfiling(unittest.TestCase):
+    def test_each_task_gets_a_collapsed_profile(self):
+        root = tempfile.mkdtemp()
+        try:
+            workflow = Workflow("wf", profile_dir=root)
+            workflow.agents = [FakeAgent("A")]
+            workflow.add_task("research", name="Task 1")
+            workflow.add_task("write", name="Task 2", inputs=["Task 1"])
+            workflow.run()
+            [run_dir] = os.listdir(root)
+            files = sorted(os.listdir(os.path.join(root, run_dir)))
+            self.assertIn("Task_1.wall.collapsed", files)
+            self.assertIn("Task_2.wall.collapsed", files)
+            with open(os.path.join(root, run_dir, "Task_1.wall.collapsed"), encoding='utf-8') as f:
+                self.assertIn("nap (test_profiling.py", f.read())
+        finally:
+            shutil.rmtree(root)
+
+if __name__ == '__main__':
+    unittest.main()
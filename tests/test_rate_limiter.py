@@ -0,0 +1,69 @@
+import unittest
+from rate_limiter import RateLimiter, TokenBucket, is_rate_limit_error, parse_retry_delay
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    def __call__(self):
+        return self.now
+    def sleep(self, seconds):
+        self.now += seconds
+
+class TestRetryDelayParsing(unittest.TestCase):
+    def test_json_retry_delay(self):
+        error = 'litellm.RateLimitError: {"error": {"status": "RESOURCE_EXHAUSTED", "details": [{"retryDelay": "33s"}]}}'
+        self.assertTrue(is_rate_limit_error(error))
+        self.assertEqual(parse_retry_delay(error), 33.0)
+
+    def test_grpc_retry_delay(self):
+        self.assertEqual(parse_retry_delay('429 Resource exhausted\nretry_delay {\n  seconds: 12\n}'), 12.0)
+
+    def test_no_retry_delay(self):
+        self.assertIsNone(parse_retry_delay('RESOURCE_EXHAUSTED'))
+        self.assertFalse(is_rate_limit_error(ValueError('bad input')))
+
+class TestTokenBucket(unittest.TestCase):
+    def test_spaces_out_calls_after_burst(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=1.0, burst=2, clock=clock)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertAlmostEqual(bucket.reserve(), 1.0)
+        self.assertAlmostEqual(bucket.reserve(), 2.0)
+
+    def test_penalize_blocks_and_slows_down(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=4.0, burst=4, clock=clock)
+        bucket.penalize(10)
+        self.assertEqual(bucket.rate, 2.0)
+        self.assertGreaterEqual(bucket.reserve(), 10)
+        bucket.reward()
+        self.assertGreater(bucket.rate, 2.0)
+
+class TestRateLimiter(unittest.TestCase):
+    def test_retries_rate_limited_calls(self):
+        clock = FakeClock()
+        limiter = RateLimiter("test", requests_per_minute=600, clock=clock, sleep=clock.sleep)
+        attempts = []
+        def flaky():
+            attempts.append(clock.now)
+            if len(attempts) < 3:
+                raise RuntimeError('RESOURCE_EXHAUSTED "retryDelay": "5s"')
+            return "ok"
+        self.assertEqual(limiter.call(flaky), "ok")
+        self.assertEqual(len(attempts), 3)
+        self.assertGreaterEqual(attempts[1] - attempts[0], 5)
+        self.assertEqual(limiter.stats['retries'], 2)
+
+    def test_other_errors_are_not_retried(self):
+        limiter = RateLimiter("test", requests_per_minute=600)
+        calls = []
+        def broken():
+            calls.append(1)
+            raise ValueError("boom")
+        with self.assertRaises(ValueError):
+            limiter.wrap(broken)()
+        self.assertEqual(len(calls), 1)
+
+if __name__ == '__main__':
+    unittest.main()
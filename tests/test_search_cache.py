@@ -0,0 +1,53 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from cache import DiskCache
+from search_cache import SearchCache, normalize_query
+
+class FakeSearchTool:
+    search_type = "search"
+    n_results = 10
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.queries = []
+        self._lock = threading.Lock()
+    def _run(self, **kwargs):
+        with self._lock:
+            self.queries.append(kwargs['search_query'])
+        time.sleep(self.delay)
+        return {'organic': [{'snippet': f"result for {kwargs['search_query']}"}]}
+
+class TestSearchCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = DiskCache(os.path.join(self.tmp.name, 'search.sqlite3'), ttl=3600)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_normalize_query(self):
+        self.assertEqual(normalize_query('  AI in   Healthcare? '), 'ai in healthcare')
+        self.assertEqual(normalize_query('"AI in healthcare"'), 'ai in healthcare')
+
+    def test_near_identical_queries_hit_cache(self):
+        tool = FakeSearchTool()
+        run = SearchCache(self.store).wrap(tool._run, tool)
+        first = run(search_query='AI in healthcare')
+        second = run(search_query='ai in  healthcare?')
+        self.assertEqual(first, second)
+        self.assertEqual(len(tool.queries), 1)
+
+    def test_concurrent_identical_lookups_are_coalesced(self):
+        tool = FakeSearchTool(delay=0.2)
+        run = SearchCache(self.store).wrap(tool._run, tool)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(run(search_query='quantum computing'))) for _ in range(5)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+        self.assertEqual(len(tool.queries), 1)
+        self.assertEqual(len(results), 5)
+
+if __name__ == '__main__':
+    unittest.main()
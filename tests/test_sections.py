@@ -0,0 +1,33 @@
+import unittest
+from sections import assemble_article, ensure_section_heading, parse_stitch_output, section_digest
+
+STITCH_OUTPUT = """TITLE: AI in Healthcare
+INTRODUCTION:
+Medicine is changing fast.
+TRANSITION 1: Diagnosis is only the start.
+CONCLUSION:
+The future is bright.
+"""
+
+class TestSections(unittest.TestCase):
+    def test_parse_stitch_output(self):
+        parsed = parse_stitch_output(STITCH_OUTPUT)
+        self.assertEqual(parsed['title'], 'AI in Healthcare')
+        self.assertEqual(parsed['introduction'], 'Medicine is changing fast.')
+        self.assertEqual(parsed['transitions'], {1: 'Diagnosis is only the start.'})
+        self.assertEqual(parsed['conclusion'], 'The future is bright.')
+
+    def test_assemble_article(self):
+        sections = [ensure_section_heading("AI reads scans.", "Diagnostics"), "## Drug discovery\n\nAI finds molecules."]
+        article = assemble_article(sections, parse_stitch_output(STITCH_OUTPUT))
+        self.assertTrue(article.startswith("# AI in Healthcare\n\nMedicine is changing fast."))
+        self.assertLess(article.index("## Diagnostics"), article.index("Diagnosis is only the start."))
+        self.assertLess(article.index("Diagnosis is only the start."), article.index("## Drug discovery"))
+        self.assertTrue(article.endswith("## Conclusion\n\nThe future is bright."))
+
+    def test_section_digest(self):
+        digest = section_digest(["## Diagnostics\n\nAI reads scans faster than ever."], chars=10)
+        self.assertEqual(digest, "Section 1: Diagnostics\nAI reads s")
+
+if __name__ == '__main__':
+    unittest.main()
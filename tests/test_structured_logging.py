@@ -0,0 +1,125 @@
+import json
+import logging
+import os
+import queue
+import random
+import shutil
+import tempfile
+import threading
+import unittest
+from structured_logging import AGENT_TRACE_LOGGER, ContextFilter, DroppingQueueHandler, agent_step_logger, configure_logging, parse_levels
+
+class TestStructuredLogging(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.path = os.path.join(self.root, 'app.log')
+        self.context = {}
+        self.logger = logging.getLogger('tests.structured_logging')
+        self.logger.propagate = False
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def configure(self, logger=None, **kwargs):
+        return configure_logging(self.path, context=lambda: dict(self.context), logger=logger or self.logger, **kwargs)
+
+    def records(self):
+        with open(self.path, encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    def test_records_are_json_lines_tagged_with_run_stage_and_agent(self):
+        pipeline = self.configure()
+        self.context.update(run_id='run1', stage='writer', agent='Writer')
+        self.logger.info("Stage %s done", 'writer', extra={'seconds': 1.5})
+        self.context.clear()
+        try:
+            raise ValueError("bad outline")
+        except ValueError:
+            self.logger.exception("Planner failed")
+        pipeline.stop()
+        first, second = self.records()
+        self.assertEqual((first['message'], first['run_id'], first['stage'], first['agent'], first['seconds']), ("Stage writer done", 'run1', 'writer', 'Writer', 1.5))
+        self.assertEqual(first['level'], 'INFO')
+        self.assertIsNone(second['run_id'])
+        self.assertIn("ValueError: bad outline", second['exception'])
+
+    def test_stage_levels(self):
+        pipeline = self.configure(level=logging.WARNING, stage_levels=parse_levels("research=DEBUG, seo=ERROR"))
+        for stage in ['research', 'blog_post.research', 'writer', 'seo']:
+            self.context['stage'] = stage
+            self.logger.debug(f"debug {stage}")
+            self.logger.warning(f"warning {stage}")
+        pipeline.stop()
+        self.assertEqual([record['message'] for record in self.records()], [
+            "debug research", "warning research", "debug blog_post.research", "warning blog_post.research", "warning writer"
+        ])
+        with self.assertRaises(ValueError):
+            parse_levels("writer=LOUD")
+
+    def test_agent_traces_are_sampled(self):
+        trace_logger = logging.getLogger(AGENT_TRACE_LOGGER)
+        propagate = trace_logger.propagate
+        trace_logger.propagate = False
+        try:
+            pipeline = self.configure(logger=trace_logger, trace_sample_rate=0.0)
+            log_step = agent_step_logger("Researcher")
+            step = type('AgentAction', (), {'tool': 'Search the internet', 'thought': 'Look it up', 'text': 'Action: ...'})()
+            log_step(step)
+            trace_logger.warning("Researcher hit max_iter")
+            pipeline.stop()
+            self.assertEqual([record['message'] for record in self.records()], ["Researcher hit max_iter"])
+
+            os.remove(self.path)
+            pipeline = self.configure(logger=trace_logger, trace_sample_rate=1.0)
+            log_step(step)
+            pipeline.stop()
+            [record] = self.records()
+        finally:
+            trace_logger.propagate = propagate
+        self.assertEqual(record['message'], "Researcher called Search the internet")
+        self.assertEqual((record['agent'], record['step'], record['tool'], record['thought']), ("Researcher", 'AgentAction', 'Search the internet', 'Look it up'))
+
+    def test_sampling_rate(self):
+        sampler = ContextFilter(trace_sample_rate=0.25, rng=random.Random(7))
+        kept = sum(sampler.filter(logging.makeLogRecord({'name': AGENT_TRACE_LOGGER, 'levelno': logging.INFO})) for _ in range(2000))
+        self.assertTrue(400 < kept < 600)
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+        for i in range(3):
+            handler.handle(logging.makeLogRecord({'msg': f"message {i}"}))
+        self.assertEqual(handler.dropped, 2)
+        self.assertEqual(handler.queue.get_nowait().getMessage(), "message 0")
+
+    def test_stop_with_a_full_queue(self):
+        pipeline = self.configure(queue_size=5)
+        # The listener is held inside its first write while the queue fills up behind it
+        writing, release = threading.Event(), threading.Event()
+        emit = pipeline.file_handler.emit
+        def slow_emit(record):
+            writing.set()
+            release.wait(5)
+            emit(record)
+        pipeline.file_handler.emit = slow_emit
+        self.logger.info("message 0")
+        self.assertTrue(writing.wait(5))
+        for i in range(1, 8):
+            self.logger.info(f"message {i}")
+        self.assertTrue(pipeline.handler.queue.full())
+        threading.Timer(0.1, release.set).start()
+        pipeline.stop()
+        messages = [record['message'] for record in self.records()]
+        self.assertEqual(messages[:6], [f"message {i}" for i in range(6)])
+        self.assertEqual(messages[6], "2 log records were dropped because the log queue was full")
+
+    def test_size_based_rotation(self):
+        pipeline = self.configure(max_bytes=2000, backups=2)
+        for i in range(100):
+            self.logger.info(f"message {i} " + "x" * 50)
+        pipeline.stop()
+        self.assertEqual(sorted(os.listdir(self.root)), ['app.log', 'app.log.1', 'app.log.2'])
+        self.assertLessEqual(os.path.getsize(self.path), 2000)
+        self.assertEqual(self.records()[-1]['message'], "message 99 " + "x" * 50)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+from token_budget import ContextBudget, compact_research, dedupe_research, estimate_tokens, trim_text
+
+POST = (
+    "# AI in Healthcare\n\n"
+    "AI is transforming healthcare diagnostics. Hospitals are excited. Nobody knows what comes next.\n\n"
+    "## Diagnostics\n"
+    "AI reads scans 30% faster than radiologists. The waiting rooms are quieter. "
+    "See [the study](https://example.org/study) for details."
+)
+
+class TestTokenBudget(unittest.TestCase):
+    def test_dedupe_research_drops_repeated_facts(self):
+        results = {
+            'Solar': "Solar capacity grew 20% in 2024. Rooftop panels are spreading.",
+            'Policy': "Solar capacity grew 20% in 2024! Subsidies were extended.",
+        }
+        deduped = dedupe_research(results)
+        self.assertEqual(deduped['Solar'], results['Solar'])
+        self.assertEqual(deduped['Policy'], "Subsidies were extended.")
+
+    def test_trim_text_keeps_headings_and_relevant_sentences(self):
+        trimmed = trim_text(POST, 45, "AI healthcare")
+        self.assertLessEqual(estimate_tokens(trimmed), 50)
+        self.assertIn("# AI in Healthcare", trimmed)
+        self.assertIn("## Diagnostics", trimmed)
+        self.assertIn("AI is transforming healthcare diagnostics.", trimmed)
+        self.assertNotIn("Nobody knows", trimmed)
+        self.assertEqual(trim_text(POST, 10000), POST)
+
+    def test_compact_research_shares_budget(self):
+        results = {'Short': "One fact.", 'Long': " ".join(f"Finding number {i} about batteries." for i in range(50))}
+        compacted = compact_research(results, 100)
+        self.assertEqual(compacted['Short'], "One fact.")
+        self.assertLessEqual(sum(estimate_tokens(text) for text in compacted.values()), 110)
+
+    def test_context_budget_reports_savings(self):
+        budget = ContextBudget({'reviewer': 30})
+        budget.fit('reviewer', POST)
+        budget.measure('editor', POST)
+        report = budget.report()
+        self.assertGreater(report['reviewer']['saved_tokens'], 0)
+        self.assertEqual(report['editor']['saved_tokens'], 0)
+        self.assertEqual(report['editor']['prompt_tokens'], estimate_tokens(POST))
+        self.assertEqual(ContextBudget({'reviewer': 30}, enabled=False).fit('reviewer', POST), POST)
@@ -0,0 +1,148 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from rate_limiter import RateLimiter
+from tracing import Metrics, SpanBinding, Tracer, current_span, percentile, propagate, start_metrics_server
+from utils import wrap_method
+
+class TestTracer(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.tracer = Tracer(trace_path=lambda run_id: os.path.join(self.root, run_id, 'trace.jsonl'))
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def spans(self, run_id):
+        with open(os.path.join(self.root, run_id, 'trace.jsonl'), encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    def test_nested_spans_roll_counters_up_and_are_written_to_the_run_trace(self):
+        with self.tracer.span('run_pipeline', kind='run', trace_id='run1') as run:
+            with self.tracer.span('writer', kind='stage'):
+                with self.tracer.span('Writer', kind='agent'):
+                    self.tracer.count('prompt_tokens', 120)
+            with self.tracer.span('seo', kind='stage'):
+                self.tracer.count('prompt_tokens', 30)
+        self.assertEqual(run.counters, {'prompt_tokens': 150})
+        spans = self.spans('run1')
+        self.assertEqual([span['name'] for span in spans], ['Writer', 'writer', 'seo', 'run_pipeline'])
+        self.assertEqual(spans[0]['parent_id'], spans[1]['span_id'])
+        self.assertEqual({span['trace_id'] for span in spans}, {'run1'})
+        self.assertIn(('prompt_tokens', (('stage', 'writer'),)), self.tracer.metrics.counters)
+        self.assertEqual(self.tracer.metrics.percentiles('stage_seconds', 'name').keys(), {'writer', 'seo'})
+        self.assertIsNone(current_span())
+
+    def test_failed_span_is_marked_and_reraised(self):
+        with self.assertRaises(ValueError):
+            with self.tracer.span('planner', kind='stage', trace_id='run2'):
+                raise ValueError("no outline")
+        self.assertEqual(self.spans('run2')[0]['status'], 'error')
+        self.assertEqual(self.spans('run2')[0]['error'], "ValueError: no outline")
+
+    def test_propagate_keeps_the_parent_span_on_other_threads(self):
+        seen = []
+        with self.tracer.span('research', kind='stage', trace_id='run3') as stage:
+            work = propagate(lambda: seen.append(current_span()))
+            threads = [threading.Thread(target=work) for _ in range(3)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(seen, [stage] * 3)
+        unwrapped = []
+        thread = threading.Thread(target=lambda: unwrapped.append(current_span()))
+        with self.tracer.span('other'):
+            thread.start()
+            thread.join()
+        self.assertEqual(unwrapped, [None])
+
+    def test_span_binding_nests_calls_from_threads_without_the_context(self):
+        binding = SpanBinding()
+
+        def llm_call():
+            with self.tracer.span('gemini', kind='llm') as span:
+                self.tracer.count('llm_calls')
+                return span
+        call = binding.wrap(llm_call)
+        with self.tracer.span('writer', kind='stage', trace_id='run5') as stage, binding.bind(stage):
+            # A plain executor thread, like the ones CrewAI runs agents on, does not carry the current span
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                llm_span = executor.submit(call).result()
+        self.assertIs(llm_span.parent, stage)
+        self.assertEqual(stage.counters, {'llm_calls': 1})
+        self.assertEqual([span['name'] for span in self.spans('run5')], ['gemini', 'writer'])
+        self.assertIn(('llm_calls', (('stage', 'writer'),)), self.tracer.metrics.counters)
+        self.assertIsNone(binding.span)
+        # Unbound, the call has no parent
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            self.assertIsNone(executor.submit(call).result().parent)
+
+    def test_call_wrappers_count_requests_retries_and_cache_hits(self):
+        class Client:
+            def __init__(self):
+                self.failures = 1
+
+            def call(self, prompt):
+                if self.failures:
+                    self.failures -= 1
+                    raise RuntimeError('429 RESOURCE_EXHAUSTED "retryDelay": "0s"')
+                return prompt.upper()
+        client, cache = Client(), {}
+        trace_call, count_request = self.tracer.call_wrappers('llm', 'fake-model', measure=lambda args, kwargs, result: {'completion_tokens': len(result)})
+        wrap_method(client, 'call', count_request)
+        wrap_method(client, 'call', RateLimiter('test', 6000, burst=10, base_delay=0, jitter=0, sleep=lambda s: None).wrap)
+
+        def cached(call):
+            return lambda prompt: cache.get(prompt) or cache.setdefault(prompt, call(prompt))
+        wrap_method(client, 'call', cached)
+        wrap_method(client, 'call', trace_call)
+        with self.tracer.span('writer', kind='stage', trace_id='run4') as stage:
+            self.assertEqual(client.call("draft"), "DRAFT")
+            self.assertEqual(client.call("draft"), "DRAFT")
+        self.assertEqual(stage.counters, {
+            'llm_calls': 2, 'llm_requests': 2, 'llm_retries': 1, 'llm_cache_hits': 1, 'completion_tokens': 10
+        })
+        calls = [span for span in self.spans('run4') if span['kind'] == 'llm']
+        self.assertEqual([span['attributes']['cache_hit'] for span in calls], [False, True])
+
+    def test_disabled_tracer_records_nothing(self):
+        tracer = Tracer(enabled=False)
+        with tracer.span('writer', kind='stage') as span:
+            tracer.count('llm_calls')
+        self.assertIsNone(span)
+        self.assertEqual(tracer.metrics.render(), '\n')
+
+class TestMetrics(unittest.TestCase):
+    def test_percentiles_use_a_window_of_recent_observations(self):
+        metrics = Metrics(window=4)
+        for seconds in [100, 1, 2, 3, 4]:
+            metrics.observe('stage_seconds', seconds, name='writer')
+        report = metrics.percentiles('stage_seconds', 'name')['writer']
+        self.assertEqual(report['count'], 5)
+        self.assertEqual(report['p50'], 2.5)
+        self.assertAlmostEqual(percentile([1, 2, 3, 4], 0.99), 3.97)
+
+    def test_render_prometheus_text_and_serve_it(self):
+        metrics = Metrics()
+        metrics.inc('llm_calls', 3, stage='writer')
+        metrics.observe('stage_seconds', 1.5, name='say "hi"')
+        text = metrics.render()
+        self.assertIn('# TYPE content_studio_llm_calls_total counter\ncontent_studio_llm_calls_total{stage="writer"} 3', text)
+        self.assertIn('content_studio_stage_seconds{name="say \\"hi\\"",quantile="0.95"} 1.500000', text)
+        self.assertIn('content_studio_stage_seconds_count{name="say \\"hi\\""} 1', text)
+        server = start_metrics_server(metrics, 0)
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics", timeout=5) as response:
+                self.assertEqual(response.read().decode('utf-8'), text)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,25 @@
+import unittest
+from translation import mask_urls, unmask_urls, structure_mismatches
+
+class TestTranslationHelpers(unittest.TestCase):
+    def test_urls_round_trip(self):
+        text = "See [the report](https://example.com/report?id=1) and https://example.org."
+        masked, urls = mask_urls(text)
+        self.assertNotIn("https://", masked)
+        self.assertEqual(urls, ["https://example.com/report?id=1", "https://example.org."])
+        restored, missing = unmask_urls(masked.replace("See", "देखें"), urls)
+        self.assertIn("(https://example.com/report?id=1)", restored)
+        self.assertEqual(missing, [])
+
+    def test_missing_placeholders_are_reported(self):
+        masked, urls = mask_urls("[a](https://a.example) [b](https://b.example)")
+        _, missing = unmask_urls(masked.replace("{{URL_2}}", ""), urls)
+        self.assertEqual(missing, [2])
+
+    def test_structure_mismatches(self):
+        source = "# Title\n\n- one\n- two\n\n[link](https://x.example)"
+        self.assertEqual(structure_mismatches(source, "# शीर्षक\n\n- एक\n- दो\n\n[लिंक](https://x.example)"), [])
+        self.assertEqual(structure_mismatches(source, "शीर्षक\n\n- एक\n- दो\n\n[लिंक](https://x.example)"), ['headings'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import os
+import shutil
+import tempfile
+import unittest
+from trends import TrendStore
+
+class TestTrendStore(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.path = os.path.join(self.root, 'trending_topics.json')
+        self.now = [1000.0]
+        self.fetches = []
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def store(self, topics):
+        def fetch():
+            self.fetches.append(1)
+            return topics
+        return TrendStore(self.path, fetch, max_age=60, fallback=['Evergreen topic'], retry_after=30, clock=lambda: self.now[0])
+
+    def test_cold_store_serves_fallback_then_refreshed_topics(self):
+        store = self.store(['Quantum chips', 'Solid-state batteries'])
+        self.assertEqual(store.get(background=False), ['Quantum chips', 'Solid-state batteries'])
+        self.assertEqual(self.store([]).read()['topics'], ['Quantum chips', 'Solid-state batteries'])
+        self.assertEqual(TrendStore(os.path.join(self.root, 'other.json'), lambda: [], fallback=['Evergreen topic']).get(background=False), ['Evergreen topic'])
+
+    def test_stale_topics_are_served_while_refreshing(self):
+        self.store(['Old topic']).refresh()
+        self.now[0] += 61
+        store = self.store(['New topic'])
+        self.assertTrue(store.is_stale(store.read()))
+        self.assertEqual(store.read()['topics'], ['Old topic'])
+        store.refresh()
+        self.assertEqual(store.get(), ['New topic'])
+
+    def test_failed_refresh_keeps_topics_and_backs_off(self):
+        self.store(['Old topic']).refresh()
+        self.now[0] += 61
+        failing = self.store([])
+        self.assertFalse(failing.refresh())
+        self.assertEqual(failing.get(), ['Old topic'])
+        self.assertFalse(failing.is_stale(failing.read()))  # Not retried until retry_after has passed
+        self.now[0] += 31
+        self.assertTrue(failing.is_stale(failing.read()))
+
+    def test_refresh_is_skipped_while_another_process_holds_the_lock(self):
+        open(self.path + '.lock', 'w').close()
+        store = TrendStore(self.path, lambda: ['Topic'], fallback=['Evergreen topic'])
+        self.assertFalse(store.refresh())
+        self.assertEqual(store.get(background=False), ['Evergreen topic'])
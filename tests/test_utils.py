@@ -0,0 +1,64 @@
+import threading
+import unittest
+from utils import SingleFlight, lazy
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_calls_share_one_execution(self):
+        flights = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def work():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return "result"
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flights.do('key', work)))
+        leader.start()
+        started.wait(5)
+        follower = threading.Thread(target=lambda: results.append(flights.do('key', work)))
+        follower.start()
+        while not flights.coalesced:
+            pass
+        release.set()
+        leader.join()
+        follower.join()
+        self.assertEqual((results, len(calls)), (["result", "result"], 1))
+
+    def test_results_are_kept_for_ttl(self):
+        now = [0.0]
+        flights = SingleFlight(ttl=10, keep=lambda result: result is not None, clock=lambda: now[0])
+        self.assertEqual(flights.do('key', lambda: "first"), "first")
+        self.assertEqual(flights.do('key', lambda: "second"), "first")
+        self.assertEqual(flights.reused, 1)
+        now[0] = 11
+        self.assertEqual(flights.do('key', lambda: "third"), "third")
+        # Results rejected by keep are never reused
+        self.assertIsNone(flights.do('failed', lambda: None))
+        self.assertEqual(flights.do('failed', lambda: "retried"), "retried")
+
+class TestLazy(unittest.TestCase):
+    def test_factory_runs_once_on_first_use(self):
+        calls = []
+        get = lazy(lambda: calls.append(1) or len(calls))
+        self.assertEqual((calls, get.is_built()), ([], False))
+        threads = [threading.Thread(target=get) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual((get(), len(calls), get.is_built()), (1, 1, True))
+
+    def test_failed_factory_is_retried(self):
+        attempts = []
+
+        def factory():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise RuntimeError("not ready")
+            return "built"
+        get = lazy(factory)
+        with self.assertRaises(RuntimeError):
+            get()
+        self.assertEqual(get(), "built")
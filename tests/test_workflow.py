@@ -0,0 +1,72 @@
+import threading
+import time
+import unittest
+from workflow import Workflow, WorkflowTask
+
+class FakeAgent:
+    def __init__(self, name, delay=0.1):
+        self.name = name
+        self.delay = delay
+        self.prompts = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+    def run(self, task):
+        with self._lock:
+            self.prompts.append(task)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        if 'fail' in task:
+            raise RuntimeError("boom")
+        return f"{self.name} done: {task.splitlines()[0]}"
+
+class TestWorkflow(unittest.TestCase):
+    def test_plain_tasks_keep_round_robin_and_order(self):
+        workflow = Workflow("wf")
+        workflow.agents = [FakeAgent("A", 0.05), FakeAgent("B", 0.0)]
+        workflow.tasks = ["first", "second", "third"]
+        results = workflow.run()
+        self.assertEqual([(agent, task) for agent, task, _ in results], [("A", "first"), ("B", "second"), ("A", "third")])
+
+    def test_independent_tasks_run_concurrently(self):
+        workflow = Workflow("wf")
+        workflow.agents = [FakeAgent(f"Agent {i}") for i in range(4)]
+        workflow.tasks = [f"task {i}" for i in range(4)]
+        start = time.time()
+        workflow.run(max_workers=4)
+        self.assertLess(time.time() - start, 0.3)
+
+    def test_dependencies_and_input_passing(self):
+        researcher, writer = FakeAgent("Researcher", 0.0), FakeAgent("Writer", 0.0)
+        workflow = Workflow("wf")
+        workflow.agents = [researcher, writer]
+        workflow.add_task("research a", name="a", agent="Researcher")
+        workflow.add_task("research b", name="b", agent="Researcher")
+        workflow.add_task("write post", name="post", agent=writer, inputs=["a", "b"])
+        streamed = [task for _, task, _ in workflow.stream()]
+        self.assertEqual(streamed[-1], "write post")
+        self.assertIn("Researcher done: research a", writer.prompts[0])
+        self.assertIn("Researcher done: research b", writer.prompts[0])
+        self.assertEqual(researcher.max_active, 1)
+
+    def test_failed_input_skips_dependents(self):
+        workflow = Workflow("wf")
+        workflow.agents = [FakeAgent("A", 0.0)]
+        workflow.add_task("fail here", name="x")
+        workflow.add_task("use x", name="y", inputs=["x"])
+        results = workflow.run()
+        self.assertTrue(results[0][2].startswith("Error:"))
+        self.assertTrue(results[1][2].startswith("Skipped:"))
+
+    def test_cycles_are_rejected(self):
+        workflow = Workflow("wf")
+        workflow.agents = [FakeAgent("A")]
+        workflow.tasks = [WorkflowTask("one", name="1", inputs=["2"]), WorkflowTask("two", name="2", inputs=["1"])]
+        with self.assertRaises(ValueError):
+            workflow.run()
+
+if __name__ == '__main__':
+    unittest.main()
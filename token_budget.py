@@ -0,0 +1,183 @@
+"""
+Context budgeting for downstream prompts.
+
+Every subtopic's research summary and every draft used to be inlined verbatim
+into the next agent's prompt. ``ContextBudget`` measures those inputs, compacts
+them to a per-stage token budget (dropping facts repeated across subtopics and
+extractively trimming the least relevant sentences) and reports how many tokens
+each stage saved.
+"""
+
+import re
+import threading
+
+# Sentence boundary: end punctuation followed by whitespace and something that starts a new sentence
+SENTENCE_PATTERN = re.compile(r'(?<=[.!?])\s+(?=[A-Z0-9"\'(\[*_])')
+WORD_PATTERN = re.compile(r'[a-z0-9]+')
+STOPWORDS = {
+    'about', 'after', 'also', 'been', 'being', 'from', 'have', 'into', 'more', 'most', 'other', 'over',
+    'such', 'than', 'that', 'their', 'them', 'there', 'these', 'they', 'this', 'those', 'through',
+    'very', 'were', 'what', 'when', 'where', 'which', 'while', 'with', 'will', 'would', 'your',
+}
+
+
+def estimate_tokens(text):
+    """Rough token count of a text (about four characters per token for English)."""
+    return (len(text) + 3) // 4 if text else 0
+
+
+def split_sentences(text):
+    """Splits a paragraph into sentences."""
+    return [sentence for sentence in SENTENCE_PATTERN.split(text.strip()) if sentence.strip()]
+
+
+def _terms(text):
+    return {word for word in WORD_PATTERN.findall(text.lower()) if len(word) > 3 and word not in STOPWORDS}
+
+
+def _similarity(a, b):
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def dedupe_research(results, threshold=0.7):
+    """Drops sentences that repeat a fact already stated for an earlier subtopic.
+
+    Results are processed in order, so the first subtopic that mentions a fact keeps it.
+    """
+    seen = []
+    deduped = {}
+    for subtopic, text in results.items():
+        if str(text).startswith("Error:"):
+            deduped[subtopic] = text
+            continue
+        paragraphs = []
+        for paragraph in str(text).split('\n\n'):
+            kept = []
+            for sentence in split_sentences(paragraph):
+                terms = _terms(sentence)
+                if any(_similarity(terms, other) >= threshold for other in seen):
+                    continue
+                seen.append(terms)
+                kept.append(sentence)
+            if kept:
+                paragraphs.append(' '.join(kept))
+        # A subtopic that only repeats earlier ones still needs its own material (e.g. for its own section)
+        deduped[subtopic] = '\n\n'.join(paragraphs) or text
+    return deduped
+
+
+def _score(sentence, query_terms, first_in_paragraph):
+    # Favour sentences about the topic, sentences carrying checkable facts (numbers, links) and topic sentences
+    score = 2 * len(_terms(sentence) & query_terms)
+    if re.search(r'\d', sentence):
+        score += 1
+    if re.search(r'\]\(|https?://', sentence):
+        score += 1
+    if first_in_paragraph:
+        score += 1
+    return score
+
+
+def trim_text(text, budget, query=''):
+    """Extractively trims text to about `budget` tokens, keeping headings and the most relevant sentences in order."""
+    if not budget or estimate_tokens(text) <= budget:
+        return text
+    query_terms = _terms(query)
+    headings, units = {}, []  # Headings are always kept; units are (paragraph index, sentence index, sentence, score)
+    used = 0
+    for p, paragraph in enumerate(text.strip().split('\n\n')):
+        paragraph = paragraph.strip()
+        if paragraph.startswith('#'):
+            headings[p], _, paragraph = paragraph.partition('\n')
+            used += estimate_tokens(headings[p]) + 1
+        for s, sentence in enumerate(split_sentences(paragraph)):
+            units.append((p, s, sentence, _score(sentence, query_terms, s == 0)))
+
+    selected = set()
+    for p, s, sentence, _ in sorted(units, key=lambda unit: -unit[3]):
+        cost = estimate_tokens(sentence) + 1
+        if used + cost <= budget or not selected:  # Always keep at least the most relevant sentence
+            selected.add((p, s))
+            used += cost
+
+    kept = {p: [heading] for p, heading in headings.items()}
+    for p, s, sentence, _ in units:
+        if (p, s) in selected:
+            kept.setdefault(p, [None]).append(sentence)
+    paragraphs = []
+    for p in sorted(kept):
+        heading, sentences = kept[p][0], ' '.join(kept[p][1:])
+        paragraphs.append('\n'.join(part for part in (heading, sentences) if part))
+    return '\n\n'.join(paragraphs)
+
+
+def compact_research(results, budget, query=''):
+    """Dedupes research across subtopics and trims it to about `budget` tokens in total.
+
+    Subtopics shorter than their fair share keep everything; the rest of the budget is split among the longer ones.
+    """
+    deduped = dedupe_research(results)
+    if not budget:
+        return deduped
+    sizes = {subtopic: estimate_tokens(str(text)) for subtopic, text in deduped.items()}
+    if sum(sizes.values()) <= budget:
+        return deduped
+    shares = {}
+    remaining, pending = budget, sorted(sizes, key=sizes.get)
+    while pending:
+        share = remaining // len(pending)
+        subtopic = pending.pop(0)
+        shares[subtopic] = min(sizes[subtopic], share)
+        remaining -= shares[subtopic]
+    return {
+        subtopic: text if str(text).startswith("Error:") else trim_text(text, shares[subtopic], f"{query} {subtopic}")
+        for subtopic, text in deduped.items()
+    }
+
+
+class ContextBudget:
+    """Per-run context budgets and token accounting, keyed by stage name (thread-safe)."""
+
+    def __init__(self, budgets=None, enabled=True):
+        self.budgets = dict(budgets or {})  # stage -> max input tokens; missing or 0 means unlimited
+        self.enabled = enabled
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def _record(self, stage, **tokens):
+        with self._lock:
+            entry = self.stats.setdefault(stage, {'input_tokens': 0, 'compacted_tokens': 0, 'prompt_tokens': 0})
+            for field, count in tokens.items():
+                entry[field] += count
+
+    def fit(self, stage, text, query=''):
+        """Returns text trimmed to the stage's budget, recording the tokens saved."""
+        compacted = trim_text(text, self.budgets.get(stage), query) if self.enabled else text
+        self._record(stage, input_tokens=estimate_tokens(text), compacted_tokens=estimate_tokens(compacted))
+        return compacted
+
+    def fit_research(self, stage, results, query=''):
+        """Returns per-subtopic research deduped and trimmed to the stage's budget, recording the tokens saved."""
+        compacted = compact_research(results, self.budgets.get(stage), query) if self.enabled else dict(results)
+        self._record(
+            stage,
+            input_tokens=sum(estimate_tokens(str(text)) for text in results.values()),
+            compacted_tokens=sum(estimate_tokens(str(text)) for text in compacted.values())
+        )
+        return compacted
+
+    def measure(self, stage, prompt):
+        """Records the size of a prompt about to be sent for a stage and returns it unchanged."""
+        self._record(stage, prompt_tokens=estimate_tokens(prompt))
+        return prompt
+
+    def report(self):
+        """Returns {stage: {input_tokens, compacted_tokens, saved_tokens, prompt_tokens}}."""
+        with self._lock:
+            return {
+                stage: {**entry, 'saved_tokens': entry['input_tokens'] - entry['compacted_tokens']}
+                for stage, entry in self.stats.items()
+            }
+
+    def total_saved(self):
+        return sum(entry['saved_tokens'] for entry in self.report().values())
@@ -0,0 +1,368 @@
+"""
+Spans, metrics and trace files for pipeline runs.
+
+A ``Tracer`` records nested spans (a run, its stages, the agent tasks in
+them, and every LLM and tool call) with their duration, status, attributes
+and counters such as tokens, API requests, retries and cache hits. Counters
+added inside a span also add up in all of its ancestors, so a stage span
+reports everything its agents spent. The current span is kept in a context
+variable; work handed to another thread keeps its parent when wrapped with
+``propagate``. Calls made on threads the pipeline does not start (such as the
+executor threads CrewAI runs agents on) find their span through a
+``SpanBinding`` instead.
+
+Finished spans of a run are appended to a JSON lines trace file, and their
+durations and counters feed ``Metrics``, which keeps latency percentiles over
+a window of recent observations and renders everything in the Prometheus text
+format (see ``start_metrics_server``).
+"""
+
+import collections
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+_thread_spans = {}  # thread ident -> the span that thread is working under, for observers such as the profiler
+
+
+def current_span():
+    """Returns the span open in the current context, or None."""
+    return _current_span.get()
+
+
+def thread_span(ident):
+    """Returns the span the thread with this ident is working under, or None."""
+    return _thread_spans.get(ident)
+
+
+@contextmanager
+def _on_this_thread(span):
+    ident = threading.get_ident()
+    previous = _thread_spans.get(ident)
+    _thread_spans[ident] = span
+    try:
+        yield
+    finally:
+        if previous is None:
+            _thread_spans.pop(ident, None)
+        else:
+            _thread_spans[ident] = previous
+
+
+def propagate(fn):
+    """Wraps fn so that it runs under the spans open now, even when it is called on another thread."""
+    context = contextvars.copy_context()
+
+    def run_here(*args, **kwargs):
+        with _on_this_thread(current_span()):
+            return fn(*args, **kwargs)
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        # A context can only be entered by one thread at a time; every call gets its own copy
+        return context.copy().run(run_here, *args, **kwargs)
+    return run
+
+
+class SpanBinding:
+    """The span an object's calls belong to, for calls made on threads that do not carry the caller's context.
+
+    bind(span) sets it for the duration of a with block; calls wrapped with wrap() that find no current span run
+    under the bound one.
+    """
+
+    def __init__(self):
+        self.span = None
+
+    @contextmanager
+    def bind(self, span):
+        previous, self.span = self.span, span
+        try:
+            yield
+        finally:
+            self.span = previous
+
+    def wrap(self, fn):
+        @functools.wraps(fn)
+        def bound(*args, **kwargs):
+            span = self.span
+            if span is None or current_span() is not None:
+                return fn(*args, **kwargs)
+            token = _current_span.set(span)
+            try:
+                with _on_this_thread(span):
+                    return fn(*args, **kwargs)
+            finally:
+                _current_span.reset(token)
+        return bound
+
+
+def percentile(values, q):
+    """The q-quantile (0-1) of a list of numbers, interpolating between the closest ranks."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class Span:
+    """One timed unit of work with attributes and counters; see Tracer.span."""
+
+    def __init__(self, name, kind, parent=None, trace_id=None, clock=time.perf_counter, **attributes):
+        self.name = name
+        self.kind = kind
+        self.parent = parent
+        self.trace_id = trace_id or (parent.trace_id if parent else None)
+        self.span_id = uuid.uuid4().hex[:16]
+        self.attributes = attributes
+        self.counters = {}
+        self.status = 'ok'
+        self.error = None
+        self.started_at = time.time()
+        self.seconds = None
+        self.clock = clock
+        self._start = clock()
+        self._lock = threading.Lock()
+
+    def ancestor(self, kind):
+        """The closest enclosing span (or this one) of a kind, or None."""
+        span = self
+        while span and span.kind != kind:
+            span = span.parent
+        return span
+
+    def count(self, name, amount=1):
+        """Adds to a counter of this span and of every span enclosing it."""
+        span = self
+        while span:
+            with span._lock:
+                span.counters[name] = span.counters.get(name, 0) + amount
+            span = span.parent
+
+    def finish(self):
+        self.seconds = self.clock() - self._start
+
+    def as_dict(self):
+        return {
+            'trace_id': self.trace_id, 'span_id': self.span_id, 'parent_id': self.parent.span_id if self.parent else None,
+            'name': self.name, 'kind': self.kind, 'started_at': round(self.started_at, 4),
+            'seconds': round(self.seconds, 4) if self.seconds is not None else None,
+            'status': self.status, 'error': self.error, 'attributes': self.attributes, 'counters': dict(self.counters),
+        }
+
+
+class Metrics:
+    """Thread-safe counters and latency summaries, keyed by metric name and labels.
+
+    Summaries keep the last `window` observations of each series for their percentiles, plus an all-time count and sum.
+    """
+
+    def __init__(self, prefix='content_studio', window=500):
+        self.prefix = prefix
+        self.window = window
+        self.counters = {}  # (name, labels) -> value
+        self.summaries = {}  # (name, labels) -> {'recent': deque, 'count', 'sum'}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _labels(labels):
+        return tuple(sorted((labels or {}).items()))
+
+    def inc(self, metric, amount=1, **labels):
+        key = (metric, self._labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, metric, value, **labels):
+        key = (metric, self._labels(labels))
+        with self._lock:
+            summary = self.summaries.get(key)
+            if summary is None:
+                summary = self.summaries[key] = {'recent': collections.deque(maxlen=self.window), 'count': 0, 'sum': 0.0}
+            summary['recent'].append(value)
+            summary['count'] += 1
+            summary['sum'] += value
+
+    def percentiles(self, metric, label, quantiles=QUANTILES):
+        """Returns {label value: {count, p50, p95, ...}} for one summary, over its recent observations."""
+        report = {}
+        with self._lock:
+            series = [(dict(labels).get(label), list(summary['recent']), summary['count'])
+                      for (name, labels), summary in self.summaries.items() if name == metric]
+        for value, recent, count in sorted(series, key=lambda item: str(item[0])):
+            report[value] = {'count': count, **{f"p{round(q * 100)}": round(percentile(recent, q), 4) for q in quantiles}}
+        return report
+
+    def render(self):
+        """The metrics in the Prometheus text exposition format."""
+        def labels_text(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ''
+            escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+            return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + '}'
+
+        with self._lock:
+            counters = sorted(self.counters.items())
+            summaries = sorted((key, list(summary['recent']), summary['count'], summary['sum']) for key, summary in self.summaries.items())
+        lines = []
+        typed = set()
+        for (name, labels), value in counters:
+            metric = f"{self.prefix}_{name}_total"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{labels_text(labels)} {value}")
+        for (name, labels), recent, count, total in summaries:
+            metric = f"{self.prefix}_{name}"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} summary")
+            for q in QUANTILES:
+                lines.append(f"{metric}{labels_text(labels, [('quantile', q)])} {percentile(recent, q):.6f}")
+            lines.append(f"{metric}_sum{labels_text(labels)} {total:.6f}")
+            lines.append(f"{metric}_count{labels_text(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+
+class Tracer:
+    """Opens spans, feeds finished ones into Metrics and appends them to their run's trace file.
+
+    trace_path(trace_id) returns the trace file of a run (or None to skip writing it). Span durations are observed
+    as `<kind>_seconds` summaries labelled by span name, and counters as `<name>` counters labelled by the stage
+    they were spent in.
+    """
+
+    def __init__(self, metrics=None, trace_path=None, enabled=True):
+        self.metrics = metrics or Metrics()
+        self.trace_path = trace_path
+        self.enabled = enabled
+        self._write_lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, kind='task', trace_id=None, **attributes):
+        """Runs the with block as a span nested in the current one; yields the Span (or None when disabled)."""
+        if not self.enabled:
+            yield None
+            return
+        span = Span(name, kind, parent=current_span(), trace_id=trace_id, **attributes)
+        token = _current_span.set(span)
+        try:
+            with _on_this_thread(span):
+                yield span
+        except BaseException as e:
+            span.status = 'error'
+            span.error = f"{type(e).__name__}: {e}"[:300]
+            raise
+        finally:
+            _current_span.reset(token)
+            span.finish()
+            self._finished(span)
+
+    def count(self, name, amount=1):
+        """Adds to a counter of the current span (and its ancestors) and to the metric of the stage it belongs to."""
+        span = current_span()
+        if not self.enabled or span is None or not amount:
+            return
+        span.count(name, amount)
+        stage = span.ancestor('stage')
+        self.metrics.inc(name, amount, stage=stage.name if stage else 'none')
+
+    def _finished(self, span):
+        self.metrics.observe(f"{span.kind}_seconds", span.seconds, name=span.name)
+        if span.status == 'error':
+            self.metrics.inc('span_errors', kind=span.kind, name=span.name)
+        if not (self.trace_path and span.trace_id):
+            return
+        path = None
+        try:
+            path = self.trace_path(span.trace_id)
+            if not path:
+                return
+            with self._write_lock:
+                os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+                with open(path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(span.as_dict(), ensure_ascii=False, default=str) + '\n')
+        except (OSError, ValueError) as e:
+            logging.warning(f"Could not write trace span to {path}: {e}")
+
+    def traced(self, name, kind='task', **attributes):
+        """Decorator form of span()."""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(name, kind, **attributes):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def call_wrappers(self, kind, name, measure=None):
+        """Returns (outer, inner) method wrappers that trace an API call, for use with utils.wrap_method.
+
+        outer goes around the whole call (caches, rate limiting and retries included) and opens a `kind` span; inner
+        goes around the raw request and counts `<kind>_requests`. A call that made no request was answered by a cache,
+        and one that made several was retried. measure(args, kwargs, result) may return extra counters, such as tokens.
+        """
+        def outer(fn):
+            @functools.wraps(fn)
+            def traced_call(*args, **kwargs):
+                with self.span(name, kind) as span:
+                    self.count(f"{kind}_calls")
+                    result = fn(*args, **kwargs)
+                    if span is not None:
+                        requests = span.counters.get(f"{kind}_requests", 0)
+                        span.attributes['cache_hit'] = requests == 0
+                        self.count(f"{kind}_cache_hits", int(requests == 0))
+                        self.count(f"{kind}_retries", max(0, requests - 1))
+                        for counter, amount in (measure(args, kwargs, result) if measure else {}).items():
+                            self.count(counter, amount)
+                    return result
+            return traced_call
+
+        def inner(fn):
+            @functools.wraps(fn)
+            def counted(*args, **kwargs):
+                self.count(f"{kind}_requests")
+                return fn(*args, **kwargs)
+            return counted
+        return outer, inner
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    metrics = None
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = self.metrics.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes are not worth a log line each
+
+
+def start_metrics_server(metrics, port, host='127.0.0.1'):
+    """Serves metrics.render() at http://host:port/metrics from a daemon thread; returns the server."""
+    handler = type('MetricsHandler', (_MetricsHandler,), {'metrics': metrics})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
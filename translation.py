@@ -0,0 +1,55 @@
+"""
+Helpers for translating finished Markdown content.
+
+Link targets are swapped for ``{{URL_n}}`` placeholders before the text is
+sent to the translator and restored afterwards, so URLs survive translation
+byte-for-byte. ``markdown_structure`` summarises headings, list items and
+links so a translation can be checked against its source.
+"""
+
+import re
+
+URL_PATTERN = re.compile(r'https?://[^\s)\]>"]+')
+PLACEHOLDER_PATTERN = re.compile(r'\{\{URL_(\d+)\}\}')
+
+
+def mask_urls(text):
+    """Replaces every URL with a numbered placeholder; returns (masked_text, urls)."""
+    urls = []
+
+    def replace(match):
+        urls.append(match.group(0))
+        return f"{{{{URL_{len(urls)}}}}}"
+    return URL_PATTERN.sub(replace, text), urls
+
+
+def unmask_urls(text, urls):
+    """Restores URLs from placeholders; returns (text, missing_placeholder_numbers)."""
+    found = set()
+
+    def replace(match):
+        index = int(match.group(1))
+        if 1 <= index <= len(urls):
+            found.add(index)
+            return urls[index - 1]
+        return match.group(0)
+    restored = PLACEHOLDER_PATTERN.sub(replace, text)
+    missing = [i for i in range(1, len(urls) + 1) if i not in found]
+    return restored, missing
+
+
+def markdown_structure(text):
+    """Counts the structural Markdown elements a translation must keep."""
+    lines = text.splitlines()
+    return {
+        'headings': sum(1 for line in lines if re.match(r'^\s{0,3}#{1,6}\s', line)),
+        'list_items': sum(1 for line in lines if re.match(r'^\s*(?:[-*+]|\d+\.)\s', line)),
+        'links': len(re.findall(r'\[[^\]]*\]\([^)]+\)', text)),
+    }
+
+
+def structure_mismatches(source, translated):
+    """Returns the names of structural elements whose counts differ between source and translation."""
+    expected = markdown_structure(source)
+    actual = markdown_structure(translated)
+    return [name for name in expected if expected[name] != actual[name]]
@@ -0,0 +1,110 @@
+"""
+Stale-while-revalidate store for trending topics.
+
+Trending topics come from a live search plus fairly heavy parsing, so page
+loads should never wait for them. ``TrendStore`` keeps the last fetched topics
+in a JSON file shared by every server process and always answers from it
+instantly: when the topics are older than ``max_age`` (or missing, in which
+case a fallback list is served) a background refresh is started. A lock file
+makes sure only one process refreshes at a time.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+
+class TrendStore:
+    """Serves fetch()'s last result from a shared file and refreshes it in the background when stale."""
+
+    def __init__(self, path, fetch, max_age=3600, fallback=None, retry_after=300, lock_timeout=300, clock=time.time):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        self.fetch = fetch
+        self.max_age = max_age
+        self.fallback = list(fallback or [])
+        self.retry_after = retry_after  # After a failed refresh, wait this long before trying again
+        self.lock_timeout = lock_timeout  # A refresh lock older than this was left by a crashed process
+        self.clock = clock
+        self._refreshing = threading.Lock()
+
+    def read(self):
+        """Returns the stored {'topics', 'fetched_at', 'attempted_at'} entry, or None if nothing is stored."""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def is_stale(self, entry):
+        if entry is None:
+            return True
+        now = self.clock()
+        if now - entry.get('attempted_at', 0) < self.retry_after:
+            return False
+        return not entry.get('topics') or now - entry['fetched_at'] > self.max_age
+
+    def get(self, background=True):
+        """Returns the stored topics (or the fallback list) immediately, starting a refresh if they are stale."""
+        entry = self.read()
+        if self.is_stale(entry):
+            if background:
+                threading.Thread(target=self.refresh, daemon=True).start()
+            else:
+                self.refresh()
+                entry = self.read() or entry
+        return list(entry['topics']) if entry and entry.get('topics') else list(self.fallback)
+
+    def _acquire_file_lock(self):
+        try:
+            fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                if self.clock() - os.path.getmtime(self.lock_path) <= self.lock_timeout:
+                    return False
+                os.remove(self.lock_path)  # Stale lock from a process that died mid-refresh
+            except OSError:
+                return False
+            return self._acquire_file_lock()
+        os.close(fd)
+        return True
+
+    def refresh(self):
+        """Fetches fresh topics and stores them; returns False if nothing new was stored."""
+        if not self._refreshing.acquire(blocking=False):
+            return False
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            if not self._acquire_file_lock():
+                return False
+            try:
+                # Another process may have refreshed the topics since we last looked
+                previous = self.read()
+                if not self.is_stale(previous):
+                    return True
+                try:
+                    topics = list(self.fetch() or [])
+                except Exception as e:
+                    logging.warning(f"Trending topics refresh failed: {e}")
+                    topics = []
+                now = self.clock()
+                if topics:
+                    self._write({'topics': topics, 'fetched_at': now})
+                else:
+                    # Keep serving the previous topics and back off instead of hitting the API on every page load
+                    logging.warning("Trending topics refresh returned no topics; keeping the stored ones")
+                    self._write({**(previous or {'topics': [], 'fetched_at': 0}), 'attempted_at': now})
+                return bool(topics)
+            finally:
+                os.remove(self.lock_path)
+        finally:
+            self._refreshing.release()
+
+    def _write(self, entry):
+        tmp_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
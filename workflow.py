@@ -1,24 +1,176 @@
 """
 Workflow management for Agent Studio.
+
+A workflow is a small DAG of tasks. Each task may name the tasks whose results
+it takes as inputs; tasks whose inputs are ready run concurrently on a worker
+pool, with a per-agent concurrency limit, and results are streamed out as each
+task finishes. With a profile directory (or PROFILE_STAGES=1) each task is
+sampled by the stage profiler and its collapsed stacks are written there.
 """
 
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from profiling import SamplingProfiler, profiling_requested, requested_interval
+
+
+def _file_name(name):
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', name)
+
+
+class WorkflowTask:
+    def __init__(self, description, name=None, agent=None, inputs=None):
+        self.description = description
+        self.name = name
+        self.agent = agent  # Agent object or agent name; None means round-robin assignment
+        self.inputs = list(inputs or [])  # Names of tasks whose results feed into this one
+
+    def __str__(self):
+        return self.description
+
+
 class Workflow:
-    def __init__(self, name):
+    def __init__(self, name, profile_dir=None):
         self.name = name
         self.agents = []
         self.tasks = []
         self.results = []
+        self.profile_dir = profile_dir  # Each run profiles its tasks into a timestamped directory under this (PROFILE_DIR/<name> with PROFILE_STAGES=1)
+
+    def _run_profile_dir(self):
+        # A directory of its own for this run's profiles, or None if profiling is off
+        if self.profile_dir is None and not profiling_requested():
+            return None
+        root = self.profile_dir or os.path.join(os.getenv('PROFILE_DIR', 'profiles'), _file_name(self.name))
+        return os.path.join(root, time.strftime('%Y%m%d-%H%M%S'))
 
     def add_agent(self, agent):
         self.agents.append(agent)
 
-    def add_task(self, task):
+    def add_task(self, task, name=None, agent=None, inputs=None):
+        if not isinstance(task, WorkflowTask):
+            task = WorkflowTask(task, name=name, agent=agent, inputs=inputs)
         self.tasks.append(task)
+        return task
 
-    def run(self):
-        # Simple round-robin assignment for now
+    def _nodes(self):
+        # Normalize tasks (plain strings are still accepted) and give every task a unique name
+        nodes = []
         for i, task in enumerate(self.tasks):
-            agent = self.agents[i % len(self.agents)]
-            result = agent.run(task)
-            self.results.append((agent.name, task, result))
-        return self.results 
\ No newline at end of file
+            if not isinstance(task, WorkflowTask):
+                task = WorkflowTask(task)
+            nodes.append((task.name or f"Task {i + 1}", task))
+        names = [name for name, _ in nodes]
+        if len(set(names)) != len(names):
+            raise ValueError("Task names must be unique.")
+        return dict(nodes)
+
+    def _resolve_agent(self, index, task):
+        if task.agent is None:
+            # Simple round-robin assignment for tasks without an explicit agent
+            return self.agents[index % len(self.agents)]
+        if isinstance(task.agent, str):
+            for agent in self.agents:
+                if agent.name == task.agent:
+                    return agent
+            raise ValueError(f"Unknown agent '{task.agent}' for task '{task.description}'.")
+        return task.agent
+
+    def _check_graph(self, nodes):
+        # Reject unknown inputs and dependency cycles before anything runs
+        for name, task in nodes.items():
+            for dependency in task.inputs:
+                if dependency not in nodes:
+                    raise ValueError(f"Task '{name}' depends on unknown task '{dependency}'.")
+        visiting, visited = set(), set()
+
+        def visit(name):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency cycle detected at task '{name}'.")
+            visiting.add(name)
+            for dependency in nodes[name].inputs:
+                visit(dependency)
+            visiting.discard(name)
+            visited.add(name)
+        for name in nodes:
+            visit(name)
+
+    def _prompt(self, task, results):
+        if not task.inputs:
+            return task.description
+        context = "\n\n".join(f"[{dependency}]\n{results[dependency]}" for dependency in task.inputs)
+        return f"{task.description}\n\nInputs from previous tasks:\n{context}"
+
+    def stream(self, max_workers=4, agent_concurrency=1):
+        """Runs the workflow and yields (agent_name, task, result) as each task finishes.
+
+        Tasks whose inputs are complete run concurrently on up to max_workers threads, with at most
+        agent_concurrency tasks per agent at a time. A task whose input failed is skipped.
+        """
+        for _, agent_name, task, result in self._execute(max_workers, agent_concurrency):
+            yield agent_name, task, result
+
+    def _run_task(self, agent, prompt, profiler, key):
+        if profiler is None:
+            return agent.run(prompt)
+        with profiler.stage(key):
+            return agent.run(prompt)
+
+    def _execute(self, max_workers, agent_concurrency):
+        agent_concurrency = max(1, agent_concurrency)
+        if not self.agents:
+            raise ValueError("Add at least one agent to the workflow.")
+        nodes = self._nodes()
+        self._check_graph(nodes)
+        assigned = {name: self._resolve_agent(i, task) for i, (name, task) in enumerate(nodes.items())}
+        results, failed = {}, set()
+        pending = list(nodes)
+        active = {}  # Running task count per agent
+        running = {}  # Future -> task name
+        profile_dir = self._run_profile_dir()
+        profiler = SamplingProfiler(interval=requested_interval()) if profile_dir else None
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while pending or running:
+                progressed = True
+                while progressed:
+                    progressed = False
+                    for name in list(pending):
+                        task, agent = nodes[name], assigned[name]
+                        failed_inputs = [d for d in task.inputs if d in failed]
+                        if failed_inputs:
+                            pending.remove(name)
+                            failed.add(name)
+                            results[name] = f"Skipped: input task '{failed_inputs[0]}' failed."
+                            progressed = True
+                            yield name, agent.name, task.description, results[name]
+                        elif all(d in results and d not in failed for d in task.inputs) and active.get(id(agent), 0) < agent_concurrency:
+                            pending.remove(name)
+                            active[id(agent)] = active.get(id(agent), 0) + 1
+                            running[executor.submit(self._run_task, agent, self._prompt(task, results), profiler, name)] = name
+                            progressed = True
+                if not running:
+                    continue
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    task, agent = nodes[name], assigned[name]
+                    active[id(agent)] -= 1
+                    if profiler:
+                        profiler.write(name, profile_dir, _file_name(name))
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        failed.add(name)
+                        results[name] = f"Error: {e}"
+                    yield name, agent.name, task.description, results[name]
+
+    def run(self, max_workers=4, agent_concurrency=1):
+        # Results are returned in task order, regardless of completion order
+        finished = {name: (agent_name, task, result) for name, agent_name, task, result in self._execute(max_workers, agent_concurrency)}
+        self.results = [finished[name] for name in self._nodes()]
+        return self.results